@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import logging
+import operator
+import threading
+from typing import Dict, Any, List, Optional, Callable
+
+logger = logging.getLogger("alert_engine")
+
+GPU_PROFILE = os.getenv('GPU_PROFILE')
+GPU_PROFILES_FILE = os.getenv('GPU_PROFILES_FILE', 'gpu_profiles.json')
+# Optional JSON list of rules replacing DEFAULT_RULES
+ALERT_RULES_FILE = os.getenv('ALERT_RULES_FILE')
+TELEGRAM_NOTIFY_THRESHOLD = int(os.getenv('TELEGRAM_NOTIFY_THRESHOLD', 300))
+DISCORD_NOTIFY_THRESHOLD = int(os.getenv('DISCORD_NOTIFY_THRESHOLD', 300))
+# Minimum shares before the reject ratio is meaningful
+REJECT_RATIO_MIN_SHARES = 20
+# Settings a rule duration can refer to as "setting:<KEY>"
+DURATION_SETTINGS = ('TELEGRAM_NOTIFY_THRESHOLD', 'DISCORD_NOTIFY_THRESHOLD')
+
+# Each rule compares one metric per subject (the rig, each GPU or each miner
+# instance) against a threshold. It fires once the condition has held for
+# `duration` seconds and resolves when the value is back past threshold -/+
+# `hysteresis`. A threshold of "profile:<KEY>" is read from the active GPU
+# profile, falling back to `default_threshold`. A duration of "setting:<KEY>"
+# is one of the notification delays in DURATION_SETTINGS, which follow .env
+# changes through set_duration(). Messages are str.format
+# templates over the rule context (value, threshold, clear, duration, subject
+# and scope specific fields).
+DEFAULT_RULES = [
+    {
+        'name': 'rig_down', 'scope': 'rig', 'metric': 'total_hashrate', 'op': '<=', 'threshold': 0,
+        'duration': 'setting:TELEGRAM_NOTIFY_THRESHOLD', 'channels': ['telegram'],
+        'message': "⚠️ <b>Rig Alert</b>\nStatus: DOWN\nReason: {reason}\nDuration: {duration}s",
+        'resolved_message': "✅ <b>Rig Alert</b>\nStatus: RECOVERED\nHashrate: {total_hashrate} MH/s",
+    },
+    {
+        'name': 'gpu_temperature', 'scope': 'gpu', 'metric': 'temperature', 'op': '>',
+        'threshold': 'profile:GPU_TEMP_THRESHOLD', 'default_threshold': 80, 'hysteresis': 5,
+        'duration': 'setting:DISCORD_NOTIFY_THRESHOLD', 'channels': ['discord'],
+        'message': "⚠️ **GPU Temperature Alert**\nThreshold: {threshold:g}°C\nOver limit: GPU {subject} ({value}°C)",
+        'resolved_message': "✅ **GPU Temperature Recovered**\nGPU {subject} below {clear:g}°C",
+    },
+    {
+        'name': 'reject_ratio', 'scope': 'rig', 'metric': 'reject_ratio', 'op': '>', 'threshold': 10, 'hysteresis': 2,
+        'duration': 60, 'channels': ['telegram', 'discord'],
+        'message': "⚠️ High rejected share ratio: {value:.1f}% (threshold {threshold:g}%)",
+        'resolved_message': "✅ Rejected share ratio back to {value:.1f}%",
+    },
+    {
+        'name': 'instance_down', 'scope': 'instance', 'metric': 'up', 'op': '==', 'threshold': 0,
+        'duration': 60, 'channels': ['telegram', 'discord'],
+        'message': "⚠️ Miner instance on port {subject} is {status}",
+        'resolved_message': "✅ Miner instance on port {subject} is back UP",
+    },
+    {
+        'name': 'node_out_of_sync', 'scope': 'rig', 'metric': 'node_synced', 'op': '==', 'threshold': 0,
+        'duration': 300, 'channels': ['telegram', 'discord'],
+        'message': "⚠️ Ergo node is not synced ({full_height} / {headers_height})",
+        'resolved_message': "✅ Ergo node is synced again",
+    },
+]
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+}
+
+def _reject_ratio(miner: Dict[str, Any]) -> Optional[float]:
+    accepted = miner.get('total_accepted_shares', 0) or 0
+    rejected = miner.get('total_rejected_shares', 0) or 0
+    total = accepted + rejected
+    if total < REJECT_RATIO_MIN_SHARES:
+        return None
+    return rejected * 100 / total
+
+def _rig_context(miner: Optional[Dict[str, Any]], node: Dict[str, Any]) -> Dict[str, Any]:
+    """Rig-scope metrics and message fields; a metric is None when it cannot be evaluated."""
+    return {
+        'total_hashrate': (miner or {}).get('total_hashrate', 0),
+        'reason': "API Unreachable" if miner is None else "Zero Hashrate",
+        'reject_ratio': _reject_ratio(miner) if miner else None,
+        'node_synced': (1 if node.get('is_synced') else 0) if node.get('enabled') else None,
+        'full_height': node.get('full_height', 0),
+        'headers_height': node.get('headers_height', 0),
+    }
+
+def _subjects(scope: str, miner: Optional[Dict[str, Any]], rig: Dict[str, Any]):
+    """Yields (subject, context) pairs for a rule scope."""
+    if scope == 'rig':
+        yield 'rig', rig
+    elif scope == 'gpu':
+        for i, gpu in enumerate((miner or {}).get('gpus', [])):
+            yield str(gpu.get('index', i)), gpu
+    elif scope == 'instance':
+        for port, status in (miner or {}).get('miner_instances', {}).items():
+            yield str(port), {'up': 1 if status == 'UP' else 0, 'status': status}
+
+class AlertEngine:
+    """
+    Evaluates alert rules against rig snapshots on its own thread. submit() only
+    stores the latest snapshot, so slow notifiers never delay the caller.
+    """
+
+    def __init__(self, notifiers: Dict[str, Callable[[str], None]], rules_file: Optional[str] = None,
+                 profiles_file: Optional[str] = None, profile: Optional[str] = None):
+        self.notifiers = notifiers
+        self.rules_file = rules_file if rules_file is not None else ALERT_RULES_FILE
+        self.profiles_file = profiles_file or GPU_PROFILES_FILE
+        self.profile = profile if profile is not None else GPU_PROFILE
+        self.rules: List[Dict[str, Any]] = []
+        self.durations: Dict[str, float] = {'TELEGRAM_NOTIFY_THRESHOLD': TELEGRAM_NOTIFY_THRESHOLD,
+                                            'DISCORD_NOTIFY_THRESHOLD': DISCORD_NOTIFY_THRESHOLD}
+        self._mtimes = None
+        # (rule name, subject) -> {'since': first breach time, 'firing': bool}
+        self._state: Dict[tuple, Dict[str, Any]] = {}
+
+        self._pending = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def _file_mtime(self, path: Optional[str]):
+        if not path:
+            return None
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load_json(self, path: Optional[str], default):
+        if not path or not os.path.exists(path):
+            return default
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error("Could not load %s: %s", path, e)
+            return default
+
+    def reload_if_changed(self) -> bool:
+        """Recompiles the rules when the rules file or GPU profiles change. Returns True if it recompiled."""
+        mtimes = (self._file_mtime(self.rules_file), self._file_mtime(self.profiles_file))
+        if mtimes == self._mtimes:
+            return False
+        self._mtimes = mtimes
+
+        rules = self._load_json(self.rules_file, DEFAULT_RULES)
+        profiles = self._load_json(self.profiles_file, {}) if self.profile else {}
+        settings = profiles.get(self.profile, {}) if self.profile else {}
+        try:
+            compiled = [self._compile(rule, settings) for rule in rules]
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error("Invalid alert rules, keeping the previous set: %s", e)
+            return False
+        self.rules = compiled
+        logger.info("Loaded %s alert rules", len(self.rules))
+        return True
+
+    def set_profile(self, profile: Optional[str]) -> None:
+        """Switches the GPU profile thresholds are read from; rules are recompiled on the next evaluation."""
+        with self._cond:
+            self.profile = profile
+            self._mtimes = None
+
+    def set_duration(self, key: str, seconds: float) -> None:
+        """Changes a DURATION_SETTINGS value; rules are recompiled on the next evaluation."""
+        with self._cond:
+            self.durations[key] = seconds
+            self._mtimes = None
+
+    def _compile(self, rule: Dict[str, Any], profile_settings: Dict[str, Any]) -> Dict[str, Any]:
+        threshold = rule['threshold']
+        if isinstance(threshold, str) and threshold.startswith('profile:'):
+            threshold = profile_settings.get(threshold.split(':', 1)[1], rule.get('default_threshold'))
+        threshold = float(threshold)
+
+        duration = rule.get('duration', 0)
+        if isinstance(duration, str) and duration.startswith('setting:'):
+            duration = self.durations[duration.split(':', 1)[1]]
+
+        op = rule.get('op', '>')
+        hysteresis = float(rule.get('hysteresis', 0))
+        if op in ('>', '>='):
+            clear = threshold - hysteresis
+        elif op in ('<', '<='):
+            clear = threshold + hysteresis
+        else:
+            clear = threshold
+
+        return {
+            'name': rule['name'],
+            'scope': rule.get('scope', 'rig'),
+            'metric': rule['metric'],
+            'compare': OPERATORS[op],
+            'threshold': threshold,
+            'clear': clear,
+            'duration': float(duration),
+            'channels': list(rule.get('channels', [])),
+            'message': rule.get('message', "⚠️ {name}: {value}"),
+            'resolved_message': rule.get('resolved_message'),
+        }
+
+    def evaluate(self, snapshot: Dict[str, Any], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Updates rule state from one snapshot ({'miner': ..., 'node': ...}) and returns fired/resolved events."""
+        now = time.time() if now is None else now
+        self.reload_if_changed()
+        miner = snapshot.get('miner')
+        rig = _rig_context(miner, snapshot.get('node') or {})
+
+        events = []
+        for rule in self.rules:
+            for subject, context in _subjects(rule['scope'], miner, rig):
+                value = context.get(rule['metric'])
+                if value is None:
+                    continue
+                key = (rule['name'], subject)
+                state = self._state.setdefault(key, {'since': None, 'firing': False})
+
+                if not state['firing']:
+                    if not rule['compare'](value, rule['threshold']):
+                        state['since'] = None
+                        continue
+                    if state['since'] is None:
+                        state['since'] = now
+                    if now - state['since'] < rule['duration']:
+                        continue
+                    state['firing'] = True
+                    events.append(self._event(rule, 'firing', subject, value, context, now - state['since']))
+                elif not rule['compare'](value, rule['clear']):
+                    events.append(self._event(rule, 'resolved', subject, value, context, now - state['since']))
+                    state['since'] = None
+                    state['firing'] = False
+        return events
+
+    def _event(self, rule, status, subject, value, context, elapsed) -> Dict[str, Any]:
+        fields = dict(context)
+        fields.update(name=rule['name'], subject=subject, value=value, threshold=rule['threshold'],
+                      clear=rule['clear'], duration=int(elapsed))
+        template = rule['message'] if status == 'firing' else rule['resolved_message']
+        message = None
+        if template:
+            try:
+                message = template.format_map(fields)
+            except (KeyError, ValueError) as e:
+                logger.error("Bad message template for alert rule %s: %s", rule['name'], e)
+                message = f"{rule['name']} {status}: {subject} = {value}"
+        return {'rule': rule['name'], 'status': status, 'subject': subject, 'value': value,
+                'message': message, 'channels': rule['channels']}
+
+    def dispatch(self, events: List[Dict[str, Any]]) -> None:
+        for event in events:
+            if not event['message']:
+                continue
+            logger.info("Alert %s %s for %s", event['rule'], event['status'], event['subject'])
+            for channel in event['channels']:
+                notifier = self.notifiers.get(channel)
+                if notifier is None:
+                    continue
+                try:
+                    notifier(event['message'])
+                except Exception as e:
+                    logger.error("Failed to deliver %s alert via %s: %s", event['rule'], channel, e)
+
+    def submit(self, snapshot: Dict[str, Any]) -> None:
+        """Hands a snapshot to the engine thread. Only the newest pending snapshot is kept."""
+        with self._cond:
+            self._pending = (snapshot, time.time())
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                snapshot, received = self._pending
+                self._pending = None
+            try:
+                self.dispatch(self.evaluate(snapshot, now=received))
+            except Exception as e:
+                logger.exception("Error evaluating alerts: %s", e)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='alert-engine', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,227 @@
+"""
+Shared, hot-reloading view of the settings in the .env file.
+
+The file is parsed once and re-read only when watchdog reports that it changed,
+so callers can ask for settings every loop without touching the disk. Values of
+known settings are validated against SCHEMA: a value that does not parse is
+logged and ignored, so the previous valid value (or the default) stays in
+effect. Subscribers are called with the typed values of the settings that
+changed, which lets long-running services apply edits made on the dashboard
+without a restart.
+"""
+import os
+import logging
+import threading
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+import env_config
+
+logger = logging.getLogger("config_service")
+
+def parse_bool(value: str) -> bool:
+    lowered = value.strip().lower()
+    if lowered in ('true', '1', 'yes', 'on'):
+        return True
+    if lowered in ('false', '0', 'no', 'off', ''):
+        return False
+    raise ValueError(f"expected true/false, got {value!r}")
+
+def parse_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+def parse_positive_float(value: str) -> float:
+    parsed = float(value)
+    if not parsed > 0:
+        raise ValueError(f"expected a positive number, got {value!r}")
+    return parsed
+
+def parse_choice(*choices: str) -> Callable[[str], str]:
+    def parse(value: str) -> str:
+        if value not in choices:
+            raise ValueError(f"expected one of {choices}, got {value!r}")
+        return value
+    return parse
+
+# setting -> (parser, default). Settings not listed here are passed through as strings.
+SCHEMA: Dict[str, Tuple[Callable[[str], Any], Any]] = {
+    'AUTO_PROFIT_SWITCHING': (parse_bool, False),
+    'PROFIT_SWITCHING_THRESHOLD': (float, 0.005),
+    'PROFIT_SWITCHING_INTERVAL': (int, 3600),
+    'PROFIT_SWITCHING_POOLS': (parse_list, []),
+    'MIN_SWITCH_COOLDOWN': (int, 900),
+    'POOL_SCORING_DEADLINE': (float, 15),
+    'PROFIT_SWITCH_HORIZON': (float, 21600),
+    'SWITCH_ROUND_LOSS_SECONDS': (float, 0),
+    'POOL_SMOOTHING': (parse_choice('ewma', 'median', 'none'), 'ewma'),
+    'POOL_SMOOTHING_HALFLIFE': (float, 21600),
+    'POOL_SMOOTHING_WINDOW': (parse_positive_float, 86400),
+    'TELEGRAM_ENABLE': (parse_bool, False),
+    'TELEGRAM_NOTIFY_THRESHOLD': (int, 300),
+    'DISCORD_ENABLE': (parse_bool, False),
+    'DISCORD_NOTIFY_THRESHOLD': (int, 300),
+    'GPU_PROFILE': (str, None),
+    'GPU_TUNING': (parse_choice('High', 'Efficient', 'Quiet'), None),
+    'APPLY_OC': (parse_bool, False),
+    'ECO_MODE': (parse_bool, False),
+    'LOG_LEVEL': (parse_choice('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'), 'INFO'),
+    'LOG_LEVELS': (parse_list, []),
+    'LOG_FORMAT': (parse_choice('json', 'text'), 'json'),
+}
+
+Subscriber = Callable[[Dict[str, Any]], None]
+
+class _EnvFileHandler(FileSystemEventHandler):
+    def __init__(self, service: 'ConfigService'):
+        self.service = service
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        paths = (event.src_path, getattr(event, 'dest_path', None))
+        target = os.path.abspath(self.service.path)
+        if any(path and os.path.abspath(path) == target for path in paths):
+            self.service.reload()
+
+class ConfigService:
+    """Parses the .env file once and re-reads it when it changes on disk."""
+
+    def __init__(self, path: Optional[str] = None, schema: Optional[Dict[str, tuple]] = None):
+        self._path = path
+        self.schema = SCHEMA if schema is None else schema
+        self._values: Optional[Dict[str, str]] = None
+        self._signature = None
+        self._lock = threading.RLock()
+        self._subscribers: List[Tuple[Subscriber, Optional[frozenset]]] = []
+        self._observer = None
+
+    @property
+    def path(self) -> str:
+        return self._path or env_config.get_env_file_path()
+
+    @property
+    def watching(self) -> bool:
+        return self._observer is not None
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _validate(self, raw: Dict[str, str], previous: Dict[str, str]) -> Dict[str, str]:
+        values = {}
+        for key, value in raw.items():
+            parser = self.schema.get(key, (None,))[0]
+            if parser is not None:
+                try:
+                    parser(value)
+                except ValueError as e:
+                    logger.warning("Ignoring invalid value for %s in %s: %s", key, self.path, e)
+                    if key in previous:
+                        values[key] = previous[key]
+                    continue
+            values[key] = value
+        return values
+
+    def reload(self) -> Dict[str, Any]:
+        """Re-reads the file and notifies subscribers. Returns the typed values that changed."""
+        with self._lock:
+            signature = self._file_signature()
+            previous = self._values or {}
+            values = self._validate(env_config.read_env_file(self.path), previous)
+            self._signature = signature
+            first_load = self._values is None
+            self._values = values
+            changed_keys = {key for key in set(previous) | set(values) if previous.get(key) != values.get(key)}
+            subscribers = list(self._subscribers)
+        if first_load or not changed_keys:
+            return {}
+
+        changes = {key: self.get(key) for key in changed_keys}
+        logger.info("Configuration changed: %s", ', '.join(sorted(changed_keys)))
+        for callback, keys in subscribers:
+            relevant = changes if keys is None else {k: v for k, v in changes.items() if k in keys}
+            if relevant:
+                try:
+                    callback(relevant)
+                except Exception as e:
+                    logger.exception("Configuration subscriber failed: %s", e)
+        return changes
+
+    def _ensure_loaded(self) -> None:
+        # Without a watcher, fall back to an mtime check so changes are still seen
+        if self._values is None or (not self.watching and self._file_signature() != self._signature):
+            self.reload()
+
+    def snapshot(self) -> Dict[str, str]:
+        """The validated settings from the file, as strings (like env_config.read_env_file())."""
+        with self._lock:
+            self._ensure_loaded()
+            return dict(self._values)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Typed value of a setting: the .env file first, then the process
+        environment, then the schema default, then `default`.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            value = self._values.get(key)
+        if value is None:
+            value = os.environ.get(key)
+        parser, schema_default = self.schema.get(key, (None, default))
+        if value is None:
+            return schema_default if schema_default is not None else default
+        if parser is None:
+            return value
+        try:
+            return parser(value)
+        except ValueError:
+            # Only reachable for invalid values in the process environment
+            logger.warning("Ignoring invalid value for %s in the environment: %r", key, value)
+            return schema_default if schema_default is not None else default
+
+    def subscribe(self, callback: Subscriber, keys: Optional[Iterable[str]] = None) -> None:
+        """Calls callback({key: typed value}) after a reload changes any of `keys` (default: any setting)."""
+        with self._lock:
+            self._subscribers.append((callback, frozenset(keys) if keys is not None else None))
+
+    def update(self, values: Dict[str, str]) -> Dict[str, Any]:
+        """Writes settings to the file and applies them immediately. Returns the typed values that changed."""
+        with self._lock:
+            self._ensure_loaded()
+            env_config.write_env_file(values, self.path)
+            return self.reload()
+
+    def start(self) -> 'ConfigService':
+        """Starts watching the file's directory. Safe to call more than once."""
+        with self._lock:
+            self._ensure_loaded()
+            if self._observer is not None:
+                return self
+            directory = os.path.dirname(os.path.abspath(self.path))
+            try:
+                observer = Observer()
+                observer.schedule(_EnvFileHandler(self), directory, recursive=False)
+                observer.daemon = True
+                observer.start()
+            except OSError as e:
+                logger.warning("Could not watch %s, checking %s for changes on access: %s", directory, self.path, e)
+                return self
+            self._observer = observer
+            logger.info("Watching %s for configuration changes", self.path)
+        return self
+
+    def stop(self) -> None:
+        with self._lock:
+            observer, self._observer = self._observer, None
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+# Shared by every service in this process
+settings = ConfigService()
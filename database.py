@@ -1,91 +1,518 @@
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
 import csv
+import time
+import atexit
+import logging
+import threading
+
+logger = logging.getLogger("database")
 
 DB_FILE = os.path.join(os.getenv('DATA_DIR', '.'), 'miner_history.db')
 
+# Engine tuning
+DB_BUSY_TIMEOUT = float(os.getenv('DB_BUSY_TIMEOUT', 5))
+# Number of samples buffered in memory before they are written (1 = write every sample)
+DB_WRITE_BUFFER_SIZE = int(os.getenv('DB_WRITE_BUFFER_SIZE', 1))
+# Maximum age in seconds of a buffered sample before it is flushed
+DB_FLUSH_INTERVAL = float(os.getenv('DB_FLUSH_INTERVAL', 60))
+
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-8000',
+)
+
+HISTORY_INSERT = '''
+    INSERT INTO history (timestamp, hashrate, dual_hashrate, avg_temp, avg_fan_speed, total_power_draw, accepted_shares, rejected_shares)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+GPU_HISTORY_INSERT = '''
+    INSERT INTO gpu_history (timestamp, gpu_index, hashrate, dual_hashrate, temperature, power_draw, fan_speed, accepted_shares, rejected_shares)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Timestamps are stored as integer epoch seconds (UTC)
+CREATE_HISTORY = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        timestamp INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+        hashrate REAL,
+        dual_hashrate REAL DEFAULT 0,
+        avg_temp REAL,
+        avg_fan_speed REAL,
+        total_power_draw REAL DEFAULT 0,
+        accepted_shares INTEGER,
+        rejected_shares INTEGER
+    )
+'''
+CREATE_GPU_HISTORY = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        timestamp INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+        gpu_index INTEGER,
+        hashrate REAL,
+        dual_hashrate REAL DEFAULT 0,
+        temperature REAL,
+        power_draw REAL,
+        fan_speed REAL,
+        accepted_shares INTEGER,
+        rejected_shares INTEGER
+    )
+'''
+
+# One row per pool per profit switcher cycle; the switcher smooths decisions over these
+CREATE_POOL_STATS = '''
+    CREATE TABLE IF NOT EXISTS pool_stats (
+        timestamp INTEGER NOT NULL,
+        pool TEXT NOT NULL,
+        effort REAL,
+        fee REAL,
+        erg_price REAL,
+        score REAL,
+        PRIMARY KEY (pool, timestamp)
+    ) WITHOUT ROWID
+'''
+POOL_STATS_INSERT = '''
+    INSERT OR REPLACE INTO pool_stats (timestamp, pool, effort, fee, erg_price, score)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+# Pool switches made by the profit switcher, used to measure restart downtime from history
+CREATE_POOL_SWITCHES = '''
+    CREATE TABLE IF NOT EXISTS pool_switches (
+        timestamp INTEGER NOT NULL PRIMARY KEY,
+        from_pool TEXT,
+        to_pool TEXT NOT NULL,
+        expected_gain REAL
+    )
+'''
+
+# Metric columns in the order they appear in the raw insert rows
+HISTORY_METRICS = ('hashrate', 'dual_hashrate', 'avg_temp', 'avg_fan_speed', 'total_power_draw', 'accepted_shares', 'rejected_shares')
+GPU_HISTORY_METRICS = ('hashrate', 'dual_hashrate', 'temperature', 'power_draw', 'fan_speed', 'accepted_shares', 'rejected_shares')
+
+# Rollup tables (history_1m, gpu_history_1m, ...) keep per-bucket min/max/sum/count of every
+# metric, maintained by flush(). Missing (NULL) values are left out of all four, so averages
+# are <metric>_sum / <metric>_count. Buckets are aligned to UTC epoch multiples.
+ROLLUP_RESOLUTIONS = (('1m', 60), ('5m', 300), ('1h', 3600), ('1d', 86400))
+# metrics.py logs one sample per 15 s loop
+RAW_SAMPLE_INTERVAL = 15
+# Most points a resampled history query returns per series
+HISTORY_TARGET_POINTS = int(os.getenv('HISTORY_TARGET_POINTS', 2500))
+
+# Tiered retention in days per resolution (0 keeps forever), applied by apply_retention()
+RETENTION_DAYS = {
+    'raw': float(os.getenv('RETENTION_RAW_DAYS', 7)),
+    '1m': float(os.getenv('RETENTION_1M_DAYS', 14)),
+    '5m': float(os.getenv('RETENTION_5M_DAYS', 90)),
+    '1h': float(os.getenv('RETENTION_1H_DAYS', 365)),
+    '1d': float(os.getenv('RETENTION_1D_DAYS', 0)),
+    'pool_stats': float(os.getenv('RETENTION_POOL_STATS_DAYS', 90)),
+}
+# Rows deleted per transaction, so retention never holds the write lock for long
+RETENTION_CHUNK_SIZE = int(os.getenv('RETENTION_CHUNK_SIZE', 5000))
+# Free pages returned to the filesystem per retention run (0 = all)
+RETENTION_VACUUM_PAGES = int(os.getenv('RETENTION_VACUUM_PAGES', 2000))
+
+def _rollup_create_sql(table, key_columns, metrics):
+    columns = ',\n'.join(f'        {m}_min REAL, {m}_max REAL, {m}_sum REAL' for m in metrics)
+    keys = ', '.join(key_columns)
+    return f'''
+    CREATE TABLE IF NOT EXISTS {table} (
+        {' '.join(f'{k} INTEGER NOT NULL,' for k in key_columns)}
+        samples INTEGER NOT NULL,
+{columns},
+        PRIMARY KEY ({keys})
+    ) WITHOUT ROWID
+'''
+
+ROLLUP_AGGREGATES = ('min', 'max', 'sum', 'count')
+
+def _rollup_upsert_sql(table, key_columns, metrics):
+    columns = ', '.join(list(key_columns) + ['samples'] + [f'{m}_{agg}' for m in metrics for agg in ROLLUP_AGGREGATES])
+    placeholders = ', '.join(['?'] * len(key_columns) + ['1'] + ['?'] * (len(ROLLUP_AGGREGATES) * len(metrics)))
+    # Multi-argument MIN/MAX return NULL if either side is NULL, so fall back to whichever side has a value
+    updates = ',\n            '.join(
+        ['samples = samples + 1']
+        + [f'{m}_min = COALESCE(MIN({m}_min, excluded.{m}_min), {m}_min, excluded.{m}_min), '
+           f'{m}_max = COALESCE(MAX({m}_max, excluded.{m}_max), {m}_max, excluded.{m}_max), '
+           f'{m}_sum = COALESCE({m}_sum, 0) + COALESCE(excluded.{m}_sum, 0), '
+           f'{m}_count = {m}_count + excluded.{m}_count' for m in metrics]
+    )
+    return f'''
+        INSERT INTO {table} ({columns}) VALUES ({placeholders})
+        ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET
+            {updates}
+    '''
+
+def _rollup_backfill_sql(source, table, key_columns, metrics, seconds):
+    """Aggregates raw rows into an empty rollup table; key_columns[-1] is the bucket."""
+    group_columns = [k for k in key_columns if k != 'bucket']
+    select_keys = ', '.join(group_columns + [f'timestamp - timestamp % {seconds} AS bucket'])
+    aggregates = ', '.join(f'MIN({m}), MAX({m}), TOTAL({m})' for m in metrics)
+    return f'''
+        INSERT INTO {table}
+        SELECT {select_keys}, COUNT(*), {aggregates}
+        FROM {source}
+        GROUP BY {', '.join(group_columns + ['bucket'])}
+    '''
+
+def _rollup_rebuild_sql(source, table, key_columns, metrics, seconds):
+    """Re-aggregates raw rows into rollup buckets from `?` on, counting only non-NULL values per metric."""
+    group_columns = [k for k in key_columns if k != 'bucket']
+    select_keys = ', '.join(group_columns + [f'timestamp - timestamp % {seconds} AS bucket'])
+    columns = ', '.join(list(key_columns) + ['samples'] + [f'{m}_{agg}' for m in metrics for agg in ROLLUP_AGGREGATES])
+    aggregates = ', '.join(f'MIN({m}), MAX({m}), TOTAL({m}), COUNT({m})' for m in metrics)
+    return f'''
+        INSERT INTO {table} ({columns})
+        SELECT {select_keys}, COUNT(*), {aggregates}
+        FROM {source}
+        WHERE timestamp >= ?
+        GROUP BY {', '.join(group_columns + ['bucket'])}
+    '''
+
+# (raw table, key columns, metrics) for each rollup family
+ROLLUP_SOURCES = (
+    ('history', ('bucket',), HISTORY_METRICS),
+    ('gpu_history', ('gpu_index', 'bucket'), GPU_HISTORY_METRICS),
+)
+ROLLUP_UPSERTS = {
+    (source, name): _rollup_upsert_sql(f'{source}_{name}', keys, metrics)
+    for source, keys, metrics in ROLLUP_SOURCES
+    for name, _ in ROLLUP_RESOLUTIONS
+}
+
+# Long-lived writer connection, reopened if DB_FILE changes or the file is replaced
+_writer_lock = threading.RLock()
+_writer = {'conn': None, 'path': None, 'inode': None}
+_write_buffer = {'history': [], 'gpu_history': [], 'samples': 0, 'first_sample': 0.0}
+
 def get_connection():
-    return sqlite3.connect(DB_FILE)
+    """Opens a short-lived connection, used for reads. WAL mode lets readers run alongside the writer."""
+    return sqlite3.connect(DB_FILE, timeout=DB_BUSY_TIMEOUT)
+
+def _file_inode(path):
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+def _close_writer():
+    conn = _writer['conn']
+    _writer['conn'] = None
+    _writer['path'] = None
+    _writer['inode'] = None
+    if conn is not None:
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning("Error closing database writer: %s", e)
+
+def _get_writer():
+    """Returns the long-lived writer connection. Callers must hold _writer_lock."""
+    conn = _writer['conn']
+    if conn is not None and (_writer['path'] != DB_FILE or _file_inode(DB_FILE) != _writer['inode']):
+        _close_writer()
+        conn = None
+
+    if conn is None:
+        conn = sqlite3.connect(DB_FILE, timeout=DB_BUSY_TIMEOUT, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        _writer['conn'] = conn
+        _writer['path'] = DB_FILE
+        _writer['inode'] = _file_inode(DB_FILE)
+    return conn
+
+def close_connections():
+    """Flushes buffered samples and closes the writer connection."""
+    with _writer_lock:
+        flush()
+        _close_writer()
+
+atexit.register(close_connections)
 
 def init_db():
-    with get_connection() as conn:
+    with _writer_lock:
+        conn = _get_writer()
+        # Only takes effect on a new file; existing files are converted below
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
         cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS history (
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                hashrate REAL,
-                dual_hashrate REAL DEFAULT 0,
-                avg_temp REAL,
-                avg_fan_speed REAL,
-                total_power_draw REAL DEFAULT 0,
-                accepted_shares INTEGER,
-                rejected_shares INTEGER
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS gpu_history (
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                gpu_index INTEGER,
-                hashrate REAL,
-                dual_hashrate REAL DEFAULT 0,
-                temperature REAL,
-                power_draw REAL,
-                fan_speed REAL,
-                accepted_shares INTEGER,
-                rejected_shares INTEGER
-            )
-        ''')
-
-        # Migrations for existing databases
-        # 1. history table
-        cursor.execute("PRAGMA table_info(history)")
-        columns = [column[1] for column in cursor.fetchall()]
-        if 'dual_hashrate' not in columns:
-            cursor.execute('ALTER TABLE history ADD COLUMN dual_hashrate REAL DEFAULT 0')
-        if 'total_power_draw' not in columns:
-            cursor.execute('ALTER TABLE history ADD COLUMN total_power_draw REAL DEFAULT 0')
-
-        # 2. gpu_history table
-        cursor.execute("PRAGMA table_info(gpu_history)")
-        gpu_columns = [column[1] for column in cursor.fetchall()]
-        if 'dual_hashrate' not in gpu_columns:
-            cursor.execute('ALTER TABLE gpu_history ADD COLUMN dual_hashrate REAL DEFAULT 0')
-        if 'power_draw' not in gpu_columns:
-            cursor.execute('ALTER TABLE gpu_history ADD COLUMN power_draw REAL DEFAULT 0')
+        cursor.execute(CREATE_HISTORY.format(table='history'))
+        cursor.execute(CREATE_GPU_HISTORY.format(table='gpu_history'))
 
         conn.commit()
+        _run_migrations(conn)
+        _ensure_incremental_vacuum(conn)
+
+def _ensure_incremental_vacuum(conn):
+    """Switches an existing file to auto_vacuum=INCREMENTAL. Needs a one-off VACUUM, which cannot run in a transaction."""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return
+    logger.info("Enabling incremental auto-vacuum (one-time VACUUM of the history database)")
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    conn.execute('VACUUM')
+
+def _migrate_add_columns(cursor):
+    """v1: columns added after the first release."""
+    # 1. history table
+    cursor.execute("PRAGMA table_info(history)")
+    columns = [column[1] for column in cursor.fetchall()]
+    if 'dual_hashrate' not in columns:
+        cursor.execute('ALTER TABLE history ADD COLUMN dual_hashrate REAL DEFAULT 0')
+    if 'total_power_draw' not in columns:
+        cursor.execute('ALTER TABLE history ADD COLUMN total_power_draw REAL DEFAULT 0')
+
+    # 2. gpu_history table
+    cursor.execute("PRAGMA table_info(gpu_history)")
+    gpu_columns = [column[1] for column in cursor.fetchall()]
+    if 'dual_hashrate' not in gpu_columns:
+        cursor.execute('ALTER TABLE gpu_history ADD COLUMN dual_hashrate REAL DEFAULT 0')
+    if 'power_draw' not in gpu_columns:
+        cursor.execute('ALTER TABLE gpu_history ADD COLUMN power_draw REAL DEFAULT 0')
+
+def _migrate_add_indexes(cursor):
+    """v2: timestamp indexes for range queries and pruning, (gpu_index, timestamp) for per-GPU history."""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_gpu_history_timestamp ON gpu_history (timestamp)')
+    # Also covers get_gpu_indices (DISTINCT gpu_index over a time range) without touching the table
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_gpu_history_gpu_timestamp ON gpu_history (gpu_index, timestamp)')
+
+# Local-time ISO strings written by log_history before v3. strftime's 'utc'
+# modifier treats its input as local time, matching how they were produced.
+_ISO_TO_EPOCH = '''
+    CASE WHEN typeof(timestamp) = 'text'
+         THEN CAST(strftime('%s', timestamp, 'utc') AS INTEGER)
+         ELSE CAST(timestamp AS INTEGER)
+    END
+'''
+
+def _rebuild_with_epoch_timestamps(cursor, table, create_sql):
+    cursor.execute(f"PRAGMA table_info({table})")
+    column_types = {column[1]: column[2] for column in cursor.fetchall()}
+    if column_types.get('timestamp', '').upper() == 'INTEGER':
+        # Created by this version; nothing to convert
+        return
+
+    data_columns = ', '.join(c for c in column_types if c != 'timestamp')
+    cursor.execute(create_sql.format(table=f'{table}_v3'))
+    cursor.execute(f'''
+        INSERT INTO {table}_v3 (timestamp, {data_columns})
+        SELECT epoch, {data_columns}
+        FROM (SELECT {_ISO_TO_EPOCH} AS epoch, * FROM {table})
+        WHERE epoch IS NOT NULL
+        ORDER BY epoch
+    ''')
+    converted = cursor.execute(f'SELECT COUNT(*) FROM {table}_v3').fetchone()[0]
+    total = cursor.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    if converted != total:
+        logger.warning("Dropped %s %s rows with unparseable timestamps", total - converted, table)
+    cursor.execute(f'DROP TABLE {table}')
+    cursor.execute(f'ALTER TABLE {table}_v3 RENAME TO {table}')
+
+def _migrate_epoch_timestamps(cursor):
+    """v3: store timestamps as integer epoch seconds instead of ISO strings."""
+    _rebuild_with_epoch_timestamps(cursor, 'history', CREATE_HISTORY)
+    _rebuild_with_epoch_timestamps(cursor, 'gpu_history', CREATE_GPU_HISTORY)
+    # Dropping the old tables dropped their indexes
+    _migrate_add_indexes(cursor)
+
+def _migrate_add_rollups(cursor):
+    """v4: 1m/5m/1h/1d rollup tables for history and gpu_history, backfilled from raw rows."""
+    for source, keys, metrics in ROLLUP_SOURCES:
+        for name, seconds in ROLLUP_RESOLUTIONS:
+            table = f'{source}_{name}'
+            cursor.execute(_rollup_create_sql(table, keys, metrics))
+            cursor.execute(_rollup_backfill_sql(source, table, keys, metrics, seconds))
+
+def _migrate_rollup_counts(cursor):
+    """v7: per-metric sample counts in rollups, so missing values no longer count as 0."""
+    for source, keys, metrics in ROLLUP_SOURCES:
+        first = cursor.execute(f'SELECT MIN(timestamp) FROM {source}').fetchone()[0]
+        for name, seconds in ROLLUP_RESOLUTIONS:
+            table = f'{source}_{name}'
+            for m in metrics:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {m}_count INTEGER NOT NULL DEFAULT 0')
+            # Older buckets stored missing values as 0 and counted them; keep their averages as they were
+            cursor.execute(f"UPDATE {table} SET {', '.join(f'{m}_count = samples' for m in metrics)}")
+            if first is None:
+                continue
+            # Buckets that start after the oldest raw row are rebuilt from raw rows
+            start = first - first % seconds + (seconds if first % seconds else 0)
+            cursor.execute(f'DELETE FROM {table} WHERE bucket >= ?', (start,))
+            cursor.execute(_rollup_rebuild_sql(source, table, keys, metrics, seconds), (start,))
+
+def rebuild_rollups(cursor, start=0):
+    """Re-aggregates every rollup table from raw rows, for buckets from `start` (epoch seconds) on."""
+    for source, keys, metrics in ROLLUP_SOURCES:
+        for name, seconds in ROLLUP_RESOLUTIONS:
+            table = f'{source}_{name}'
+            bucket = start - start % seconds
+            cursor.execute(f'DELETE FROM {table} WHERE bucket >= ?', (bucket,))
+            cursor.execute(_rollup_rebuild_sql(source, table, keys, metrics, seconds), (bucket,))
+
+def _migrate_add_pool_stats(cursor):
+    """v5: pool_stats time series written by the profit switcher."""
+    cursor.execute(CREATE_POOL_STATS)
+    # Retention deletes by timestamp across all pools
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pool_stats_timestamp ON pool_stats (timestamp)')
+
+def _migrate_add_pool_switches(cursor):
+    """v6: pool_switches log written by the profit switcher."""
+    cursor.execute(CREATE_POOL_SWITCHES)
+
+# Ordered (version, migration) pairs. Append new migrations; never edit released ones.
+MIGRATIONS = [
+    (1, _migrate_add_columns),
+    (2, _migrate_add_indexes),
+    (3, _migrate_epoch_timestamps),
+    (4, _migrate_add_rollups),
+    (5, _migrate_add_pool_stats),
+    (6, _migrate_add_pool_switches),
+    (7, _migrate_rollup_counts),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn=None):
+    if conn is None:
+        with get_connection() as conn:
+            return conn.execute('PRAGMA user_version').fetchone()[0]
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def _run_migrations(conn):
+    """Applies pending migrations in order, recording each version in PRAGMA user_version."""
+    current = get_schema_version(conn)
+    for version, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info("Applying database migration v%s: %s", version, migration.__doc__)
+        # Explicit BEGIN so DDL statements are part of the migration's transaction
+        conn.execute('BEGIN')
+        try:
+            migration(conn.cursor())
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def _rollup_params(row, key_count, seconds):
+    """Upsert parameters for one raw row: group keys, bucket, then (min, max, sum, count) seeds per metric."""
+    timestamp = row[0]
+    keys = tuple(row[1:1 + key_count]) + (timestamp - timestamp % seconds,)
+    params = []
+    for v in row[1 + key_count:]:
+        params.extend((None, None, None, 0) if v is None else (v, v, v, 1))
+    return keys + tuple(params)
+
+def _update_rollups(conn, history_rows, gpu_rows):
+    for source, rows in (('history', history_rows), ('gpu_history', gpu_rows)):
+        if not rows:
+            continue
+        # Raw gpu_history rows carry gpu_index after the timestamp
+        key_count = 1 if source == 'gpu_history' else 0
+        for name, seconds in ROLLUP_RESOLUTIONS:
+            conn.executemany(ROLLUP_UPSERTS[(source, name)], [_rollup_params(row, key_count, seconds) for row in rows])
+
+def flush():
+    """Writes all buffered samples in a single transaction using batched inserts."""
+    with _writer_lock:
+        if not _write_buffer['samples']:
+            return
+        history_rows = _write_buffer['history']
+        gpu_rows = _write_buffer['gpu_history']
+        conn = _get_writer()
+        try:
+            with conn:
+                conn.executemany(HISTORY_INSERT, history_rows)
+                if gpu_rows:
+                    conn.executemany(GPU_HISTORY_INSERT, gpu_rows)
+                _update_rollups(conn, history_rows, gpu_rows)
+        finally:
+            # Drop the batch even on failure so a bad row cannot wedge the buffer
+            _write_buffer['history'] = []
+            _write_buffer['gpu_history'] = []
+            _write_buffer['samples'] = 0
 
 def log_history(hashrate, avg_temp, avg_fan_speed, accepted_shares, rejected_shares, dual_hashrate=0, total_power_draw=0, gpus=None):
-    now = datetime.now().isoformat()
+    now = int(time.time())
+    with _writer_lock:
+        if not _write_buffer['samples']:
+            _write_buffer['first_sample'] = time.monotonic()
+        _write_buffer['history'].append(
+            (now, hashrate, dual_hashrate, avg_temp, avg_fan_speed, total_power_draw, accepted_shares, rejected_shares)
+        )
+        for gpu in gpus or []:
+            _write_buffer['gpu_history'].append((
+                now,
+                gpu.get('index', 0),
+                gpu.get('hashrate', 0),
+                gpu.get('dual_hashrate', 0),
+                gpu.get('temperature', 0),
+                gpu.get('power_draw', 0),
+                gpu.get('fan_speed', 0),
+                gpu.get('accepted_shares', 0),
+                gpu.get('rejected_shares', 0)
+            ))
+        _write_buffer['samples'] += 1
+
+        if (_write_buffer['samples'] >= DB_WRITE_BUFFER_SIZE
+                or time.monotonic() - _write_buffer['first_sample'] >= DB_FLUSH_INTERVAL):
+            flush()
+
+def log_pool_stats(samples, timestamp=None):
+    """Writes one profit switcher cycle: dicts with pool, effort, fee, erg_price and score."""
+    now = int(time.time() if timestamp is None else timestamp)
+    rows = [(now, s['pool'], s.get('effort'), s.get('fee'), s.get('erg_price'), s.get('score')) for s in samples]
+    if not rows:
+        return
+    with _writer_lock:
+        conn = _get_writer()
+        with conn:
+            conn.executemany(POOL_STATS_INSERT, rows)
+
+def get_pool_stats(days=7, pool=None):
+    """Pool stats samples from the last `days` days, oldest first, optionally for one pool."""
     with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO history (timestamp, hashrate, dual_hashrate, avg_temp, avg_fan_speed, total_power_draw, accepted_shares, rejected_shares)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (now, hashrate, dual_hashrate, avg_temp, avg_fan_speed, total_power_draw, accepted_shares, rejected_shares))
-
-        if gpus:
-            for gpu in gpus:
-                cursor.execute('''
-                    INSERT INTO gpu_history (timestamp, gpu_index, hashrate, dual_hashrate, temperature, power_draw, fan_speed, accepted_shares, rejected_shares)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    now,
-                    gpu.get('index', 0),
-                    gpu.get('hashrate', 0),
-                    gpu.get('dual_hashrate', 0),
-                    gpu.get('temperature', 0),
-                    gpu.get('power_draw', 0),
-                    gpu.get('fan_speed', 0),
-                    gpu.get('accepted_shares', 0),
-                    gpu.get('rejected_shares', 0)
-                ))
-        conn.commit()
+        conn.row_factory = sqlite3.Row
+        if pool is None:
+            cursor = conn.execute(
+                'SELECT * FROM pool_stats WHERE timestamp >= ? ORDER BY timestamp ASC', (_since(days),))
+        else:
+            cursor = conn.execute(
+                'SELECT * FROM pool_stats WHERE pool = ? AND timestamp >= ? ORDER BY timestamp ASC', (pool, _since(days)))
+        return [dict(row) for row in cursor.fetchall()]
+
+def log_pool_switch(from_pool, to_pool, expected_gain=None, timestamp=None):
+    now = int(time.time() if timestamp is None else timestamp)
+    with _writer_lock:
+        conn = _get_writer()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO pool_switches (timestamp, from_pool, to_pool, expected_gain) VALUES (?, ?, ?, ?)',
+                         (now, from_pool, to_pool, expected_gain))
+
+def get_pool_switches(days=30):
+    with get_connection() as conn:
+        conn.row_factory = sqlite3.Row
+        cursor = conn.execute('SELECT * FROM pool_switches WHERE timestamp >= ? ORDER BY timestamp ASC', (_since(days),))
+        return [dict(row) for row in cursor.fetchall()]
+
+def get_hashrate_between(start, end):
+    """(timestamp, hashrate) rows from raw history with start <= timestamp < end, oldest first."""
+    with get_connection() as conn:
+        conn.row_factory = sqlite3.Row
+        cursor = conn.execute(
+            'SELECT timestamp, hashrate FROM history WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp ASC',
+            (int(start), int(end)))
+        return [dict(row) for row in cursor.fetchall()]
+
+def _since(days):
+    """Epoch seconds for the start of a range reaching back `days` days."""
+    return int(time.time() - days * 86400)
 
 def get_history(days=30):
-    since = (datetime.now() - timedelta(days=days)).isoformat()
+    since = _since(days)
     with get_connection() as conn:
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
@@ -99,14 +526,14 @@ def get_history(days=30):
         return [dict(row) for row in rows]
 
 def get_gpu_indices(days=30):
-    since = (datetime.now() - timedelta(days=days)).isoformat()
+    since = _since(days)
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT DISTINCT gpu_index FROM gpu_history WHERE timestamp >= ? ORDER BY gpu_index ASC', (since,))
         return [row[0] for row in cursor.fetchall()]
 
 def get_gpu_history(gpu_index=None, days=30):
-    since = (datetime.now() - timedelta(days=days)).isoformat()
+    since = _since(days)
     with get_connection() as conn:
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
@@ -127,26 +554,167 @@ def get_gpu_history(gpu_index=None, days=30):
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
 
-def prune_history(days=30):
-    since = (datetime.now() - timedelta(days=days)).isoformat()
+# strftime formats for get_history_aggregates(group_by=...), in local time like the dashboard
+AGGREGATE_PERIODS = {
+    'day': '%Y-%m-%d',
+    'hour': '%Y-%m-%d %H:00',
+}
+
+def get_history_aggregates(days=1, group_by=None):
+    """
+    AVG/MIN/MAX/SUM of every history metric over the last `days`, computed in SQL.
+    Keys are samples, <metric>_avg/_min/_max/_sum and efficiency_avg (mean MH/W over
+    all samples; samples without a power reading count as 0, as the weekly report
+    always has). Returns one dict, or with group_by='day'|'hour' a list of dicts with a
+    'period' key, newest first.
+    """
+    aggregates = ', '.join(
+        f'AVG({m}) AS {m}_avg, MIN({m}) AS {m}_min, MAX({m}) AS {m}_max, SUM({m}) AS {m}_sum'
+        for m in HISTORY_METRICS
+    )
+    efficiency = 'AVG(CASE WHEN total_power_draw > 0 THEN hashrate / total_power_draw ELSE 0 END) AS efficiency_avg'
+    with get_connection() as conn:
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        if group_by is None:
+            cursor.execute(f'''
+                SELECT COUNT(*) AS samples, {aggregates}, {efficiency}
+                FROM history
+                WHERE timestamp >= ?
+            ''', (_since(days),))
+            return dict(cursor.fetchone())
+
+        period = AGGREGATE_PERIODS[group_by]
+        cursor.execute(f'''
+            SELECT strftime('{period}', timestamp, 'unixepoch', 'localtime') AS period,
+                   COUNT(*) AS samples, {aggregates}, {efficiency}
+            FROM history
+            WHERE timestamp >= ?
+            GROUP BY period
+            ORDER BY period DESC
+        ''', (_since(days),))
+        return [dict(row) for row in cursor.fetchall()]
+
+def choose_resolution(days, target_points=None):
+    """Finest resolution ('raw' or a rollup name) that covers `days` in at most target_points buckets."""
+    target_points = target_points or HISTORY_TARGET_POINTS
+    span = days * 86400
+    for name, seconds in (('raw', RAW_SAMPLE_INTERVAL),) + ROLLUP_RESOLUTIONS:
+        # Skip tiers whose retention does not reach back far enough
+        if RETENTION_DAYS[name] and RETENTION_DAYS[name] < days:
+            continue
+        if span / seconds <= target_points:
+            return name
+    return ROLLUP_RESOLUTIONS[-1][0]
+
+def _rollup_select(metrics):
+    # Averages keep the raw column names so callers can plot either form unchanged
+    return ', '.join(
+        f'{m}_sum / NULLIF({m}_count, 0) AS {m}, {m}_min, {m}_max' for m in metrics
+    )
+
+def get_history_series(days=30, target_points=None, resolution=None):
+    """
+    History for charts, read from the rollup table picked by choose_resolution.
+    Rollup rows have the raw columns as per-bucket averages plus <metric>_min,
+    <metric>_max and samples; 'timestamp' is the bucket start.
+    """
+    resolution = resolution or choose_resolution(days, target_points)
+    if resolution == 'raw':
+        return get_history(days=days)
     with get_connection() as conn:
+        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
-        cursor.execute('DELETE FROM history WHERE timestamp < ?', (since,))
-        cursor.execute('DELETE FROM gpu_history WHERE timestamp < ?', (since,))
-        conn.commit()
+        cursor.execute(f'''
+            SELECT bucket AS timestamp, samples, {_rollup_select(HISTORY_METRICS)}
+            FROM history_{resolution}
+            WHERE bucket >= ?
+            ORDER BY bucket ASC
+        ''', (_since(days),))
+        return [dict(row) for row in cursor.fetchall()]
 
-def clear_history():
+def get_gpu_history_series(gpu_index, days=30, target_points=None, resolution=None):
+    """Per-GPU counterpart of get_history_series."""
+    resolution = resolution or choose_resolution(days, target_points)
+    if resolution == 'raw':
+        return get_gpu_history(gpu_index=gpu_index, days=days)
     with get_connection() as conn:
+        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
-        cursor.execute('DELETE FROM history')
-        cursor.execute('DELETE FROM gpu_history')
-        conn.commit()
+        cursor.execute(f'''
+            SELECT bucket AS timestamp, gpu_index, samples, {_rollup_select(GPU_HISTORY_METRICS)}
+            FROM gpu_history_{resolution}
+            WHERE gpu_index = ? AND bucket >= ?
+            ORDER BY bucket ASC
+        ''', (gpu_index, _since(days)))
+        return [dict(row) for row in cursor.fetchall()]
+
+def _delete_before(table, key_columns, time_column, cutoff):
+    """Deletes rows older than cutoff in RETENTION_CHUNK_SIZE transactions, releasing the writer between chunks."""
+    keys = ', '.join(key_columns)
+    match = keys if len(key_columns) == 1 else f'({keys})'
+    sql = f'DELETE FROM {table} WHERE {match} IN (SELECT {keys} FROM {table} WHERE {time_column} < ? LIMIT ?)'
+    deleted = 0
+    while True:
+        with _writer_lock:
+            conn = _get_writer()
+            with conn:
+                count = conn.execute(sql, (cutoff, RETENTION_CHUNK_SIZE)).rowcount
+        deleted += count
+        if count < RETENTION_CHUNK_SIZE:
+            return deleted
+
+def prune_history(days=30):
+    """Deletes raw history older than `days`. Rollups are left to apply_retention()."""
+    since = _since(days)
+    flush()
+    _delete_before('history', ('rowid',), 'timestamp', since)
+    _delete_before('gpu_history', ('rowid',), 'timestamp', since)
+
+def apply_retention():
+    """
+    Applies RETENTION_DAYS to raw history and every rollup tier, then returns up
+    to RETENTION_VACUUM_PAGES free pages to the filesystem. Returns rows deleted per table.
+    """
+    flush()
+    deleted = {}
+    for source, keys, _ in ROLLUP_SOURCES:
+        if RETENTION_DAYS['raw']:
+            deleted[source] = _delete_before(source, ('rowid',), 'timestamp', _since(RETENTION_DAYS['raw']))
+        for name, _ in ROLLUP_RESOLUTIONS:
+            if RETENTION_DAYS[name]:
+                table = f'{source}_{name}'
+                deleted[table] = _delete_before(table, keys, 'bucket', _since(RETENTION_DAYS[name]))
+    if RETENTION_DAYS['pool_stats']:
+        deleted['pool_stats'] = _delete_before('pool_stats', ('pool', 'timestamp'), 'timestamp',
+                                               _since(RETENTION_DAYS['pool_stats']))
+
+    with _writer_lock:
+        # executescript steps the pragma to completion; execute() frees a single page
+        _get_writer().executescript(f'PRAGMA incremental_vacuum({int(RETENTION_VACUUM_PAGES)});')
+    return deleted
+
+def clear_history():
+    with _writer_lock:
+        _write_buffer['history'] = []
+        _write_buffer['gpu_history'] = []
+        _write_buffer['samples'] = 0
+        conn = _get_writer()
+        with conn:
+            for source, _, _ in ROLLUP_SOURCES:
+                conn.execute(f'DELETE FROM {source}')
+                for name, _ in ROLLUP_RESOLUTIONS:
+                    conn.execute(f'DELETE FROM {source}_{name}')
 
 def export_history_to_csv(filepath, days=30):
     history = get_history(days=days)
     if not history:
         return False
 
+    # Exported files keep human-readable local timestamps
+    for entry in history:
+        entry['timestamp'] = datetime.fromtimestamp(entry['timestamp']).isoformat()
+
     try:
         keys = history[0].keys()
         with open(filepath, 'w', newline='') as f:
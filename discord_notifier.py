@@ -1,18 +1,21 @@
 import os
 import logging
-import requests
+import http_client
+import logging_setup
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+logging_setup.configure()
 logger = logging.getLogger("discord_notifier")
 
 DISCORD_ENABLE = os.getenv('DISCORD_ENABLE', 'false').lower() == 'true'
 DISCORD_WEBHOOK_URL = os.getenv('DISCORD_WEBHOOK_URL')
 DISCORD_NOTIFY_THRESHOLD = int(os.getenv('DISCORD_NOTIFY_THRESHOLD', 300))
 
-def send_discord_notification(message: str) -> None:
+DISCORD_RATE_LIMIT = float(os.getenv('DISCORD_RATE_LIMIT', 30))
+# Discord rejects message content longer than this
+DISCORD_MAX_LENGTH = 2000
+
+def post_discord_message(message: str) -> None:
+    """Posts one message to the webhook, raising on failure so the dispatcher can retry."""
     if not DISCORD_ENABLE or not DISCORD_WEBHOOK_URL:
         return
 
@@ -21,9 +24,12 @@ def send_discord_notification(message: str) -> None:
         "username": "Ergo Miner Monitor"
     }
 
+    response = http_client.post(DISCORD_WEBHOOK_URL, json=payload)
+    response.raise_for_status()
+    logger.info("Discord notification sent successfully")
+
+def send_discord_notification(message: str) -> None:
     try:
-        response = requests.post(DISCORD_WEBHOOK_URL, json=payload, timeout=10)
-        response.raise_for_status()
-        logger.info("Discord notification sent successfully")
+        post_discord_message(message)
     except Exception as e:
-        logger.error(f"Failed to send Discord notification: {e}")
+        logger.error("Failed to send Discord notification: %s", e)
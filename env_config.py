@@ -1,12 +1,12 @@
 import os
-from typing import Dict
+from typing import Dict, Optional
 
 def get_env_file_path() -> str:
     return os.path.join(os.getenv('DATA_DIR', '.'), '.env')
 
-def read_env_file() -> Dict[str, str]:
+def read_env_file(env_file: Optional[str] = None) -> Dict[str, str]:
     env_vars = {}
-    env_file = get_env_file_path()
+    env_file = env_file or get_env_file_path()
     if os.path.exists(env_file):
         with open(env_file, 'r') as f:
             for line in f:
@@ -18,9 +18,9 @@ def read_env_file() -> Dict[str, str]:
                         env_vars[key] = value
     return env_vars
 
-def write_env_file(env_vars: Dict[str, str]) -> None:
+def write_env_file(env_vars: Dict[str, str], env_file: Optional[str] = None) -> None:
     lines = []
-    env_file = get_env_file_path()
+    env_file = env_file or get_env_file_path()
     if os.path.exists(env_file):
         with open(env_file, 'r') as f:
             lines = f.readlines()
@@ -41,5 +41,15 @@ def write_env_file(env_vars: Dict[str, str]) -> None:
         if key not in keys_written:
             new_lines.append(f"{key}={value}\n")
 
-    with open(env_file, 'w') as f:
+    # Replace the file in one step so watchers never read a half-written file
+    tmp_file = f"{env_file}.tmp"
+    # .env holds bot tokens and webhook URLs: keep the original file's mode (0600 for a new file)
+    try:
+        mode = os.stat(env_file).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o600
+    fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.fchmod(fd, mode)
+    with os.fdopen(fd, 'w') as f:
         f.writelines(new_lines)
+    os.replace(tmp_file, env_file)
@@ -0,0 +1,302 @@
+"""
+GPU hardware snapshot layer.
+
+Runs a single combined nvidia-smi (or rocm-smi) query covering index, name,
+temperature, power, fan and clocks, and shares the result between all callers
+in the process for SMI_CACHE_TTL seconds. The SMI tool is detected once.
+
+Long-running processes can instead start an SmiSampler, which keeps one
+nvidia-smi child in loop mode and parses its streamed rows into a ring buffer
+of per-GPU readings, so snapshots are served without spawning a process.
+"""
+import os
+import re
+import csv
+import time
+import shutil
+import logging
+import threading
+import atexit
+import subprocess
+from collections import deque
+from typing import List, Dict, Any, Optional, Deque
+
+logger = logging.getLogger("gpu_hardware")
+
+SMI_CACHE_TTL = float(os.getenv('SMI_CACHE_TTL', 5))
+SMI_STREAMING = os.getenv('SMI_STREAMING', 'true').lower() == 'true'
+SMI_SAMPLE_INTERVAL_MS = int(os.getenv('SMI_SAMPLE_INTERVAL_MS', 1000))
+SMI_SAMPLER_HISTORY = int(os.getenv('SMI_SAMPLER_HISTORY', 300))
+SAMPLER_RESTART_DELAY = 5.0
+
+NVIDIA_QUERY_FIELDS = ['index', 'name', 'temperature.gpu', 'power.draw', 'fan.speed', 'clocks.sm', 'clocks.mem']
+NVIDIA_QUERY_CMD = ['nvidia-smi', f"--query-gpu={','.join(NVIDIA_QUERY_FIELDS)}", '--format=csv,noheader,nounits']
+ROCM_QUERY_CMD = ['rocm-smi', '--showproductname', '--showtemp', '--showpower', '--showfan', '--showclocks', '--csv']
+
+_NUMBER_RE = re.compile(r'-?\d+(?:\.\d+)?')
+
+_smi_tool: Optional[str] = None
+_smi_tool_detected = False
+
+_sampler: Optional['SmiSampler'] = None
+
+_snapshot_lock = threading.Lock()
+_snapshot_cache: Dict[str, Any] = {
+    'gpus': [],
+    'timestamp': 0.0
+}
+
+def detect_smi_tool(refresh: bool = False) -> Optional[str]:
+    """Returns 'nvidia', 'rocm' or None. The lookup is done once per process."""
+    global _smi_tool, _smi_tool_detected
+    if _smi_tool_detected and not refresh:
+        return _smi_tool
+
+    if shutil.which('nvidia-smi'):
+        _smi_tool = 'nvidia'
+    elif shutil.which('rocm-smi'):
+        _smi_tool = 'rocm'
+    else:
+        _smi_tool = None
+    _smi_tool_detected = True
+    logger.info("Detected GPU SMI tool: %s", _smi_tool or 'none')
+    return _smi_tool
+
+def _to_float(value: Any) -> float:
+    """Extracts the first number from an SMI field ('[N/A]' and friends become 0)."""
+    match = _NUMBER_RE.search(str(value))
+    return float(match.group(0)) if match else 0.0
+
+def _empty_reading(index: int) -> Dict[str, Any]:
+    return {'index': index, 'name': '', 'temperature': 0.0, 'power_draw': 0.0,
+            'fan_speed': 0.0, 'core_clock': 0.0, 'mem_clock': 0.0}
+
+def parse_nvidia_row(line: str, position: Optional[int] = 0) -> Optional[Dict[str, Any]]:
+    """
+    Parses one CSV row of the combined nvidia-smi query. A row without a readable
+    index becomes an empty reading for GPU `position`, or is skipped if position is None.
+    """
+    if not line.strip():
+        return None
+    parts = [p.strip() for p in line.split(',')]
+    try:
+        index = int(parts[0])
+    except (ValueError, IndexError):
+        return _empty_reading(position) if position is not None else None
+    # GPU names may contain commas; every other field is numeric
+    extra = len(parts) - len(NVIDIA_QUERY_FIELDS)
+    name = ', '.join(parts[1:2 + max(extra, 0)])
+    values = parts[2 + max(extra, 0):]
+    values += [''] * (5 - len(values))
+    return {
+        'index': index,
+        'name': name,
+        'temperature': _to_float(values[0]),
+        'power_draw': _to_float(values[1]),
+        'fan_speed': _to_float(values[2]),
+        'core_clock': _to_float(values[3]),
+        'mem_clock': _to_float(values[4])
+    }
+
+def parse_nvidia_output(output: str) -> List[Dict[str, Any]]:
+    gpus = []
+    for line in output.strip().split('\n'):
+        reading = parse_nvidia_row(line, len(gpus))
+        if reading is not None:
+            gpus.append(reading)
+    return gpus
+
+def _find_column(header: List[str], *keywords: str) -> Optional[str]:
+    for column in header:
+        lowered = column.lower()
+        if all(k in lowered for k in keywords):
+            return column
+    return None
+
+def parse_rocm_output(output: str) -> List[Dict[str, Any]]:
+    """Parses rocm-smi CSV output. Columns are matched by header name as they vary between ROCm versions."""
+    lines = [line for line in output.strip().split('\n') if line.strip()]
+    if not lines:
+        return []
+    reader = csv.DictReader(lines)
+    header = reader.fieldnames or []
+    columns = {
+        'name': _find_column(header, 'card series') or _find_column(header, 'product name'),
+        'temperature': _find_column(header, 'temperature', 'edge') or _find_column(header, 'temperature'),
+        'power_draw': _find_column(header, 'power'),
+        'fan_speed': _find_column(header, 'fan', '%') or _find_column(header, 'fan'),
+        'core_clock': _find_column(header, 'sclk'),
+        'mem_clock': _find_column(header, 'mclk')
+    }
+
+    gpus = []
+    for row in reader:
+        reading = _empty_reading(len(gpus))
+        device = row.get(header[0], '') if header else ''
+        match = re.search(r'\d+', device)
+        if match:
+            reading['index'] = int(match.group(0))
+        for key, column in columns.items():
+            if column is None:
+                continue
+            if key == 'name':
+                reading['name'] = (row.get(column) or '').strip()
+            else:
+                reading[key] = _to_float(row.get(column, ''))
+        gpus.append(reading)
+    return gpus
+
+def query_hardware() -> List[Dict[str, Any]]:
+    """Runs one combined SMI query and returns per-GPU readings (uncached)."""
+    tool = detect_smi_tool()
+    if tool is None:
+        return []
+    try:
+        if tool == 'nvidia':
+            output = subprocess.check_output(NVIDIA_QUERY_CMD, stderr=subprocess.DEVNULL).decode()
+            return parse_nvidia_output(output)
+        output = subprocess.check_output(ROCM_QUERY_CMD, stderr=subprocess.DEVNULL).decode()
+        return parse_rocm_output(output)
+    except (subprocess.CalledProcessError, FileNotFoundError, OSError) as e:
+        logger.warning("SMI query failed: %s", e)
+        return []
+
+def get_hardware_snapshot(max_age: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Returns the latest per-GPU hardware readings, re-querying the SMI tool only
+    when the shared snapshot is older than max_age (defaults to SMI_CACHE_TTL).
+    """
+    ttl = SMI_CACHE_TTL if max_age is None else max_age
+    if _sampler is not None:
+        streamed = _sampler.latest()
+        if streamed:
+            return streamed
+
+    with _snapshot_lock:
+        if _snapshot_cache['timestamp'] and time.monotonic() - _snapshot_cache['timestamp'] < ttl:
+            return [dict(g) for g in _snapshot_cache['gpus']]
+
+        gpus = query_hardware()
+        _snapshot_cache['gpus'] = gpus
+        _snapshot_cache['timestamp'] = time.monotonic()
+        return [dict(g) for g in gpus]
+
+def invalidate_snapshot() -> None:
+    """Forces the next get_hardware_snapshot() call to query the hardware."""
+    with _snapshot_lock:
+        _snapshot_cache['gpus'] = []
+        _snapshot_cache['timestamp'] = 0.0
+
+class SmiSampler:
+    """
+    Keeps one `nvidia-smi --loop-ms` child running and parses its CSV rows
+    incrementally into a bounded per-GPU ring buffer of readings.
+    """
+
+    def __init__(self, command: Optional[List[str]] = None, history: int = SMI_SAMPLER_HISTORY,
+                 interval_ms: int = SMI_SAMPLE_INTERVAL_MS):
+        self.command = command or NVIDIA_QUERY_CMD + [f'--loop-ms={interval_ms}']
+        self.interval = interval_ms / 1000.0
+        # A reading older than a few sample periods means the stream has stalled
+        self.max_age = max(3 * self.interval, 3.0)
+        self.history = history
+        self._buffers: Dict[int, Deque[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._process: Optional[subprocess.Popen] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='smi-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        process = self._process
+        if process and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self._thread:
+            self._thread.join(timeout=3)
+
+    def is_running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                                 text=True, bufsize=1)
+                logger.info("SMI sampler started: %s", ' '.join(self.command))
+                for line in self._process.stdout:
+                    self._ingest(line)
+                    if self._stop.is_set():
+                        break
+            except (FileNotFoundError, OSError) as e:
+                logger.error("SMI sampler could not start: %s", e)
+            finally:
+                if self._process and self._process.poll() is None:
+                    self._process.terminate()
+                if self._process and self._process.stdout:
+                    self._process.stdout.close()
+            if self._stop.is_set():
+                break
+            logger.warning("SMI sampler exited, restarting in %ss", SAMPLER_RESTART_DELAY)
+            self._stop.wait(SAMPLER_RESTART_DELAY)
+
+    def _ingest(self, line: str) -> None:
+        # A streamed row has no position to fall back on; guessing one would overwrite another GPU
+        reading = parse_nvidia_row(line, position=None)
+        if reading is None:
+            return
+        reading['timestamp'] = time.time()
+        with self._lock:
+            buffer = self._buffers.get(reading['index'])
+            if buffer is None:
+                buffer = self._buffers[reading['index']] = deque(maxlen=self.history)
+            buffer.append(reading)
+
+    def latest(self) -> List[Dict[str, Any]]:
+        """
+        Returns the most recent reading of every GPU still in the stream. GPUs that
+        stopped reporting are left out; [] means the whole stream is stale.
+        """
+        now = time.time()
+        with self._lock:
+            readings = [dict(buffer[-1]) for _, buffer in sorted(self._buffers.items()) if buffer]
+        return [r for r in readings if now - r['timestamp'] <= self.max_age]
+
+    def get_history(self, gpu_index: int) -> List[Dict[str, Any]]:
+        """Returns the buffered readings of one GPU, oldest first."""
+        with self._lock:
+            return [dict(r) for r in self._buffers.get(gpu_index, [])]
+
+def start_sampler(command: Optional[List[str]] = None) -> Optional[SmiSampler]:
+    """
+    Starts the process-wide streaming sampler. Only nvidia-smi supports loop mode;
+    other setups keep using on-demand snapshots.
+    """
+    global _sampler
+    if _sampler is not None:
+        return _sampler
+    if command is None and (not SMI_STREAMING or detect_smi_tool() != 'nvidia'):
+        return None
+    _sampler = SmiSampler(command)
+    _sampler.start()
+    atexit.register(stop_sampler)
+    return _sampler
+
+def stop_sampler() -> None:
+    global _sampler
+    if _sampler is not None:
+        _sampler.stop()
+        _sampler = None
+
+def get_sampler() -> Optional[SmiSampler]:
+    return _sampler
@@ -7,6 +7,11 @@ STATE_FILE=${HEALTHCHECK_STATE_FILE:-/tmp/miner_unhealthy_since}
 MAX_UNHEALTHY_TIME=300 # 5 minutes in seconds
 GPU_DEVICES=${GPU_DEVICES:-AUTO}
 
+# Restarts go through the shared coordinator (lock, debounce, backoff, crash-loop protection)
+request_restart() {
+    python3 restart_coordinator.py --source healthcheck --reason "$1"
+}
+
 # 1. Query the metrics server
 METRICS=$(curl -s --fail "$METRICS_URL")
 if [ $? -ne 0 ]; then
@@ -52,7 +57,7 @@ fi
 if [ -n "$NODE_SYNCED" ] && [ "$(awk -v ns="$NODE_SYNCED" 'BEGIN {if (ns == 0) print "1"; else print "0"}')" = "1" ]; then
     if [ -n "$PROCESS_NAME" ] && pgrep -x "$PROCESS_NAME" > /dev/null; then
         echo "Node went out of sync while mining! Triggering restart to pause."
-        ./restart.sh
+        request_restart "Node out of sync"
         exit 1
     else
         echo "Node is not synced, but miner is not running. Waiting for sync..."
@@ -69,7 +74,7 @@ if [ "$GPU_DEVICES" != "AUTO" ] && [ -n "$GPU_COUNT" ]; then
 
     if [ "$IS_COUNT_OK" = "0" ]; then
         echo "GPU count mismatch! Expected: $EXPECTED_GPU_COUNT, Actual: $GPU_COUNT"
-        ./restart.sh
+        request_restart "GPU count mismatch ($GPU_COUNT/$EXPECTED_GPU_COUNT)"
         exit 1
     fi
 fi
@@ -88,7 +93,7 @@ if [ -n "$ACCEPTED_SHARES" ] && [ -n "$REJECTED_SHARES" ]; then
             echo "  Total: $TOTAL_SHARES"
             echo "  Ratio: $REJECT_RATIO% (Threshold: 10%)"
             echo "Triggering automated restart..."
-            ./restart.sh
+            request_restart "Rejected share ratio $REJECT_RATIO%"
             exit 1
         else
             echo "Health check: Share ratio healthy ($REJECT_RATIO% rejected)."
@@ -120,7 +125,7 @@ else
     if [ "$ELAPSED" -ge "$MAX_UNHEALTHY_TIME" ]; then
         echo "Miner has been unhealthy for $ELAPSED seconds (exceeds $MAX_UNHEALTHY_TIME). Restarting..."
         rm -f "$STATE_FILE"
-        ./restart.sh
+        request_restart "Unhealthy for $ELAPSED seconds"
         exit 1
     else
         echo "Miner has been unhealthy for $ELAPSED seconds. (Grace period: $MAX_UNHEALTHY_TIME)"
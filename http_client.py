@@ -0,0 +1,107 @@
+"""
+Shared pooled HTTP client.
+
+Every outbound HTTP call goes through one keep-alive session per host so the
+TCP connection (and TLS handshake for external APIs) is reused between calls.
+Timeouts, retries and pool sizes are configured per host in HOST_POLICIES.
+"""
+import os
+import threading
+import logging
+from typing import Dict, Any
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger("http_client")
+
+# Worst case for one call is about timeout * (retries + 1) plus the backoff sleeps
+# (backoff * 2 ** (n - 1) before retry n, none before the first retry). Keep it near
+# the 10 s a single request could take before requests went through this module.
+
+# Fallback policy for hosts not listed below (e.g. pool APIs or a remote node): 2 x 5 s = 10 s
+DEFAULT_POLICY: Dict[str, Any] = {
+    'timeout': 5,
+    'retries': 1,
+    'backoff': 0.5,
+    'pool_maxsize': 4
+}
+
+_LOCAL_POLICY: Dict[str, Any] = {
+    # Miner APIs: fail fast, miner_api does its own retry loop
+    'timeout': 2,
+    'retries': 0,
+    'backoff': 0,
+    'pool_maxsize': int(os.getenv('MINER_API_MAX_WORKERS', 16))
+}
+
+# Worst cases: local miner APIs 2 s, external APIs 2 x 4 s = 8 s
+HOST_POLICIES: Dict[str, Dict[str, Any]] = {
+    'localhost': _LOCAL_POLICY,
+    '127.0.0.1': _LOCAL_POLICY,
+    'api.telegram.org': {'timeout': 4, 'retries': 1, 'backoff': 0.5, 'pool_maxsize': 2},
+    'discord.com': {'timeout': 4, 'retries': 1, 'backoff': 0.5, 'pool_maxsize': 2},
+    'api.coingecko.com': {'timeout': 4, 'retries': 1, 'backoff': 0.5, 'pool_maxsize': 2},
+}
+
+# Only idempotent requests are retried after the request was sent;
+# connection failures are retried for every method.
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+def get_policy(url: str) -> Dict[str, Any]:
+    """Returns the connection policy for the host of the given URL."""
+    host = (urlsplit(url).hostname or '').lower()
+    return HOST_POLICIES.get(host, DEFAULT_POLICY)
+
+def _build_session(policy: Dict[str, Any]) -> requests.Session:
+    retry = Retry(
+        total=policy['retries'],
+        connect=policy['retries'],
+        read=policy['retries'],
+        status=policy['retries'],
+        backoff_factor=policy['backoff'],
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=policy['pool_maxsize'], max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def get_session(url: str) -> requests.Session:
+    """Returns the keep-alive session dedicated to the scheme and host of the URL."""
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}".lower()
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = _build_session(get_policy(url))
+                _sessions[key] = session
+                logger.debug("Opened pooled HTTP session for %s", key)
+    return session
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """Sends a request through the pooled session, applying the host's default timeout."""
+    kwargs.setdefault('timeout', get_policy(url)['timeout'])
+    return get_session(url).request(method, url, **kwargs)
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request('GET', url, **kwargs)
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request('POST', url, **kwargs)
+
+def close_all() -> None:
+    """Closes every pooled session and its connections."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,264 @@
+"""
+Fast access to the log files in DATA_DIR for the dashboard.
+
+- tail_lines() reads fixed-size blocks backwards from the end of a file until
+  it has the last N lines, so its cost does not depend on the file size.
+- search() scans a log and its rotated copies (miner.log.1, miner.log.2.gz, ...)
+  with a compiled regex over an mmap (or the decompressed bytes of a .gz),
+  jumping from match to match instead of decoding every line. Results can be
+  narrowed by log level and by the timestamp at the start of each line.
+- LineIndex records the offset of every LINE_INDEX_STRIDE-th line. Any page of
+  lines is then one seek plus at most one stride of lines, and the index is
+  extended incrementally as the log grows. Indexes are cached per file.
+"""
+import os
+import re
+import gzip
+import mmap
+import logging
+import threading
+from array import array
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional
+
+logger = logging.getLogger("log_access")
+
+# Block size for backward reads in tail_lines()
+TAIL_BLOCK_SIZE = 64 * 1024
+# One offset is kept per this many lines (8 bytes per stride)
+LINE_INDEX_STRIDE = 1000
+# Rotated copies looked for next to a log (logrotate.conf keeps 3)
+MAX_ROTATIONS = int(os.getenv('LOG_ROTATIONS', 3))
+# Default cap on search results; the most recent matches are kept
+SEARCH_LIMIT = 500
+
+LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+# First level word on a line; miners print WARN, the Python services WARNING
+LEVEL_RE = re.compile(rb'\b(DEBUG|INFO|WARN(?:ING)?|ERROR|CRITICAL)\b')
+# At the start of a line: '{"time": "2024-05-01 12:00:00,123", ...' (JSON service logs, see logging_setup),
+# "2024-05-01 12:00:00,123 - ..." (text service logs) or "[2024-05-01 12:00:00] ..."
+TIMESTAMP_RE = re.compile(rb'(?:\{"time": ")?\[?(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}:\d{2})')
+# Matches at the start of every line, for searches with no pattern or level filter
+ANY_LINE_RE = re.compile(rb'^', re.MULTILINE)
+
+def tail_lines(path: str, n: int, block_size: int = TAIL_BLOCK_SIZE) -> List[str]:
+    """The last n lines of a file, reading only as many blocks from the end as needed."""
+    if n <= 0:
+        return []
+    with open(path, 'rb') as f:
+        pos = f.seek(0, os.SEEK_END)
+        end = pos
+        blocks: List[bytes] = []
+        newlines = 0
+        # n lines need n + 1 newlines before them (the last one may be unterminated)
+        while pos > 0 and newlines <= n:
+            size = min(block_size, pos)
+            pos -= size
+            f.seek(pos)
+            block = f.read(size)
+            blocks.append(block)
+            newlines += block.count(b'\n')
+    data = b''.join(reversed(blocks))
+    lines = data.splitlines()
+    if pos > 0 and lines:
+        # The first line was cut by the block boundary
+        lines = lines[1:]
+    logger.debug("Read %d of %d bytes from %s for %d lines", len(data), end, path, n)
+    return [line.decode('utf-8', errors='replace') for line in lines[-n:]]
+
+def rotated_files(path: str, rotations: int = MAX_ROTATIONS) -> List[str]:
+    """The log and its rotated copies that exist, oldest first."""
+    files = []
+    for i in range(rotations, 0, -1):
+        for candidate in (f"{path}.{i}.gz", f"{path}.{i}"):
+            if os.path.exists(candidate):
+                files.append(candidate)
+                break
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+def _timestamp(line: bytes) -> Optional[str]:
+    match = TIMESTAMP_RE.match(line)
+    if not match:
+        return None
+    return f"{match.group(1).decode()} {match.group(2).decode()}"
+
+def _level(line: bytes) -> Optional[str]:
+    match = LEVEL_RE.search(line)
+    if not match:
+        return None
+    level = match.group(1).decode()
+    return 'WARNING' if level == 'WARN' else level
+
+def _search_buffer(buf, finder: 're.Pattern', levels: Optional[frozenset], since: Optional[str],
+                   until: Optional[str], limit: int) -> deque:
+    """Last `limit` matching lines of buf (bytes or mmap), as (time, level, line) tuples."""
+    results: deque = deque(maxlen=limit)
+    size = len(buf)
+    pos = 0
+    while pos < size:
+        match = finder.search(buf, pos)
+        if not match:
+            break
+        start = buf.rfind(b'\n', 0, match.start()) + 1
+        end = buf.find(b'\n', match.start())
+        if end == -1:
+            end = size
+        # Continue after this line, so a line is reported once however often it matches
+        pos = end + 1
+        line = buf[start:end]
+        level = _level(line)
+        if levels is not None and level not in levels:
+            continue
+        timestamp = _timestamp(line)
+        if since is not None or until is not None:
+            if timestamp is None:
+                continue
+            if (since is not None and timestamp < since) or (until is not None and timestamp > until):
+                continue
+        results.append((timestamp, level, line))
+    return results
+
+def search(path: str, pattern: Optional[str] = None, levels: Optional[Iterable[str]] = None,
+           since: Optional[datetime] = None, until: Optional[datetime] = None,
+           include_rotated: bool = True, ignore_case: bool = True,
+           limit: int = SEARCH_LIMIT) -> List[Dict[str, Any]]:
+    """
+    Lines of a log (and its rotated copies) that match all given filters, oldest
+    first. At most `limit` results are returned; the most recent are kept.
+    Time filters only match lines that start with a timestamp. Raises re.error
+    for an invalid pattern.
+    """
+    if pattern:
+        finder = re.compile(pattern.encode(), re.IGNORECASE if ignore_case else 0)
+    elif levels:
+        # Jump straight to lines mentioning a wanted level instead of visiting every line
+        words = [rb'WARN(?:ING)?' if level.upper() == 'WARNING' else re.escape(level.upper().encode()) for level in levels]
+        finder = re.compile(rb'\b(?:' + b'|'.join(words) + rb')\b')
+    else:
+        finder = ANY_LINE_RE
+    wanted = frozenset(level.upper() for level in levels) if levels else None
+    since_key = since.strftime('%Y-%m-%d %H:%M:%S') if since else None
+    until_key = until.strftime('%Y-%m-%d %H:%M:%S') if until else None
+
+    files = rotated_files(path) if include_rotated else ([path] if os.path.exists(path) else [])
+    results: List[Dict[str, Any]] = []
+    # Newest file first, so the scan can stop once the limit is reached
+    for filepath in reversed(files):
+        remaining = limit - len(results)
+        if remaining <= 0:
+            break
+        try:
+            matches = _search_file(filepath, finder, wanted, since_key, until_key, remaining)
+        except OSError as e:
+            logger.warning("Could not search %s: %s", filepath, e)
+            continue
+        name = os.path.basename(filepath)
+        results = [{'file': name, 'time': timestamp, 'level': level, 'line': line.decode('utf-8', errors='replace')}
+                   for timestamp, level, line in matches] + results
+    return results
+
+def _search_file(filepath: str, finder, levels, since, until, limit) -> deque:
+    if filepath.endswith('.gz'):
+        with gzip.open(filepath, 'rb') as f:
+            return _search_buffer(f.read(), finder, levels, since, until, limit)
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return deque()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _search_buffer(mm, finder, levels, since, until, limit)
+
+class LineIndex:
+    """
+    Sparse line-offset index of one (growing) log file. offsets[k] is the byte
+    offset of line k * stride. refresh() indexes only what was appended since
+    the last call, and starts over if the file was replaced or truncated.
+    """
+
+    def __init__(self, path: str, stride: int = LINE_INDEX_STRIDE):
+        self.path = path
+        self.stride = stride
+        self.offsets = array('Q', [0])
+        # Complete lines counted so far, and the offset just past the last of them
+        self.lines = 0
+        self.indexed_to = 0
+        self.size = 0
+        self.inode: Optional[int] = None
+        self._stride_re = re.compile(rb'(?:[^\n]*\n){%d}' % stride)
+        self._lock = threading.Lock()
+
+    def _reset(self) -> None:
+        self.offsets = array('Q', [0])
+        self.lines = 0
+        self.indexed_to = 0
+
+    def refresh(self) -> 'LineIndex':
+        with self._lock:
+            with open(self.path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                if st.st_ino != self.inode or st.st_size < self.indexed_to:
+                    self._reset()
+                    self.inode = st.st_ino
+                self.size = st.st_size
+                if self.size == self.indexed_to:
+                    return self
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    # Resume from the last full stride; the lines after it are re-counted
+                    pos = self.offsets[-1]
+                    self.lines = (len(self.offsets) - 1) * self.stride
+                    while True:
+                        match = self._stride_re.match(mm, pos)
+                        if not match:
+                            break
+                        pos = match.end()
+                        self.lines += self.stride
+                        self.offsets.append(pos)
+                    rest = mm[pos:self.size]
+                    complete = rest.count(b'\n')
+                    self.lines += complete
+                    self.indexed_to = pos + rest.rfind(b'\n') + 1 if complete else pos
+        return self
+
+    @property
+    def line_count(self) -> int:
+        """Lines in the file, counting an unterminated last line."""
+        return self.lines + (1 if self.size > self.indexed_to else 0)
+
+    def read_lines(self, start: int, count: int) -> List[str]:
+        """Lines start .. start + count - 1 (0-based), as of the last refresh()."""
+        start = max(0, start)
+        count = min(count, self.line_count - start)
+        if count <= 0:
+            return []
+        with open(self.path, 'rb') as f:
+            f.seek(self.offsets[start // self.stride])
+            for _ in range(start % self.stride):
+                f.readline()
+            lines = []
+            while len(lines) < count:
+                line = f.readline()
+                if not line:
+                    break
+                lines.append(line.rstrip(b'\r\n').decode('utf-8', errors='replace'))
+        return lines
+
+    def page(self, number: int, page_size: int) -> List[str]:
+        """Page `number` (0-based) of the file, page_size lines per page."""
+        return self.read_lines(number * page_size, page_size)
+
+    def page_count(self, page_size: int) -> int:
+        return max(1, -(-self.line_count // page_size))
+
+_indexes: Dict[str, LineIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_index(path: str) -> LineIndex:
+    """The cached, refreshed line index of a file."""
+    path = os.path.abspath(path)
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = LineIndex(path)
+    return index.refresh()
@@ -1,118 +1,372 @@
 import os
-import time
 import re
+import glob
+import json
+import time
+import fnmatch
 import logging
-import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional, Tuple
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+import restart_coordinator
+import logging_setup
+
+logging_setup.configure()
 logger = logging.getLogger("log_monitor")
 
 DATA_DIR = os.getenv('DATA_DIR', '/app/data')
 LOG_PATTERN = os.getenv('LOG_PATTERN', 'miner*.log')
-RESTART_SCRIPT = os.getenv('RESTART_SCRIPT', './restart.sh')
-ERROR_PATTERN = re.compile(
-    r'out of memory|illegal instruction|CUDA error|GPU fell off the bus|an illegal memory access was encountered',
-    re.IGNORECASE
-)
+# Byte offsets of the monitored logs, so a restarted monitor resumes where it stopped
+OFFSETS_FILE = os.getenv('LOG_MONITOR_OFFSETS', os.path.join(DATA_DIR, 'log_monitor_offsets.json'))
+# Offsets are saved at most this often (and right before any restart is triggered)
+OFFSET_SAVE_INTERVAL = 5
+# New log data is read in chunks of this size; memory use stays bounded however large a burst is
+READ_CHUNK_SIZE = 64 * 1024
+# Longest partial line carried over between chunks; the start of a longer line is dropped
+MAX_LINE_LENGTH = 64 * 1024
+# A log is read at most once per this many seconds however many write events arrive
+READ_INTERVAL = float(os.getenv('LOG_READ_INTERVAL', 0.5))
+
+# Error type -> pattern, most specific first: a line is classified by the first type that matches.
+# Patterns are matched against lowercased text, so they must be lowercase.
+ERROR_TYPES = {
+    'out_of_memory': r'out of memory',
+    'illegal_memory_access': r'an illegal memory access was encountered',
+    'illegal_instruction': r'illegal instruction',
+    'gpu_lost': r'gpu fell off the bus',
+    'cuda_error': r'cuda error',
+}
+
+class ErrorMatcher:
+    """
+    Finds error lines in raw log bytes. One combined, precompiled regex scans
+    whole chunks; only the (rare) matching lines are decoded and classified.
+    Chunks are lowercased once instead of matching with re.IGNORECASE, which is
+    several times slower on alternations.
+    """
+
+    def __init__(self, error_types: Dict[str, str] = ERROR_TYPES):
+        self.combined = re.compile(b'|'.join(f'(?:{pattern})'.encode() for pattern in error_types.values()))
+        self.types = [(name, re.compile(pattern)) for name, pattern in error_types.items()]
+
+    def classify(self, line: str) -> Optional[str]:
+        line = line.lower()
+        for name, pattern in self.types:
+            if pattern.search(line):
+                return name
+        return None
+
+    def scan(self, data: bytes) -> Iterator[Tuple[str, str]]:
+        """Yields (error type, line) for each line of `data` containing an error, once per line."""
+        line_end = -1
+        for match in self.combined.finditer(data.lower()):
+            if match.start() < line_end:
+                continue
+            line_start = data.rfind(b'\n', 0, match.start()) + 1
+            line_end = data.find(b'\n', match.end())
+            if line_end < 0:
+                line_end = len(data)
+            line = data[line_start:line_end].decode('utf-8', errors='replace').strip()
+            yield self.classify(line) or 'cuda_error', line
+
+class LogTail:
+    """
+    Follows one open log file by byte offset. The file stays open, so data
+    written before a rename or delete is still read; inode and size are cached
+    and the file is only fstat'ed when a read finds nothing new (copytruncate).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+        self.inode: Optional[int] = None
+        self.size = 0
+        self.carry = b''
+        self.file = None
+
+    @property
+    def committed_offset(self) -> int:
+        """Offset of the first byte not yet scanned as part of a complete line."""
+        return self.offset - len(self.carry)
+
+    def open(self) -> 'LogTail':
+        self.file = open(self.path, 'rb')
+        st = os.fstat(self.file.fileno())
+        self.inode, self.size = st.st_ino, st.st_size
+        return self
+
+    def seek(self, offset: int) -> None:
+        # A saved offset past the end means the file was truncated since
+        self.offset = offset if offset <= self.size else 0
+        self.carry = b''
+        self.file.seek(self.offset)
+
+    def read_chunks(self, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+        """Yields new data up to the last complete line, one chunk at a time."""
+        if self.file is None:
+            self.open()
+        read_any = False
+        while True:
+            chunk = self.file.read(chunk_size)
+            if not chunk:
+                break
+            read_any = True
+            self.offset += len(chunk)
+            data = self.carry + chunk
+            end = data.rfind(b'\n') + 1
+            self.carry = data[end:]
+            if len(self.carry) > MAX_LINE_LENGTH:
+                self.carry = self.carry[-MAX_LINE_LENGTH:]
+            if end:
+                yield data[:end]
+        self.size = max(self.size, self.offset)
+
+        if not read_any:
+            # Modified but nothing to read: copytruncate emptied the file under us
+            size = os.fstat(self.file.fileno()).st_size
+            if size < self.offset:
+                logger.info("Log file truncated: %s", self.path)
+                self.size = size
+                self.seek(0)
+                yield from self.read_chunks(chunk_size)
+
+    def close(self) -> None:
+        if self.file:
+            self.file.close()
+            self.file = None
+
+class OffsetStore:
+    """Persists {path: {'inode', 'offset'}} as JSON, replaced atomically."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Dict[str, Dict[str, int]]:
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning("Could not read log offsets from %s, starting fresh: %s", self.path, e)
+            return {}
+
+    def save(self, offsets: Dict[str, Dict[str, int]]) -> None:
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(offsets, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Could not save log offsets to %s: %s", self.path, e)
 
 class LogHandler(FileSystemEventHandler):
-    def __init__(self):
-        self.log_files = {}
+    """
+    Watches DATA_DIR for miner logs. Event callbacks only track files and mark
+    them for reading; one reader thread reads each modified file at most once
+    per READ_INTERVAL and sleeps without waking while nothing changes.
+    """
+
+    def __init__(self, offsets_file: Optional[str] = None, read_interval: Optional[float] = None):
+        self.log_files: Dict[str, LogTail] = {}
         self.observer = None
+        self.matcher = ErrorMatcher()
+        self.offsets = OffsetStore(offsets_file or OFFSETS_FILE)
+        self._stored_offsets = self.offsets.load()
+        self._last_save = 0.0
+        self._dirty = False
+        self.read_interval = READ_INTERVAL if read_interval is None else read_interval
+        # Guards log_files and file reads (event thread, reader thread, stop())
+        self._lock = threading.RLock()
+        # path -> earliest time the reader may read it; at most one entry per file
+        self._pending: Dict[str, float] = {}
+        self._last_read: Dict[str, float] = {}
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._reader = None
+        # Restarts run here so a slow restart script never blocks event handling
+        self._restart_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='restart')
+        # A burst of error lines queues one restart request, not one per line
+        self._restart_pending = threading.Event()
 
     def on_modified(self, event):
-        if not event.is_directory:
-            filepath = event.src_path
-            if self._matches_pattern(filepath):
-                self._process_log_file(filepath)
+        if not event.is_directory and self._matches_pattern(event.src_path):
+            self._schedule(event.src_path)
 
     def on_created(self, event):
-        if not event.is_directory:
-            filepath = event.src_path
-            if self._matches_pattern(filepath):
-                logger.info(f"New log file detected: {filepath}")
-                self._process_log_file(filepath)
+        if not event.is_directory and self._matches_pattern(event.src_path):
+            logger.info("New log file detected: %s", event.src_path)
+            self._track(event.src_path, from_end=False)
+            self._schedule(event.src_path)
+
+    def on_moved(self, event):
+        if event.is_directory:
+            return
+        with self._lock:
+            tail = self.log_files.pop(event.src_path, None)
+            if tail:
+                # Lines written before the rename are still read through the open file
+                self._scan(tail)
+                if self._matches_pattern(event.dest_path):
+                    tail.path = event.dest_path
+                    self.log_files[event.dest_path] = tail
+                else:
+                    logger.info("Log file rotated: %s -> %s", event.src_path, event.dest_path)
+                    tail.close()
+                self._dirty = True
+        if not tail and self._matches_pattern(event.dest_path):
+            self._track(event.dest_path, from_end=False)
+            self._schedule(event.dest_path)
+
+    def on_deleted(self, event):
+        if event.is_directory:
+            return
+        with self._lock:
+            tail = self.log_files.pop(event.src_path, None)
+            if tail:
+                self._scan(tail)
+                tail.close()
+                self._dirty = True
+                logger.info("Log file removed: %s", event.src_path)
 
     def _matches_pattern(self, filepath):
-        import fnmatch
         return fnmatch.fnmatch(os.path.basename(filepath), LOG_PATTERN)
 
-    def _process_log_file(self, filepath):
-        try:
-            if filepath not in self.log_files:
-                self.log_files[filepath] = {'file': None, 'position': 0, 'inode': None}
-
-            entry = self.log_files[filepath]
-            current_inode = os.stat(filepath).st_ino
-
-            if entry['inode'] != current_inode:
-                if entry['file']:
-                    entry['file'].close()
-                entry['file'] = open(filepath, 'r')
-                entry['position'] = 0
-                entry['inode'] = current_inode
-                logger.info(f"Log file rotated or reopened: {filepath}")
-
-            if not entry['file']:
-                entry['file'] = open(filepath, 'r')
-                entry['file'].seek(0, os.SEEK_END)
-                entry['position'] = entry['file'].tell()
-
-            entry['file'].seek(entry['position'])
-            new_lines = entry['file'].readlines()
-            entry['position'] = entry['file'].tell()
-
-            for line in new_lines:
-                line = line.strip()
-                if ERROR_PATTERN.search(line):
-                    logger.error(f"CRITICAL: CUDA error detected: {line}")
-                    logger.info("Triggering auto-restart...")
-                    time.sleep(1)
-                    try:
-                        subprocess.run([RESTART_SCRIPT], check=True)
-                    except Exception as e:
-                        logger.error(f"Failed to run restart script: {e}")
+    def _track(self, filepath: str, from_end: bool) -> Optional[LogTail]:
+        with self._lock:
+            tail = self.log_files.get(filepath)
+            if tail is not None:
+                return tail
+            try:
+                tail = LogTail(filepath).open()
+            except FileNotFoundError:
+                return None
+            stored = self._stored_offsets.get(filepath)
+            if stored and stored.get('inode') == tail.inode:
+                tail.seek(stored['offset'])
+                logger.info("Resuming %s at byte %s", filepath, tail.offset)
+            elif from_end:
+                # Existing file seen for the first time: old errors were already dealt with
+                tail.seek(tail.size)
+            self.log_files[filepath] = tail
+            return tail
 
-        except FileNotFoundError:
-            logger.warning(f"Log file not found: {filepath}")
-            if filepath in self.log_files:
-                del self.log_files[filepath]
+    def _schedule(self, filepath: str) -> None:
+        """Marks a file for reading; repeated events before the read coalesce into one."""
+        with self._cond:
+            if filepath in self._pending:
+                return
+            self._pending[filepath] = max(time.time(), self._last_read.get(filepath, 0) + self.read_interval)
+            self._cond.notify()
+
+    def _reader_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopping and not self._pending:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                filepath, due = min(self._pending.items(), key=lambda item: item[1])
+                delay = due - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                del self._pending[filepath]
+                self._last_read[filepath] = time.time()
+            self._process_log_file(filepath)
+
+    def _scan(self, tail: LogTail) -> None:
+        for data in tail.read_chunks():
+            self._dirty = True
+            for error_type, line in self.matcher.scan(data):
+                self._on_error(error_type, line)
+
+    def _process_log_file(self, filepath, from_end=True):
+        with self._lock:
+            try:
+                tail = self.log_files.get(filepath) or self._track(filepath, from_end)
+                if tail is None:
+                    return
+                self._scan(tail)
+                self._save_offsets()
+            except Exception as e:
+                logger.exception("Error processing log file %s: %s", filepath, e)
+
+    def _save_offsets(self, force: bool = False) -> None:
+        now = time.time()
+        if not self._dirty or (not force and now - self._last_save < OFFSET_SAVE_INTERVAL):
+            return
+        self._stored_offsets = {path: {'inode': tail.inode, 'offset': tail.committed_offset}
+                                for path, tail in self.log_files.items()}
+        self.offsets.save(self._stored_offsets)
+        self._last_save = now
+        self._dirty = False
+
+    def _on_error(self, error_type: str, line: str) -> None:
+        logger.error("CRITICAL: %s detected: %s", error_type, line)
+        # Never re-act to this line if the restart takes the monitor down with it
+        self._save_offsets(force=True)
+        if self._restart_pending.is_set():
+            return
+        logger.info("Triggering auto-restart...")
+        self._restart_pending.set()
+        self._restart_executor.submit(self._run_restart, error_type, line)
+
+    def _run_restart(self, error_type: str, line: str) -> None:
+        # Debounce, backoff and crash-loop handling are shared with healthcheck.sh and the profit switcher
+        try:
+            restart_coordinator.request_restart(f"{error_type}: {line}", source='log_monitor')
         except Exception as e:
-            logger.exception(f"Error processing log file {filepath}: {e}")
+            logger.error("Restart request failed: %s", e)
+        finally:
+            self._restart_pending.clear()
 
     def start(self):
         self.observer = Observer()
         self.observer.schedule(self, DATA_DIR, recursive=False)
         self.observer.start()
-        logger.info(f"Started CUDA error monitor on {DATA_DIR} for {LOG_PATTERN}")
+        self._reader = threading.Thread(target=self._reader_loop, name='log-reader', daemon=True)
+        self._reader.start()
+        logger.info("Started CUDA error monitor on %s for %s", DATA_DIR, LOG_PATTERN)
 
+        # Logs that already exist are followed from where the last run stopped, or from their end.
+        # Anything created later arrives as an event, so there is nothing to poll for.
+        self._check_for_new_files(from_end=True)
         try:
-            while True:
-                time.sleep(10)
-                self._check_for_new_files()
+            while self.observer.is_alive() and not self._stopping:
+                self.observer.join(timeout=3600)
         except KeyboardInterrupt:
-            self.stop()
+            pass
+        self.stop()
 
-    def _check_for_new_files(self):
-        import glob
-        current_files = set(glob.glob(os.path.join(DATA_DIR, LOG_PATTERN)))
-        for filepath in current_files:
+    def _check_for_new_files(self, from_end=False):
+        for filepath in glob.glob(os.path.join(DATA_DIR, LOG_PATTERN)):
             if filepath not in self.log_files:
-                logger.info(f"Detected new log file: {filepath}")
-                self._process_log_file(filepath)
+                logger.info("Detected log file: %s", filepath)
+                self._process_log_file(filepath, from_end=from_end)
 
     def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
         if self.observer:
             self.observer.stop()
-            self.observer.join()
-        for entry in self.log_files.values():
-            if entry['file']:
-                entry['file'].close()
+            if self.observer.is_alive() and self.observer is not threading.current_thread():
+                self.observer.join()
+        if self._reader:
+            self._reader.join()
+        # Read whatever is still marked as modified before shutting down
+        for filepath in list(self._pending):
+            self._process_log_file(filepath)
+        self._pending.clear()
+        self._restart_executor.shutdown(wait=True)
+        with self._lock:
+            self._save_offsets(force=True)
+            for tail in self.log_files.values():
+                tail.close()
         logger.info("Stopped CUDA error monitor")
 
 if __name__ == '__main__':
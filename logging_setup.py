@@ -0,0 +1,136 @@
+"""
+Logging setup shared by every service; replaces per-module logging.basicConfig().
+
+- Records go through a QueueHandler to one QueueListener thread, which formats
+  and writes them, so neither formatting nor disk I/O runs in the scrape and
+  switching loops.
+- LOG_FORMAT=json (default) writes one JSON object per line for the dashboard
+  and other tools; LOG_FORMAT=text keeps "time - name - level - message".
+- LOG_LEVEL is the default level and LOG_LEVELS overrides it per logger, e.g.
+  "profit_switcher=DEBUG,http_client=WARNING". Both are read through
+  config_service and re-applied when the .env file changes.
+
+Log with %-style arguments (logger.debug("Score %.4f", score)) rather than
+f-strings, so nothing is formatted for levels that are turned off.
+"""
+import sys
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+import threading
+from typing import Dict, Any, Iterable, List, Optional, TextIO
+
+from config_service import settings
+
+logger = logging.getLogger("logging_setup")
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LEVEL_SETTINGS = ('LOG_LEVEL', 'LOG_LEVELS')
+
+# Attributes every LogRecord has; anything else was passed with extra= and is logged as a field
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, any extra= fields and the traceback."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        if record.stack_info:
+            entry['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues records as they are. The stock QueueHandler formats each record in
+    the logging thread before queueing it; here the listener thread does that.
+    Arguments are therefore formatted later, so pass values, not objects the
+    caller keeps changing.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def parse_levels(items: Iterable[str]) -> Dict[str, int]:
+    """["name=LEVEL", ...] -> {name: level}. Invalid entries are logged and skipped."""
+    levels = {}
+    for item in items:
+        name, _, level = item.partition('=')
+        value = logging.getLevelName(level.strip().upper())
+        if not name.strip() or not isinstance(value, int):
+            logger.warning("Ignoring invalid LOG_LEVELS entry: %r", item)
+            continue
+        levels[name.strip()] = value
+    return levels
+
+_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+_overridden: List[str] = []
+_subscribed = False
+
+def apply_levels(changes: Optional[Dict[str, Any]] = None) -> None:
+    """Sets the root level from LOG_LEVEL and per-logger levels from LOG_LEVELS."""
+    with _lock:
+        logging.getLogger().setLevel(settings.get('LOG_LEVEL'))
+        levels = parse_levels(settings.get('LOG_LEVELS'))
+        # Loggers dropped from LOG_LEVELS go back to inheriting the root level
+        for name in _overridden:
+            if name not in levels:
+                logging.getLogger(name).setLevel(logging.NOTSET)
+        for name, level in levels.items():
+            logging.getLogger(name).setLevel(level)
+        _overridden[:] = list(levels)
+    if changes:
+        logger.info("Applied log levels: default %s, overrides %s", settings.get('LOG_LEVEL'), levels or 'none')
+
+def configure(stream: Optional[TextIO] = None, fmt: Optional[str] = None, force: bool = False) -> None:
+    """
+    Installs the queue handler on the root logger. Later calls do nothing
+    unless force is set (tests use it to capture output in a stream).
+    """
+    global _listener, _queue_handler, _subscribed
+    if _listener is not None:
+        if not force:
+            return
+        shutdown()
+
+    fmt = fmt or settings.get('LOG_FORMAT')
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler = _DeferredQueueHandler(log_queue)
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    _listener.start()
+    apply_levels()
+    if not _subscribed:
+        settings.subscribe(apply_levels, keys=LEVEL_SETTINGS)
+        atexit.register(shutdown)
+        _subscribed = True
+
+def shutdown() -> None:
+    """Writes out queued records and removes the queue handler."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    listener, handler = _listener, _queue_handler
+    _listener = _queue_handler = None
+    logging.getLogger().removeHandler(handler)
+    # Blocks until the listener has written everything still queued
+    listener.stop()
@@ -2,17 +2,21 @@ from prometheus_client import start_http_server, Gauge
 import time
 import os
 import logging
-import requests
+from typing import Dict, Any
 import database
-from miner_api import get_full_miner_data, get_node_status, get_services_status
+import http_client
+import gpu_hardware
+from miner_api import get_full_miner_data, get_node_status, get_system_info
+import rig_snapshot
+import sample_ring
 import discord_notifier
-import json
+import alert_engine
+import notification_dispatcher
+from config_service import settings
+import logging_setup
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+logging_setup.configure()
 logger = logging.getLogger("metrics")
 
 PORT = int(os.getenv('METRICS_PORT', 4455))
@@ -48,23 +52,19 @@ GPU_SHARES_ACCEPTED = Gauge('miner_gpu_shares_accepted', 'Number of accepted sha
 GPU_SHARES_REJECTED = Gauge('miner_gpu_shares_rejected', 'Number of rejected shares for a single GPU', ['gpu', 'worker'])
 
 last_prune_time = 0.0
+_logged_driver_version = None
 
 # Telegram configuration
 TELEGRAM_ENABLE = os.getenv('TELEGRAM_ENABLE', 'false').lower() == 'true'
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
-TELEGRAM_NOTIFY_THRESHOLD = int(os.getenv('TELEGRAM_NOTIFY_THRESHOLD', 300))
 
-# Notification state
-unhealthy_since = None
-is_currently_notified = False
+TELEGRAM_RATE_LIMIT = float(os.getenv('TELEGRAM_RATE_LIMIT', 20))
+# Telegram rejects messages longer than this
+TELEGRAM_MAX_LENGTH = 4096
 
-# Discord temperature alert state
-discord_temp_unhealthy_since = None
-discord_temp_is_notified = False
-discord_temp_gpu_index = None
-
-def send_telegram_notification(message: str) -> None:
+def post_telegram_message(message: str) -> None:
+    """Posts one message to Telegram, raising on failure so the dispatcher can retry."""
     if not TELEGRAM_ENABLE or not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
         return
 
@@ -75,15 +75,55 @@ def send_telegram_notification(message: str) -> None:
         "parse_mode": "HTML"
     }
 
+    response = http_client.post(url, json=payload)
+    response.raise_for_status()
+    logger.info("Telegram notification sent successfully")
+
+def send_telegram_notification(message: str) -> None:
     try:
-        response = requests.post(url, json=payload, timeout=10)
-        response.raise_for_status()
-        logger.info("Telegram notification sent successfully")
+        post_telegram_message(message)
     except Exception as e:
-        logger.error(f"Failed to send Telegram notification: {e}")
+        logger.error("Failed to send Telegram notification: %s", e)
+
+# Alerts are queued and delivered off the scrape loop, batched and rate limited per channel
+notifications = notification_dispatcher.NotificationDispatcher()
+notifications.add_channel('telegram', lambda message: post_telegram_message(message),
+                          rate_per_minute=TELEGRAM_RATE_LIMIT, max_length=TELEGRAM_MAX_LENGTH)
+notifications.add_channel('discord', lambda message: discord_notifier.post_discord_message(message),
+                          rate_per_minute=discord_notifier.DISCORD_RATE_LIMIT,
+                          max_length=discord_notifier.DISCORD_MAX_LENGTH)
+
+# Downtime, temperature, reject ratio, instance and node sync alerts
+alerts = alert_engine.AlertEngine({
+    'telegram': lambda message: notifications.notify('telegram', message),
+    'discord': lambda message: notifications.notify('discord', message),
+})
+
+def apply_settings(changes: Dict[str, Any]) -> None:
+    """Applies notification and alert settings saved to .env (e.g. from the dashboard) without a restart."""
+    global TELEGRAM_ENABLE, TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
+    if 'TELEGRAM_ENABLE' in changes:
+        TELEGRAM_ENABLE = changes['TELEGRAM_ENABLE']
+    if 'TELEGRAM_BOT_TOKEN' in changes:
+        TELEGRAM_BOT_TOKEN = changes['TELEGRAM_BOT_TOKEN']
+    if 'TELEGRAM_CHAT_ID' in changes:
+        TELEGRAM_CHAT_ID = changes['TELEGRAM_CHAT_ID']
+    if 'DISCORD_ENABLE' in changes:
+        discord_notifier.DISCORD_ENABLE = changes['DISCORD_ENABLE']
+    if 'DISCORD_WEBHOOK_URL' in changes:
+        discord_notifier.DISCORD_WEBHOOK_URL = changes['DISCORD_WEBHOOK_URL']
+    if 'GPU_PROFILE' in changes:
+        alerts.set_profile(changes['GPU_PROFILE'])
+    for key in alert_engine.DURATION_SETTINGS:
+        if key in changes:
+            alerts.set_duration(key, changes[key])
+    logger.info("Applied updated settings: %s", ', '.join(sorted(changes)))
+
+SETTINGS_KEYS = ('TELEGRAM_ENABLE', 'TELEGRAM_BOT_TOKEN', 'TELEGRAM_CHAT_ID',
+                 'DISCORD_ENABLE', 'DISCORD_WEBHOOK_URL', 'GPU_PROFILE') + alert_engine.DURATION_SETTINGS
 
 def update_metrics() -> None:
-    global last_prune_time, unhealthy_since, is_currently_notified
+    global last_prune_time, _logged_driver_version
     try:
         data = get_full_miner_data()
         node_status = get_node_status()
@@ -92,31 +132,24 @@ def update_metrics() -> None:
         NODE_SYNCED.labels(worker=WORKER).set(1 if node_status.get('is_synced') else 0)
 
         # Update service status metrics
-        services = get_services_status()
+        system_info = get_system_info()
+        services = system_info.get('services', {})
         for service, s_info in services.items():
             val = 1 if s_info['status'] == 'Running' else 0
             SERVICE_STATUS.labels(service=service, worker=WORKER).set(val)
 
-        # Telegram health check logic
-        is_unhealthy = (data is None) or (data.get('total_hashrate', 0) == 0)
-        if is_unhealthy:
-            if unhealthy_since is None:
-                unhealthy_since = time.time()
-            elapsed = time.time() - unhealthy_since
-            if elapsed >= TELEGRAM_NOTIFY_THRESHOLD and not is_currently_notified:
-                reason = "API Unreachable" if data is None else "Zero Hashrate"
-                send_telegram_notification(f"⚠️ <b>Rig Alert</b>\nStatus: DOWN\nReason: {reason}\nDuration: {int(elapsed)}s")
-                is_currently_notified = True
-        else:
-            if is_currently_notified:
-                send_telegram_notification(f"✅ <b>Rig Alert</b>\nStatus: RECOVERED\nHashrate: {data.get('total_hashrate', 0)} MH/s")
-                is_currently_notified = False
-            unhealthy_since = None
+        # Publish for the dashboard so viewers never trigger their own scrape
+        rig_snapshot.publish_snapshot(data, node_status, system_info)
+
+        # Alert rules run on the engine's own thread
+        alerts.submit({'miner': data, 'node': node_status})
 
         # Extract driver version if available
         driver_version = data.get('driver_version', 'unknown') if data else 'unknown'
-        if driver_version != 'unknown':
-            logger.info(f"Detected GPU Driver version: {driver_version}")
+        if driver_version not in ('unknown', _logged_driver_version):
+            # Logged once, not on every scrape
+            logger.info("Detected GPU Driver version: %s", driver_version)
+            _logged_driver_version = driver_version
 
         # Update static info
         INFO.labels(miner=MINER_TYPE, version=MINER_VERSION, worker=WORKER, driver=driver_version).set(1)
@@ -163,43 +196,6 @@ def update_metrics() -> None:
             GPU_SHARES_ACCEPTED.labels(gpu=gpu_idx, worker=WORKER).set(gpu.get('accepted_shares', 0))
             GPU_SHARES_REJECTED.labels(gpu=gpu_idx, worker=WORKER).set(gpu.get('rejected_shares', 0))
 
-        # Check GPU temperature thresholds and send Discord alerts
-        try:
-            gpu_profile = os.getenv('GPU_PROFILE')
-            if gpu_profile:
-                with open('gpu_profiles.json', 'r') as f:
-                    profiles = json.load(f)
-                profile_settings = profiles.get(gpu_profile, {})
-                temp_threshold = profile_settings.get('GPU_TEMP_THRESHOLD', 80)
-            else:
-                temp_threshold = 80
-
-            gpus_over_temp = []
-            for gpu in data.get('gpus', []):
-                gpu_idx = gpu.get('index', 'unknown')
-                temp = gpu.get('temperature', 0)
-                if temp > temp_threshold:
-                    gpus_over_temp.append((gpu_idx, temp))
-
-            if gpus_over_temp:
-                if discord_temp_unhealthy_since is None:
-                    discord_temp_unhealthy_since = time.time()
-                    discord_temp_gpu_index = [x[0] for x in gpus_over_temp]
-                elapsed = time.time() - discord_temp_unhealthy_since
-                if elapsed >= discord_notifier.DISCORD_NOTIFY_THRESHOLD and not discord_temp_is_notified:
-                    gpu_list = ', '.join([f"GPU {x[0]} ({x[1]}°C)" for x in gpus_over_temp])
-                    msg = f"⚠️ **GPU Temperature Alert**\nThreshold: {temp_threshold}°C\nOver limit: {gpu_list}"
-                    discord_notifier.send_discord_notification(msg)
-                    discord_temp_is_notified = True
-            else:
-                if discord_temp_is_notified:
-                    discord_notifier.send_discord_notification(f"✅ **GPU Temperature Recovered**\nAll GPUs below {temp_threshold}°C")
-                    discord_temp_is_notified = False
-                discord_temp_unhealthy_since = None
-                discord_temp_gpu_index = None
-        except Exception as e:
-            logger.error(f"Error checking GPU temperature thresholds: {e}")
-
         # Log history to SQLite
         database.log_history(
             data.get('total_hashrate', 0),
@@ -211,15 +207,17 @@ def update_metrics() -> None:
             data.get('total_power_draw', 0),
             data.get('gpus', [])
         )
+        # Recent per-GPU samples for readers in other processes
+        sample_ring.append_samples(data.get('gpus', []))
 
-        # Prune once per hour
+        # Apply tiered retention once per hour
         if time.time() - last_prune_time > 3600:
-            database.prune_history()
+            deleted = database.apply_retention()
             last_prune_time = time.time()
-            logger.info("History database pruned")
+            logger.info("History retention applied, %d rows removed", sum(deleted.values()))
 
     except Exception as e:
-        logger.exception(f"Error updating metrics: {e}")
+        logger.exception("Error updating metrics: %s", e)
         API_UP.labels(worker=WORKER).set(0)
         HASHRATE.labels(worker=WORKER).set(0)
         DUAL_HASHRATE.labels(worker=WORKER).set(0)
@@ -228,10 +226,16 @@ def update_metrics() -> None:
 
 if __name__ == '__main__':
     database.init_db()
+    # Stream SMI readings from one long-running child instead of spawning per scrape
+    gpu_hardware.start_sampler()
+    notifications.start()
+    alerts.start()
+    settings.subscribe(apply_settings, keys=SETTINGS_KEYS)
+    settings.start()
     # Perform an initial update before starting the server to ensure metrics are populated
     update_metrics()
     start_http_server(PORT)
-    logger.info(f"Serving Prometheus metrics at port {PORT}")
+    logger.info("Serving Prometheus metrics at port %s", PORT)
     while True:
         time.sleep(15)
         update_metrics()
@@ -5,14 +5,22 @@ import os
 import logging
 from typing import List, Dict, Any, Optional
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
 import psutil
 import database
+import http_client
+import gpu_hardware
 
 logger = logging.getLogger(__name__)
 
 # Module-level cache for GPU names
 _gpu_names_cache: List[str] = []
 
+# Multi-process scraping: all instances are polled at once, bounded by a total deadline
+SCRAPE_DEADLINE = float(os.getenv('MINER_API_SCRAPE_DEADLINE', 5))
+SCRAPE_MAX_WORKERS = int(os.getenv('MINER_API_MAX_WORKERS', 16))
+_scrape_executor: Optional[ThreadPoolExecutor] = None
+
 def _is_mock_enabled() -> bool:
     """Checks if the GPU mock mode is enabled via environment variable."""
     return os.getenv('GPU_MOCK', 'false').lower() == 'true'
@@ -26,7 +34,7 @@ def get_node_status() -> Dict[str, Any]:
         return {'is_synced': True, 'full_height': 0, 'headers_height': 0, 'enabled': False}
 
     try:
-        response = requests.get(f"{node_url}/info", timeout=5)
+        response = http_client.get(f"{node_url}/info", timeout=5)
         response.raise_for_status()
         data = response.json()
 
@@ -47,7 +55,7 @@ def get_node_status() -> Dict[str, Any]:
             'error': None
         }
     except Exception as e:
-        logger.error(f"Error checking node status: {e}")
+        logger.error("Error checking node status: %s", e)
         return {
             'is_synced': False,
             'full_height': None,
@@ -85,7 +93,7 @@ def get_services_status() -> Dict[str, Dict[str, Any]]:
             except (psutil.NoSuchProcess, psutil.AccessDenied):
                 continue
     except Exception as e:
-        logger.error(f"Error checking services status: {e}")
+        logger.error("Error checking services status: %s", e)
 
     # Check if cuda_monitor is even supposed to be running
     if os.getenv('AUTO_RESTART_ON_CUDA_ERROR', 'false').lower() != 'true':
@@ -128,7 +136,7 @@ def restart_service(service_name: str) -> bool:
         subprocess.Popen(cmd.split(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
         return True
     except Exception as e:
-        logger.error(f"Error restarting service {service_name}: {e}")
+        logger.error("Error restarting service %s: %s", service_name, e)
         return False
 
 def get_system_info() -> Dict[str, Any]:
@@ -142,7 +150,7 @@ def get_system_info() -> Dict[str, Any]:
             'services': get_services_status()
         }
     except Exception as e:
-        logger.error(f"Error fetching system info: {e}")
+        logger.error("Error fetching system info: %s", e)
         return {
             'cpu_usage': 0,
             'memory_usage': 0,
@@ -159,28 +167,10 @@ def get_gpu_names() -> List[str]:
     if _gpu_names_cache:
         return _gpu_names_cache
 
-    gpu_names = []
-    # 1. Try NVIDIA SMI
-    try:
-        output = subprocess.check_output(['nvidia-smi', '--query-gpu=name', '--format=csv,noheader'], stderr=subprocess.DEVNULL).decode()
-        gpu_names = [line.strip() for line in output.strip().split('\n') if line.strip()]
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        pass
-
-    # 2. Try ROCm SMI (if NVIDIA failed or to support hybrid)
-    if not gpu_names:
-        try:
-            # rocm-smi --showname --csv
-            output = subprocess.check_output("rocm-smi --showname --csv | tail -n +2", shell=True, stderr=subprocess.DEVNULL).decode()
-            for line in output.strip().split('\n'):
-                if not line.strip(): continue
-                parts = line.split(',')
-                if len(parts) >= 2:
-                    gpu_names.append(parts[1].strip())
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            pass
+    # 1. Names from the shared NVIDIA/ROCm hardware snapshot
+    gpu_names = [g['name'] for g in gpu_hardware.get_hardware_snapshot() if g.get('name')]
 
-    # 3. Fallback to lspci
+    # 2. Fallback to lspci
     if not gpu_names:
         try:
             output = subprocess.check_output(r"lspci | grep -i 'vga\|3d'", shell=True, stderr=subprocess.DEVNULL).decode()
@@ -203,56 +193,18 @@ def refresh_gpu_names_cache() -> List[str]:
     """Clears the GPU names cache and re-fetches it."""
     global _gpu_names_cache
     _gpu_names_cache = []
+    gpu_hardware.invalidate_snapshot()
     return get_gpu_names()
 
-def get_gpu_smi_data() -> List[Dict[str, float]]:
-    """Fetches GPU stats from nvidia-smi or rocm-smi."""
+def get_gpu_smi_data() -> List[Dict[str, Any]]:
+    """Returns per-GPU temperature, power, fan and clock readings from the shared hardware snapshot."""
     if _is_mock_enabled():
         return [
             {'temperature': 60.0, 'power_draw': 200.0, 'fan_speed': 50.0},
             {'temperature': 62.0, 'power_draw': 210.0, 'fan_speed': 55.0}
         ]
 
-    gpu_stats = []
-    is_nvidia = False
-    smi_cmd = ""
-
-    try:
-        subprocess.check_output(['which', 'nvidia-smi'], stderr=subprocess.DEVNULL)
-        smi_cmd = "nvidia-smi --query-gpu=temperature.gpu,power.draw,fan.speed --format=csv,noheader,nounits"
-        is_nvidia = True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        try:
-            subprocess.check_output(['which', 'rocm-smi'], stderr=subprocess.DEVNULL)
-            # rocm-smi's csv output: card,temperature,power,fan
-            smi_cmd = "rocm-smi --showtemp --showpower --showfan --csv | tail -n +2"
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            return []
-
-    if smi_cmd:
-        try:
-            smi_output = subprocess.check_output(smi_cmd, shell=True, stderr=subprocess.DEVNULL).decode()
-            for line in smi_output.strip().split('\n'):
-                if not line.strip(): continue
-                try:
-                    if is_nvidia:
-                        parts = line.split(', ')
-                        temp = float(parts[0])
-                        power = float(parts[1])
-                        fan = float(parts[2]) if len(parts) > 2 else 0
-                        gpu_stats.append({'temperature': temp, 'power_draw': power, 'fan_speed': fan})
-                    else: # AMD
-                        parts = line.split(',')
-                        # rocm-smi csv: card,temp,power,fan
-                        temp = float(parts[1])
-                        power = float(parts[2].replace('W', '').strip())
-                        fan = float(parts[3]) if len(parts) > 3 else 0
-                        gpu_stats.append({'temperature': temp, 'power_draw': power, 'fan_speed': fan})
-                except (ValueError, IndexError):
-                    gpu_stats.append({'temperature': 0, 'power_draw': 0, 'fan_speed': 0})
-        except subprocess.CalledProcessError:
-            pass
-    return gpu_stats
+    return gpu_hardware.get_hardware_snapshot()
 
 def parse_lolminer_data(data: Dict[str, Any]) -> Dict[str, Any]:
     """Parses raw lolMiner API response into a normalized format."""
@@ -299,12 +251,12 @@ def _fetch_single_miner_data(miner: str, api_port: int) -> Optional[Dict[str, An
     for attempt in range(max_retries):
         try:
             if miner == 'lolminer':
-                response = requests.get(f'http://localhost:{api_port}/', timeout=2)
+                response = http_client.get(f'http://localhost:{api_port}/')
                 response.raise_for_status()
                 return parse_lolminer_data(response.json())
 
             elif miner == 't-rex':
-                response = requests.get(f'http://localhost:{api_port}/summary', timeout=2)
+                response = http_client.get(f'http://localhost:{api_port}/summary')
                 response.raise_for_status()
                 data = response.json()
 
@@ -331,13 +283,77 @@ def _fetch_single_miner_data(miner: str, api_port: int) -> Optional[Dict[str, An
                 return normalized
         except (requests.exceptions.RequestException, ValueError) as e:
             if attempt < max_retries - 1:
-                logger.warning(f"Attempt {attempt + 1} failed to fetch miner data on port {api_port}: {e}. Retrying...")
+                logger.warning("Attempt %d failed to fetch miner data on port %s: %s. Retrying...", attempt + 1, api_port, e)
                 continue
             else:
-                logger.error(f"Failed to fetch miner data on port {api_port} after {max_retries} attempts: {e}")
+                logger.error("Failed to fetch miner data on port %s after %d attempts: %s", api_port, max_retries, e)
                 return None
     return None
 
+def _get_scrape_executor() -> ThreadPoolExecutor:
+    """Returns the shared thread pool used to poll multi-process miner instances."""
+    global _scrape_executor
+    if _scrape_executor is None:
+        _scrape_executor = ThreadPoolExecutor(max_workers=SCRAPE_MAX_WORKERS, thread_name_prefix='miner-scrape')
+    return _scrape_executor
+
+def _fetch_miner_instances(miner: str, api_port: int, device_ids: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Queries every miner instance concurrently and merges the partial results.
+    The whole scrape is bounded by SCRAPE_DEADLINE; instances that have not
+    answered by then are tagged 'TIMEOUT' in miner_instances.
+    """
+    executor = _get_scrape_executor()
+    futures = {}
+    for i, device_id in enumerate(device_ids):
+        current_port = api_port + i
+        futures[executor.submit(_fetch_single_miner_data, miner, current_port)] = (current_port, device_id)
+
+    done, _ = wait(futures, timeout=SCRAPE_DEADLINE)
+
+    aggregated_data = None
+    instances_status = {}
+
+    # Merge in port order so the result does not depend on completion order
+    for future, (current_port, device_id) in sorted(futures.items(), key=lambda item: item[1][0]):
+        if future not in done:
+            instances_status[current_port] = 'TIMEOUT'
+            logger.warning("Miner instance on port %s (GPU %s) did not answer within %ss", current_port, device_id, SCRAPE_DEADLINE)
+            continue
+
+        try:
+            data = future.result()
+        except Exception as e:
+            logger.error("Unexpected error polling miner instance on port %s: %s", current_port, e)
+            data = None
+
+        if data:
+            instances_status[current_port] = 'UP'
+            # Map back to original GPU index
+            # In multi-process mode, each miner has 1 GPU, usually index 0 in its API
+            for gpu in data['gpus']:
+                try:
+                    gpu['index'] = int(device_id)
+                except (ValueError, TypeError):
+                    pass # Keep original index if device_id is weird
+
+            if aggregated_data is None:
+                aggregated_data = data
+            else:
+                aggregated_data['total_hashrate'] += data.get('total_hashrate', 0)
+                aggregated_data['total_dual_hashrate'] += data.get('total_dual_hashrate', 0)
+                aggregated_data['uptime'] = min(aggregated_data.get('uptime', 0), data.get('uptime', 0))
+                aggregated_data['gpus'].extend(data.get('gpus', []))
+        else:
+            instances_status[current_port] = 'DOWN'
+            logger.warning("No data received from miner instance on port %s (GPU %s)", current_port, device_id)
+
+    # Ensure GPUs are sorted by index
+    if aggregated_data:
+        aggregated_data['miner_instances'] = instances_status
+        aggregated_data['gpus'].sort(key=lambda x: x['index'])
+    return aggregated_data
+
 def get_normalized_miner_data() -> Optional[Dict[str, Any]]:
     """Fetches data from the miner API and normalizes it, supporting multi-process mode."""
     miner = os.getenv('MINER', 'lolminer')
@@ -349,16 +365,7 @@ def get_normalized_miner_data() -> Optional[Dict[str, Any]]:
         if gpu_devices_env == 'AUTO':
             # Robust fallback: if MULTI_PROCESS is on but devices are AUTO,
             # we try to resolve them here to know how many API ports to query.
-            device_ids = []
-            try:
-                output = subprocess.check_output(['nvidia-smi', '--query-gpu=index', '--format=csv,noheader'], stderr=subprocess.DEVNULL).decode()
-                device_ids = [line.strip() for line in output.strip().split('\n') if line.strip()]
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                try:
-                    output = subprocess.check_output("rocm-smi --showtemp --csv | tail -n +2 | cut -d, -f1", shell=True, stderr=subprocess.DEVNULL).decode()
-                    device_ids = [line.strip() for line in output.strip().split('\n') if line.strip()]
-                except:
-                    pass
+            device_ids = [str(g['index']) for g in gpu_hardware.get_hardware_snapshot()]
 
             # If SMI failed, try to discover by checking running miner processes
             if not device_ids:
@@ -384,7 +391,7 @@ def get_normalized_miner_data() -> Optional[Dict[str, Any]]:
                         if discovered_ports:
                             api_port = min(discovered_ports)
                 except Exception as e:
-                    logger.warning(f"Failed to discover miners via process list: {e}")
+                    logger.warning("Failed to discover miners via process list: %s", e)
         else:
             device_ids = [d.strip() for d in gpu_devices_env.split(',') if d.strip()]
 
@@ -392,38 +399,7 @@ def get_normalized_miner_data() -> Optional[Dict[str, Any]]:
             # Fallback to single port if we couldn't determine devices
             return _fetch_single_miner_data(miner, api_port)
 
-        aggregated_data = None
-        instances_status = {}
-
-        for i, device_id in enumerate(device_ids):
-            current_port = api_port + i
-            data = _fetch_single_miner_data(miner, current_port)
-            if data:
-                instances_status[current_port] = 'UP'
-                # Map back to original GPU index
-                # In multi-process mode, each miner has 1 GPU, usually index 0 in its API
-                for gpu in data['gpus']:
-                    try:
-                        gpu['index'] = int(device_id)
-                    except (ValueError, TypeError):
-                        pass # Keep original index if device_id is weird
-
-                if aggregated_data is None:
-                    aggregated_data = data
-                else:
-                    aggregated_data['total_hashrate'] += data.get('total_hashrate', 0)
-                    aggregated_data['total_dual_hashrate'] += data.get('total_dual_hashrate', 0)
-                    aggregated_data['uptime'] = min(aggregated_data.get('uptime', 0), data.get('uptime', 0))
-                    aggregated_data['gpus'].extend(data.get('gpus', []))
-            else:
-                instances_status[current_port] = 'DOWN'
-                logger.warning(f"No data received from miner instance on port {current_port} (GPU {device_id})")
-
-        # Ensure GPUs are sorted by index
-        if aggregated_data:
-            aggregated_data['miner_instances'] = instances_status
-            aggregated_data['gpus'].sort(key=lambda x: x['index'])
-        return aggregated_data
+        return _fetch_miner_instances(miner, api_port, device_ids)
     else:
         return _fetch_single_miner_data(miner, api_port)
 
@@ -469,14 +445,9 @@ def _get_mock_full_data() -> Dict[str, Any]:
 def get_24h_average_hashrate() -> float:
     """Calculates the average hashrate over the last 24 hours."""
     try:
-        history = database.get_history(days=1)
-        if not history:
-            return 0.0
-
-        total_hashrate = sum(row['hashrate'] for row in history)
-        return total_hashrate / len(history)
+        return database.get_history_aggregates(days=1)['hashrate_avg'] or 0.0
     except Exception as e:
-        logger.error(f"Error calculating 24h average hashrate: {e}")
+        logger.error("Error calculating 24h average hashrate: %s", e)
         return 0.0
 
 def get_full_miner_data() -> Optional[Dict[str, Any]]:
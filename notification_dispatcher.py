@@ -0,0 +1,253 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from typing import Dict, List, Optional, Callable
+import requests
+
+logger = logging.getLogger("notification_dispatcher")
+
+# Messages waiting per channel; when full the oldest is dropped
+NOTIFY_QUEUE_SIZE = int(os.getenv('NOTIFY_QUEUE_SIZE', 100))
+# Messages arriving within this many seconds of the first are sent as one digest
+NOTIFY_DIGEST_WINDOW = float(os.getenv('NOTIFY_DIGEST_WINDOW', 5))
+NOTIFY_MAX_RETRIES = int(os.getenv('NOTIFY_MAX_RETRIES', 5))
+NOTIFY_BACKOFF_BASE = float(os.getenv('NOTIFY_BACKOFF_BASE', 2))
+NOTIFY_BACKOFF_MAX = float(os.getenv('NOTIFY_BACKOFF_MAX', 60))
+
+DIGEST_SEPARATOR = "\n\n"
+
+class RateLimiter:
+    """Token bucket allowing `per_minute` sends on average and bursts of up to `burst`."""
+
+    def __init__(self, per_minute: float, burst: int = 1):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def delay(self) -> float:
+        """Seconds until a send is allowed (0 if now)."""
+        if not self.interval:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) / self.interval)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) * self.interval
+
+    def consume(self) -> None:
+        if self.interval:
+            self.tokens -= 1
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Server-requested delay from an HTTP 429/503 response, if the sender raised one."""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    header = response.headers.get('Retry-After') if response.headers else None
+    try:
+        return float(header) if header is not None else None
+    except ValueError:
+        return None
+
+def _is_retryable(error: Exception) -> bool:
+    """Rate limiting (429), server errors (5xx) and failed connections are worth retrying; other 4xx are not."""
+    response = getattr(error, 'response', None)
+    if response is not None and getattr(response, 'status_code', None) is not None:
+        return response.status_code == 429 or response.status_code >= 500
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+def _cut_point(text: str, max_length: int) -> int:
+    """Where to cut a single line longer than max_length: never inside an HTML tag or entity."""
+    cut = max_length
+    for opener, closer in (('<', '>'), ('&', ';')):
+        start = text.rfind(opener, 0, cut)
+        if start > 0 and text.find(closer, start, cut) == -1:
+            cut = start
+    return cut
+
+def _split_message(message: str, max_length: int) -> List[str]:
+    """Splits one oversized message at line breaks, cutting a line only if it is longer than max_length."""
+    parts, current = [], ''
+    for line in message.split('\n'):
+        while len(line) > max_length:
+            if current:
+                parts.append(current)
+                current = ''
+            cut = _cut_point(line, max_length)
+            parts.append(line[:cut])
+            line = line[cut:]
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > max_length:
+            parts.append(current)
+            current = line
+        else:
+            current = candidate
+    if current:
+        parts.append(current)
+    return parts
+
+def pack_digests(messages: List[str], max_length: int) -> List[str]:
+    """
+    Joins messages into as few texts as fit in max_length. Texts are split only
+    between messages, so HTML markup (Telegram) is never cut; an oversized single
+    message is split at its line breaks.
+    """
+    digests, current = [], ''
+    for message in messages:
+        if len(message) > max_length:
+            if current:
+                digests.append(current)
+                current = ''
+            *whole, message = _split_message(message, max_length)
+            digests.extend(whole)
+        candidate = f"{current}{DIGEST_SEPARATOR}{message}" if current else message
+        if len(candidate) > max_length:
+            digests.append(current)
+            current = message
+        else:
+            current = candidate
+    if current:
+        digests.append(current)
+    return digests
+
+class Channel:
+    """One delivery channel: a bounded queue drained by its own worker thread."""
+
+    def __init__(self, name: str, send: Callable[[str], None], rate_per_minute: float = 20, burst: int = 1,
+                 digest_window: float = None, max_length: int = 2000, queue_size: int = None,
+                 max_retries: int = None):
+        self.name = name
+        self.send = send
+        self.limiter = RateLimiter(rate_per_minute, burst)
+        self.digest_window = NOTIFY_DIGEST_WINDOW if digest_window is None else digest_window
+        self.max_length = max_length
+        self.max_retries = NOTIFY_MAX_RETRIES if max_retries is None else max_retries
+        self.queue = queue.Queue(maxsize=queue_size or NOTIFY_QUEUE_SIZE)
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def put(self, message: str) -> None:
+        while True:
+            try:
+                self.queue.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                    logger.warning("%s notification queue full, dropped oldest message", self.name)
+                except queue.Empty:
+                    pass
+
+    def _drain(self, messages: List[str], until: float) -> None:
+        """Adds messages arriving before `until` (monotonic) to the batch."""
+        while True:
+            remaining = until - time.monotonic()
+            try:
+                if remaining > 0 and not self._stopping.is_set():
+                    # Wake up regularly so stop() does not wait out a long window
+                    messages.append(self.queue.get(timeout=min(remaining, 0.1)))
+                else:
+                    messages.append(self.queue.get_nowait())
+            except queue.Empty:
+                if remaining <= 0 or self._stopping.is_set():
+                    return
+
+    def _deliver(self, text: str) -> bool:
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.send(text)
+                return True
+            except Exception as e:
+                if not _is_retryable(e):
+                    # e.g. 400 (bad chat id or markup) or 401/403 (bad token): retrying only burns the rate budget
+                    logger.error("%s notification rejected, not retrying: %s", self.name, e)
+                    return False
+                if attempt == self.max_retries or self._stopping.is_set():
+                    logger.error("Giving up on %s notification after %s attempts: %s", self.name, attempt + 1, e)
+                    return False
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = min(NOTIFY_BACKOFF_MAX, NOTIFY_BACKOFF_BASE ** attempt)
+                logger.warning("%s notification failed (%s), retrying in %.1fs", self.name, e, delay)
+                self._stopping.wait(delay)
+        return False
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+
+            # Coalesce a burst, then keep collecting while the rate limit holds us back
+            batch = [first]
+            self._drain(batch, time.monotonic() + self.digest_window)
+            wait = self.limiter.delay()
+            if wait > 0:
+                self._drain(batch, time.monotonic() + wait)
+
+            for text in pack_digests(batch, self.max_length):
+                wait = self.limiter.delay()
+                if wait > 0:
+                    self._stopping.wait(wait)
+                self.limiter.consume()
+                if self._deliver(text):
+                    self.sent += 1
+                else:
+                    self.failed += 1
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name=f'notify-{self.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5) -> None:
+        """Cuts waits short: queued messages are sent once more, without retries or rate limiting."""
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+class NotificationDispatcher:
+    """Routes notifications to per-channel queues; notify() never blocks on the network."""
+
+    def __init__(self):
+        self.channels: Dict[str, Channel] = {}
+        self._started = False
+
+    def add_channel(self, name: str, send: Callable[[str], None], **options) -> Channel:
+        channel = Channel(name, send, **options)
+        self.channels[name] = channel
+        if self._started:
+            channel.start()
+        return channel
+
+    def notify(self, channel: str, message: str) -> bool:
+        target = self.channels.get(channel)
+        if target is None:
+            logger.warning("Unknown notification channel: %s", channel)
+            return False
+        target.put(message)
+        return True
+
+    def start(self) -> None:
+        self._started = True
+        for channel in self.channels.values():
+            channel.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout: float = 5) -> None:
+        self._started = False
+        for channel in self.channels.values():
+            channel.stop(timeout)
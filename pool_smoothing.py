@@ -0,0 +1,125 @@
+"""
+Incremental estimators for smoothing per-pool profitability scores.
+
+A pool's luck/effort swings widely from one round to the next, so the profit
+switcher decides on a smoothed score instead of the latest reading. Both
+estimators take O(1) (EWMA) or O(window) (rolling median) work per sample and
+can be warmed up from the pool_stats table after a restart.
+"""
+import bisect
+from collections import deque
+from typing import Dict, Any, Iterable, Optional
+
+SMOOTHING_METHODS = ('ewma', 'median', 'none')
+
+class EWMA:
+    """Time-aware exponentially weighted moving average: a sample's weight halves every `halflife` seconds."""
+
+    def __init__(self, halflife: float):
+        self.halflife = halflife
+        self.value: Optional[float] = None
+        self.timestamp: Optional[float] = None
+
+    def update(self, value: float, timestamp: float) -> float:
+        if self.value is None or self.halflife <= 0:
+            self.value = value
+        else:
+            elapsed = max(timestamp - self.timestamp, 0)
+            alpha = 1 - 0.5 ** (elapsed / self.halflife)
+            self.value += alpha * (value - self.value)
+        self.timestamp = timestamp
+        return self.value
+
+class RollingMedian:
+    """Median of the samples from the last `window` seconds, kept sorted as samples arrive and expire."""
+
+    def __init__(self, window: float):
+        self.window = window
+        self._samples = deque()
+        self._sorted = []
+
+    def update(self, value: float, timestamp: float) -> float:
+        self._samples.append((timestamp, value))
+        bisect.insort(self._sorted, value)
+        # The newest sample always stays, so a window <= 0 means no smoothing rather than no value
+        while len(self._samples) > 1 and self._samples[0][0] <= timestamp - self.window:
+            _, expired = self._samples.popleft()
+            del self._sorted[bisect.bisect_left(self._sorted, expired)]
+        return self.value
+
+    @property
+    def value(self) -> Optional[float]:
+        n = len(self._sorted)
+        if not n:
+            return None
+        middle = n // 2
+        return self._sorted[middle] if n % 2 else (self._sorted[middle - 1] + self._sorted[middle]) / 2
+
+class Latest:
+    """No smoothing: the most recent sample."""
+
+    def __init__(self):
+        self.value: Optional[float] = None
+
+    def update(self, value: float, timestamp: float) -> float:
+        self.value = value
+        return value
+
+class PoolScoreSmoother:
+    """Keeps one estimator per pool and returns smoothed scores for each switcher cycle."""
+
+    def __init__(self, method: str = 'ewma', halflife: float = 21600, window: float = 86400):
+        if method not in SMOOTHING_METHODS:
+            raise ValueError(f"Unknown smoothing method {method!r}, expected one of {SMOOTHING_METHODS}")
+        self.method = method
+        self.halflife = halflife
+        self.window = window
+        self._estimators: Dict[str, Any] = {}
+
+    @property
+    def config(self) -> tuple:
+        return (self.method, self.halflife, self.window)
+
+    @property
+    def history_seconds(self) -> float:
+        """How far back samples still matter, for warming up from stored history."""
+        if self.method == 'ewma':
+            # Samples older than 5 half-lives carry about 3% of the weight
+            return self.halflife * 5
+        if self.method == 'median':
+            return self.window
+        return 0
+
+    def _estimator(self, pool: str):
+        estimator = self._estimators.get(pool)
+        if estimator is None:
+            if self.method == 'ewma':
+                estimator = EWMA(self.halflife)
+            elif self.method == 'median':
+                estimator = RollingMedian(self.window)
+            else:
+                estimator = Latest()
+            self._estimators[pool] = estimator
+        return estimator
+
+    def update(self, pool: str, score: Optional[float], timestamp: float) -> float:
+        """
+        Adds a sample and returns the pool's smoothed score. A missing or zero score
+        (failed fetch) is not a sample: the previous smoothed value is kept.
+        """
+        estimator = self._estimator(pool)
+        if score:
+            return estimator.update(score, timestamp)
+        return estimator.value or 0.0
+
+    def smooth(self, scores: Dict[str, float], timestamp: float) -> Dict[str, float]:
+        return {pool: self.update(pool, score, timestamp) for pool, score in scores.items()}
+
+    def warm_up(self, samples: Iterable[Dict[str, Any]]) -> int:
+        """Replays stored pool_stats rows (oldest first). Returns the number of samples used."""
+        used = 0
+        for sample in samples:
+            if sample.get('score'):
+                self.update(sample['pool'], sample['score'], sample['timestamp'])
+                used += 1
+        return used
@@ -1,46 +1,43 @@
 import os
-import time
 import logging
-import requests
+import http_client
+import logging_setup
+from swr_cache import SWRCache
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+logging_setup.configure()
 logger = logging.getLogger("price_fetcher")
 
 USE_LIVE_PRICE = os.getenv('USE_LIVE_PRICE', 'true').lower() == 'true'
 PRICE_CACHE_TTL = int(os.getenv('PRICE_CACHE_TTL', 300))
+# How long a price may be served after the last successful fetch while CoinGecko is failing.
+# Also how long it keeps being refreshed without reads, so it must exceed PROFIT_SWITCHING_INTERVAL.
+PRICE_MAX_STALE = int(os.getenv('PRICE_MAX_STALE', 10800))
+CACHE_NEGATIVE_TTL = int(os.getenv('CACHE_NEGATIVE_TTL', 60))
 COINGECKO_URL = "https://api.coingecko.com/api/v3/simple/price?ids=ergo&vs_currencies=usd"
+PRICE_KEY = 'ergo/usd'
 
-_cache = {
-    'price': None,
-    'timestamp': 0.0
-}
+price_cache = SWRCache('erg_price', ttl=PRICE_CACHE_TTL, max_stale=PRICE_MAX_STALE,
+                       negative_ttl=CACHE_NEGATIVE_TTL, max_workers=1)
 
-def fetch_erg_price():
+def _fetch_price_from_api() -> float:
+    response = http_client.get(COINGECKO_URL)
+    response.raise_for_status()
+    price = response.json().get('ergo', {}).get('usd')
+    if price is None:
+        raise ValueError("Ergo price not found in CoinGecko response")
+    logger.debug("Fetched ERG price: $%s", price)
+    return price
+
+def last_known_price():
+    """Most recently fetched price, however old, without touching the network."""
+    return price_cache.peek(PRICE_KEY) if USE_LIVE_PRICE else None
+
+def fetch_erg_price(wait: bool = True):
+    """
+    Returns the ERG price in USD, or None if live prices are disabled or no price
+    newer than PRICE_MAX_STALE is available. Only the very first call waits on CoinGecko.
+    """
     if not USE_LIVE_PRICE:
         logger.debug("Live price disabled, returning None")
         return None
-
-    current_time = time.time()
-    if _cache['price'] is not None and (current_time - _cache['timestamp']) < PRICE_CACHE_TTL:
-        logger.debug(f"Using cached ERG price: {_cache['price']}")
-        return _cache['price']
-
-    try:
-        response = requests.get(COINGECKO_URL, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        price = data.get('ergo', {}).get('usd')
-        if price is not None:
-            _cache['price'] = price
-            _cache['timestamp'] = current_time
-            logger.info(f"Fetched ERG price: ${price}")
-            return price
-        else:
-            logger.error("Ergo price not found in CoinGecko response")
-            return _cache['price']
-    except Exception as e:
-        logger.error(f"Failed to fetch ERG price: {e}")
-        return _cache['price']
+    return price_cache.get(PRICE_KEY, _fetch_price_from_api, wait=wait)
@@ -0,0 +1,256 @@
+"""
+Offline backtest and simulation of profit switching policies.
+
+Replays recorded pool stats (the pool_stats table, or a CSV fixture exported
+from it) through the profit switcher's own decision code under a simulated
+clock. Like profit_switcher.main(), the simulation checks pools every interval,
+waits IDLE_CHECK_INTERVAL while cooling down and RESTART_SETTLE_TIME after a
+restart. Only readings recorded up to the simulated time are visible to a
+decision, and the earnings for a stretch of mining use the readings recorded
+at its end, so a policy gets no credit for knowing a pool's luck in advance.
+
+Earnings are in score-hours (score x hours mined). Scores include the ERG price
+when it was recorded, so comparisons between policies are in USD terms. A
+switch loses `switch_cost` seconds of mining on the new pool.
+
+Usage:
+    python3 profit_backtest.py --days 30
+    python3 profit_backtest.py --export pool_stats.csv --days 365
+    python3 profit_backtest.py --fixture pool_stats.csv --thresholds 0.005,0.02,0.05 --cooldowns 900,3600,21600
+"""
+import sys
+import csv
+import bisect
+import argparse
+import itertools
+from typing import Dict, Any, List, Optional, Tuple
+
+import database
+import profit_switcher
+import switching_model
+from pool_smoothing import PoolScoreSmoother
+
+FIXTURE_COLUMNS = ('timestamp', 'pool', 'effort', 'fee', 'erg_price', 'score')
+
+# name -> (smoothing method, use the switching-cost model)
+POLICIES = {
+    'threshold': ('none', False),
+    'smoothed': ('ewma', False),
+    'cost_aware': ('ewma', True),
+}
+
+Series = List[Tuple[int, Dict[str, float]]]
+
+def _row_score(row: Dict[str, Any]) -> Optional[float]:
+    if row.get('score') not in (None, ''):
+        return float(row['score'])
+    if row.get('effort') in (None, ''):
+        return None
+    # Fixtures without a score column: rebuild it the way get_pool_profitability does
+    score = (1.0 - float(row.get('fee') or 0)) / max(float(row['effort']), 0.01)
+    if row.get('erg_price') not in (None, ''):
+        score *= float(row['erg_price'])
+    return score
+
+def build_series(rows) -> Series:
+    """Groups pool_stats rows (oldest first) per switcher cycle: [(timestamp, {pool: score})]."""
+    series: Series = []
+    for row in rows:
+        score = _row_score(row)
+        if not score:
+            continue
+        timestamp = int(row['timestamp'])
+        if not series or series[-1][0] != timestamp:
+            series.append((timestamp, {}))
+        series[-1][1][row['pool']] = score
+    return series
+
+def load_series(days: float) -> Series:
+    return build_series(database.get_pool_stats(days=days))
+
+def load_fixture(path: str) -> Series:
+    with open(path, newline='') as f:
+        return build_series(sorted(csv.DictReader(f), key=lambda row: int(row['timestamp'])))
+
+def export_fixture(path: str, days: float) -> int:
+    """Writes the recorded pool_stats rows to a CSV fixture. Returns the number of rows."""
+    rows = database.get_pool_stats(days=days)
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIXTURE_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
+
+class SimulatedClock:
+    """Stands in for time.time()/time.sleep() while replaying."""
+
+    def __init__(self, start: float):
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+class RealizedEarnings:
+    """
+    Per-pool prefix sums of realized score over the recorded timeline. Mining a
+    pool from a to b earns integral(pool, a, b) in O(log n).
+    """
+
+    def __init__(self, series: Series):
+        self.timestamps = [timestamp for timestamp, _ in series]
+        pools = sorted({pool for _, scores in series for pool in scores})
+        self.rates: Dict[str, List[float]] = {}
+        self.cumulative: Dict[str, List[float]] = {}
+        for pool in pools:
+            rates, cumulative, last = [], [0.0], 0.0
+            for k in range(len(series) - 1):
+                # Segment k is realized at its end; carry the last reading over gaps
+                last = series[k + 1][1].get(pool, last)
+                rates.append(last)
+                cumulative.append(cumulative[-1] + last * (series[k + 1][0] - series[k][0]))
+            self.rates[pool] = rates
+            self.cumulative[pool] = cumulative
+
+    def _until(self, pool: str, t: float) -> float:
+        if pool not in self.cumulative or not self.timestamps:
+            return 0.0
+        t = min(max(t, self.timestamps[0]), self.timestamps[-1])
+        k = bisect.bisect_right(self.timestamps, t) - 1
+        if k >= len(self.rates[pool]):
+            return self.cumulative[pool][-1]
+        return self.cumulative[pool][k] + self.rates[pool][k] * (t - self.timestamps[k])
+
+    def integral(self, pool: str, start: float, end: float) -> float:
+        return self._until(pool, end) - self._until(pool, start)
+
+def backtest(series: Series, policy: str = 'cost_aware', threshold: float = 0.005,
+             interval: Optional[float] = None, cooldown: float = profit_switcher.DEFAULT_MIN_RUNTIME,
+             horizon: float = profit_switcher.DEFAULT_SWITCH_HORIZON,
+             switch_cost: float = switching_model.DEFAULT_RESTART_DOWNTIME,
+             halflife: float = profit_switcher.DEFAULT_SMOOTHING_HALFLIFE,
+             start_pool: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Simulates one policy over the series. `interval` defaults to the spacing of
+    the recorded cycles. Returns earnings (score-hours), earnings of staying on
+    the start pool, switch count and seconds lost to switching.
+    """
+    if len(series) < 2:
+        raise ValueError("Need at least two recorded cycles to simulate")
+    method, cost_aware = POLICIES[policy]
+    if interval is None:
+        interval = (series[-1][0] - series[0][0]) / (len(series) - 1)
+    horizon = profit_switcher.decision_horizon(horizon, interval, cooldown)
+    smoother = PoolScoreSmoother(method=method, halflife=halflife)
+    realized = RealizedEarnings(series)
+    clock = SimulatedClock(series[0][0])
+    end = series[-1][0]
+
+    current = start_pool
+    last_switch = None
+    seen = 0
+    scores: Dict[str, float] = {}
+    # (time mining started, pool)
+    stints: List[Tuple[float, str]] = [(clock.time(), start_pool)] if start_pool else []
+    lost = 0.0
+    switches = 0
+
+    while clock.time() < end:
+        now = clock.time()
+        if last_switch is not None and now - last_switch < cooldown:
+            clock.sleep(profit_switcher.IDLE_CHECK_INTERVAL)
+            continue
+
+        # Feed only readings recorded since the previous check, as the live loop would see them
+        while seen < len(series) and series[seen][0] <= now:
+            scores.update(smoother.smooth(series[seen][1], series[seen][0]))
+            seen += 1
+
+        if current is None:
+            current, _ = profit_switcher.pick_best_pool(scores)
+            stints.append((now, current))
+
+        best, best_score = profit_switcher.pick_best_pool(scores)
+        if best is not None and best != current:
+            current_score = scores.get(current, 0.0)
+            if cost_aware:
+                switch, _ = profit_switcher.decide_switch(best_score, current_score, threshold, horizon, switch_cost)
+            else:
+                switch = current_score <= 0 or best_score > current_score * (1 + threshold)
+            if switch:
+                current = best
+                last_switch = now
+                switches += 1
+                stints.append((now, current))
+                lost += realized.integral(current, now, now + switch_cost)
+                clock.sleep(profit_switcher.RESTART_SETTLE_TIME)
+        clock.sleep(interval)
+
+    earnings = 0.0
+    for (started, pool), (stopped, _) in zip(stints, stints[1:] + [(end, None)]):
+        earnings += realized.integral(pool, started, stopped)
+    baseline = realized.integral(stints[0][1], stints[0][0], end)
+    return {
+        'policy': policy,
+        'threshold': threshold,
+        'cooldown': cooldown,
+        'earnings': (earnings - lost) / 3600,
+        'baseline': baseline / 3600,
+        'switches': switches,
+        'downtime': switches * switch_cost,
+    }
+
+def compare(series: Series, policies, thresholds, cooldowns, **options) -> List[Dict[str, Any]]:
+    """Runs every policy x threshold x cooldown combination."""
+    return [backtest(series, policy, threshold=threshold, cooldown=cooldown, **options)
+            for policy, threshold, cooldown in itertools.product(policies, thresholds, cooldowns)]
+
+def _floats(text: str) -> List[float]:
+    return [float(value) for value in text.split(',') if value.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare profit switching policies on recorded pool stats")
+    parser.add_argument('--days', type=float, default=30, help="Days of recorded pool stats to use or export")
+    parser.add_argument('--fixture', help="Replay a CSV fixture instead of the database")
+    parser.add_argument('--export', metavar='FILE', help="Write recorded pool stats to a CSV fixture and exit")
+    parser.add_argument('--policies', default=','.join(POLICIES))
+    parser.add_argument('--thresholds', default='0.005', help="Comma-separated switching thresholds")
+    parser.add_argument('--cooldowns', default=str(profit_switcher.DEFAULT_MIN_RUNTIME), help="Comma-separated cooldowns in seconds")
+    parser.add_argument('--interval', type=float, help="Seconds between checks (default: spacing of the recorded cycles)")
+    parser.add_argument('--horizon', type=float, default=profit_switcher.DEFAULT_SWITCH_HORIZON)
+    parser.add_argument('--switch-cost', type=float,
+                        help="Seconds lost per switch (default: measured from history around past switches)")
+    args = parser.parse_args(argv)
+
+    if args.export:
+        count = export_fixture(args.export, args.days)
+        print(f"Wrote {count} pool stats rows to {args.export}")
+        return 0
+
+    series = load_fixture(args.fixture) if args.fixture else load_series(args.days)
+    if len(series) < 2:
+        print("Not enough recorded pool stats to simulate")
+        return 1
+
+    switch_cost = args.switch_cost
+    if switch_cost is None:
+        if args.fixture:
+            switch_cost = switching_model.DEFAULT_RESTART_DOWNTIME
+        else:
+            switch_cost, measured = profit_switcher.measure_restart_downtime()
+            print(f"Switch cost: {switch_cost:.0f}s ({measured or 'no'} measured switches)")
+
+    days = (series[-1][0] - series[0][0]) / 86400
+    print(f"Simulated {days:.1f} days, {len(series)} recorded cycles")
+    print(f"{'policy':<12} {'threshold':>9} {'cooldown':>9} {'earnings':>12} {'vs stay':>8} {'switches':>9} {'downtime':>10}")
+    for result in compare(series, args.policies.split(','), _floats(args.thresholds), _floats(args.cooldowns),
+                          interval=args.interval, horizon=args.horizon, switch_cost=switch_cost):
+        versus = (result['earnings'] / result['baseline'] - 1) * 100 if result['baseline'] else 0.0
+        print(f"{result['policy']:<12} {result['threshold']:>9g} {int(result['cooldown']):>8}s "
+              f"{result['earnings']:>12.2f} {versus:>+7.2f}% {result['switches']:>9} {int(result['downtime']):>9}s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
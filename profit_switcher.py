@@ -1,14 +1,24 @@
 import os
 import time
+import sqlite3
+import asyncio
 import logging
-import requests
-import subprocess
-from typing import Dict, List, Optional, Any
-from env_config import read_env_file, write_env_file
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any, Set
+from config_service import settings, parse_list
 import price_fetcher
+import http_client
+import database
+from swr_cache import SWRCache
+from pool_smoothing import PoolScoreSmoother, SMOOTHING_METHODS
+import switching_model
+import restart_coordinator
+import logging_setup
 
 # Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logging_setup.configure()
 logger = logging.getLogger("profit_switcher")
 
 # Cooldown settings
@@ -16,9 +26,40 @@ DEFAULT_MIN_RUNTIME = 900 # 15 minutes
 last_switch_time = 0.0
 start_time = time.time()
 
-# Cache for pool scores
-_pool_score_cache = {}
+# Pool stats (effort, fee) are served stale-while-revalidate; the ERG price is applied on read
 CACHE_TTL = 300 # 5 minutes
+# Must exceed PROFIT_SWITCHING_INTERVAL, or the stats stop being refreshed between checks
+POOL_STATS_MAX_STALE = int(os.getenv('POOL_STATS_MAX_STALE', 10800))
+CACHE_NEGATIVE_TTL = int(os.getenv('CACHE_NEGATIVE_TTL', 60))
+pool_stats_cache = SWRCache('pool_stats', ttl=CACHE_TTL, max_stale=POOL_STATS_MAX_STALE,
+                            negative_ttl=CACHE_NEGATIVE_TTL)
+
+# Seconds a scoring cycle may take before slow pools fall back to their last good score
+DEFAULT_SCORING_DEADLINE = 15
+# Last successfully computed score per pool stratum: {'score': float, 'timestamp': float}
+_last_good_scores: Dict[str, Dict[str, float]] = {}
+# Blocking HTTP calls run here; threads that miss the deadline finish in the background
+# without holding up the next cycle
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='pool-score')
+# Decisions use smoothed scores; overridable in .env
+DEFAULT_SMOOTHING = 'ewma'
+DEFAULT_SMOOTHING_HALFLIFE = 21600 # 6 hours
+DEFAULT_SMOOTHING_WINDOW = 86400 # 24 hours
+
+# Switching decisions weigh the expected gain over this many seconds against the switching cost
+DEFAULT_SWITCH_HORIZON = 21600 # 6 hours
+# Switches looked at when measuring restart downtime
+SWITCH_HISTORY_DAYS = 30
+# Pause after restarting the miner before the next check
+RESTART_SETTLE_TIME = 300
+# Pause between checks while auto switching is off, in the grace period or cooling down
+IDLE_CHECK_INTERVAL = 60
+
+# Set when a setting the loop uses changes in .env, so it re-checks without waiting out the interval
+_settings_changed = threading.Event()
+
+# Sentinel: fetch the ERG price inside get_pool_profitability
+_FETCH_PRICE = object()
 
 POOLS = [
     {
@@ -51,109 +92,279 @@ POOLS = [
     }
 ]
 
-def get_pool_profitability(pool: Dict, return_details: bool = False, use_cache: bool = True) -> Any:
+def fetch_pool_stats(pool: Dict) -> Dict[str, float]:
+    """
+    Fetches a pool's current effort from its API. Raises on network errors and
+    invalid JSON; unexpected stats formats fall back to 100% effort.
+    """
+    response = http_client.get(pool["url"])
+    response.raise_for_status()
+    try:
+        data = response.json()
+    except ValueError:
+        raise ValueError(f"Invalid JSON response from {pool['name']} API at {pool['url']}")
+
+    effort = 1.0 # Default effort (100% luck)
+
+    try:
+        if pool["type"] == "2miners":
+            # 2Miners 'luck' is current round luck in percentage.
+            # It can be a list or a single value depending on the exact endpoint.
+            luck = data.get("luck", 100.0)
+            if isinstance(luck, list) and len(luck) > 0:
+                luck = luck[0]
+            if isinstance(luck, str):
+                luck = float(luck)
+            effort = max(float(luck) / 100.0, 0.01)
+
+        elif pool["type"] == "herominers":
+            # HeroMiners has 'effort_1d' (average effort over 24h)
+            effort = max(float(data.get("effort_1d", 1.0)), 0.01)
+
+        elif pool["type"] == "nanopool":
+            # Nanopool has 'luck' in some responses.
+            luck = 100.0
+            if "luck" in data:
+                luck = float(data["luck"])
+            elif "data" in data and isinstance(data["data"], dict) and "luck" in data["data"]:
+                luck = float(data["data"]["luck"])
+            effort = max(luck / 100.0, 0.01)
+
+        elif pool["type"] == "woolypooly":
+            # WoolyPooly 'luck' or 'effort' might be in the response.
+            luck = 100.0
+            if "luck" in data:
+                luck = float(data["luck"])
+            elif "effort" in data:
+                luck = float(data["effort"])
+            effort = max(luck / 100.0, 0.01)
+    except (ValueError, TypeError, KeyError) as e:
+        logger.warning("Error parsing specific stats for %s: %s. Falling back to default effort.", pool['name'], e)
+        effort = 1.0
+
+    return {"effort": effort, "fee": pool["fee"]}
+
+def get_pool_profitability(pool: Dict, return_details: bool = False, use_cache: bool = True,
+                           erg_price: Any = _FETCH_PRICE, wait: bool = True) -> Any:
     """
     Calculates a profitability score for a pool.
     Score = (1 - Fee) / Effort
     Effort is estimated from the pool API if available.
+    Pass erg_price (None for no price) when the caller already fetched it for this cycle.
+    With wait=False a pool that has never been fetched scores 0.0 while it loads in the background.
     """
-    pool_url = pool["url"]
-
-    # Check cache
-    if use_cache and pool_url in _pool_score_cache:
-        cache_entry = _pool_score_cache[pool_url]
-        if time.time() - cache_entry['timestamp'] < CACHE_TTL:
-            logger.debug(f"Using cached score for {pool['name']}")
-            if return_details:
-                return cache_entry['details']
-            return cache_entry['score']
+    loader = lambda: fetch_pool_stats(pool)
+    if use_cache:
+        stats = pool_stats_cache.get(pool["url"], loader, wait=wait)
+    else:
+        stats = pool_stats_cache.load(pool["url"], loader)
+    age = pool_stats_cache.age(pool["url"])
+
+    if stats is None:
+        logger.error("No usable stats for %s", pool['name'])
+        return {"score": 0.0, "effort": 1.0, "fee": pool["fee"], "age": age} if return_details else 0.0
+
+    effort, fee = stats["effort"], stats["fee"]
+    score = (1.0 - fee) / effort
+    if erg_price is _FETCH_PRICE:
+        erg_price = price_fetcher.fetch_erg_price()
+    if erg_price is not None:
+        score *= erg_price
+        logger.debug("Adjusted score with ERG price ($%s): %.4f", erg_price, score)
+    logger.debug("Pool %s analysis: Score=%.4f, Effort=%.2f, Fee=%.3f", pool['name'], score, effort, fee)
 
-    try:
-        response = requests.get(pool_url, timeout=10)
-        response.raise_for_status()
-        try:
-            data = response.json()
-        except ValueError:
-            logger.error(f"Invalid JSON response from {pool['name']} API at {pool['url']}")
-            return {"score": 0.0, "effort": 1.0, "fee": pool["fee"]} if return_details else 0.0
+    if return_details:
+        return {"score": score, "effort": effort, "fee": fee, "age": age}
+    return score
 
-        fee = pool["fee"]
-        effort = 1.0 # Default effort (100% luck)
+async def score_pools_async(pools: List[Dict], deadline: float = DEFAULT_SCORING_DEADLINE,
+                            answered: Optional[Set[str]] = None) -> Dict[str, float]:
+    """
+    Scores all pools concurrently and returns {stratum: score}. The ERG price is fetched
+    once for the cycle. Pools whose stats are not in within `deadline` seconds are scored
+    from their last good value (0.0 if they never had one). If `answered` is given, the
+    strata of the pools that did answer in time are added to it.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
 
-        try:
-            if pool["type"] == "2miners":
-                # 2Miners 'luck' is current round luck in percentage.
-                # It can be a list or a single value depending on the exact endpoint.
-                luck = data.get("luck", 100.0)
-                if isinstance(luck, list) and len(luck) > 0:
-                    luck = luck[0]
-                if isinstance(luck, str):
-                    luck = float(luck)
-                effort = max(float(luck) / 100.0, 0.01)
-
-            elif pool["type"] == "herominers":
-                # HeroMiners has 'effort_1d' (average effort over 24h)
-                effort = max(float(data.get("effort_1d", 1.0)), 0.01)
-
-            elif pool["type"] == "nanopool":
-                # Nanopool has 'luck' in some responses.
-                luck = 100.0
-                if "luck" in data:
-                    luck = float(data["luck"])
-                elif "data" in data and isinstance(data["data"], dict) and "luck" in data["data"]:
-                    luck = float(data["data"]["luck"])
-                effort = max(luck / 100.0, 0.01)
-
-            elif pool["type"] == "woolypooly":
-                # WoolyPooly 'luck' or 'effort' might be in the response.
-                luck = 100.0
-                if "luck" in data:
-                    luck = float(data["luck"])
-                elif "effort" in data:
-                    luck = float(data["effort"])
-                effort = max(luck / 100.0, 0.01)
-        except (ValueError, TypeError, KeyError) as e:
-            logger.warning(f"Error parsing specific stats for {pool['name']}: {e}. Falling back to default effort.")
-            effort = 1.0
-
-        score = (1.0 - fee) / effort
-        erg_price = price_fetcher.fetch_erg_price()
-        if erg_price is not None:
-            score *= erg_price
-            logger.info(f"Adjusted score with ERG price (${erg_price}): {score:.4f}")
-        logger.info(f"Pool {pool['name']} analysis: Score={score:.4f}, Effort={effort:.2f}, Fee={fee:.3f}")
-
-        # Update cache
-        details = {"score": score, "effort": effort, "fee": fee}
-        _pool_score_cache[pool_url] = {
-            'timestamp': time.time(),
+    # The price gets at most half the budget so a slow price API cannot starve the pools
+    try:
+        erg_price = await asyncio.wait_for(loop.run_in_executor(_executor, price_fetcher.fetch_erg_price), deadline / 2)
+    except asyncio.TimeoutError:
+        erg_price = price_fetcher.last_known_price()
+        logger.warning("ERG price fetch took over %ss, using last known price %s", deadline / 2, erg_price)
+
+    futures = {
+        pool["stratum"]: loop.run_in_executor(_executor, functools.partial(get_pool_profitability, pool, erg_price=erg_price))
+        for pool in pools
+    }
+    remaining = max(deadline - (loop.time() - started), 0)
+    await asyncio.wait(futures.values(), timeout=remaining)
+
+    scores = {}
+    for pool in pools:
+        future = futures[pool["stratum"]]
+        if future.done() and not future.cancelled() and future.exception() is None:
+            scores[pool["stratum"]] = future.result()
+            _last_good_scores[pool["stratum"]] = {'score': future.result(), 'timestamp': time.time()}
+            if answered is not None:
+                answered.add(pool["stratum"])
+            continue
+        last_good = _last_good_scores.get(pool["stratum"])
+        scores[pool["stratum"]] = last_good['score'] if last_good else 0.0
+        if last_good:
+            age = int(time.time() - last_good['timestamp'])
+            logger.warning("%s missed the %ss scoring deadline, using last good score %.4f (%ds old)",
+                           pool['name'], deadline, last_good['score'], age)
+        else:
+            logger.warning("%s missed the %ss scoring deadline and has no previous score", pool['name'], deadline)
+    return scores
+
+def score_pools(pools: List[Dict], deadline: float = DEFAULT_SCORING_DEADLINE,
+                answered: Optional[Set[str]] = None) -> Dict[str, float]:
+    """Synchronous entry point for score_pools_async."""
+    return asyncio.run(score_pools_async(pools, deadline, answered))
+
+# stratum -> when the pool stats behind its last stored sample were fetched
+_last_recorded_fetch: Dict[str, float] = {}
+
+def record_pool_samples(pools: List[Dict], scores: Dict[str, float], timestamp: float,
+                        answered: Optional[Set[str]] = None) -> Set[str]:
+    """
+    Stores this cycle's raw readings in the pool_stats table and returns the strata
+    stored. Pools without a score, pools not in `answered` (scored from a fallback)
+    and pools whose cached stats were already stored are skipped, so one reading is
+    never stored twice.
+    """
+    erg_price = price_fetcher.last_known_price()
+    samples = []
+    recorded = set()
+    for pool in pools:
+        score = scores.get(pool["stratum"])
+        if not score or (answered is not None and pool["stratum"] not in answered):
+            continue
+        fetched_at = pool_stats_cache.loaded_at(pool["url"])
+        if fetched_at is not None:
+            if fetched_at == _last_recorded_fetch.get(pool["stratum"]):
+                continue
+            _last_recorded_fetch[pool["stratum"]] = fetched_at
+        recorded.add(pool["stratum"])
+        stats = pool_stats_cache.peek(pool["url"]) or {}
+        samples.append({
+            'pool': pool["stratum"],
+            'effort': stats.get('effort'),
+            'fee': stats.get('fee', pool["fee"]),
+            'erg_price': erg_price,
             'score': score,
-            'details': details
-        }
-
-        if return_details:
-            return details
-        return score
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Network error fetching stats for {pool['name']}: {e}")
-    except Exception as e:
-        logger.error(f"Unexpected error for {pool['name']}: {e}")
-    return 0.0
+        })
+    try:
+        database.log_pool_stats(samples, timestamp)
+    except sqlite3.Error as e:
+        logger.error("Failed to store pool stats: %s", e)
+    return recorded
+
+def smoothing_config(env_vars: Dict[str, str]) -> tuple:
+    """(method, halflife, window) from .env, as compared against PoolScoreSmoother.config."""
+    method = env_vars.get("POOL_SMOOTHING", DEFAULT_SMOOTHING).lower()
+    if method not in SMOOTHING_METHODS:
+        logger.warning("Unknown POOL_SMOOTHING %r, using %s", method, DEFAULT_SMOOTHING)
+        method = DEFAULT_SMOOTHING
+    return (method,
+            float(env_vars.get("POOL_SMOOTHING_HALFLIFE", DEFAULT_SMOOTHING_HALFLIFE)),
+            float(env_vars.get("POOL_SMOOTHING_WINDOW", DEFAULT_SMOOTHING_WINDOW)))
+
+def build_smoother(env_vars: Dict[str, str]) -> PoolScoreSmoother:
+    """Creates the score smoother configured in .env, warmed up from stored pool stats."""
+    method, halflife, window = smoothing_config(env_vars)
+    smoother = PoolScoreSmoother(method=method, halflife=halflife, window=window)
+    if smoother.history_seconds:
+        try:
+            used = smoother.warm_up(database.get_pool_stats(days=smoother.history_seconds / 86400))
+            logger.info("Pool score smoothing: %s, warmed up from %s stored samples", method, used)
+        except sqlite3.Error as e:
+            logger.warning("Could not load stored pool stats, smoothing starts empty: %s", e)
+    return smoother
+
+def decision_horizon(horizon: float, interval: float, cooldown: float) -> float:
+    """A switch is held for at least one interval and the cooldown, so it is never weighed over less."""
+    return max(horizon, interval, cooldown)
+
+def pick_best_pool(pool_scores: Dict[str, float]) -> tuple:
+    """(stratum, score) of the highest-scoring pool; ties go to the pool listed first."""
+    best, max_score = None, -1.0
+    for stratum, score in pool_scores.items():
+        if score > max_score:
+            best, max_score = stratum, score
+    return best, max_score
+
+def decide_switch(best_score: float, current_score: float, threshold: float, horizon: float,
+                  switch_cost: float) -> tuple:
+    """The switching rule shared by main() and profit_backtest: (switch?, expected net gain)."""
+    gain = switching_model.expected_switch_gain(best_score, current_score, horizon, switch_cost)
+    return gain > threshold, gain
+
+def measure_restart_downtime(days: float = SWITCH_HISTORY_DAYS) -> tuple:
+    """
+    Effective restart downtime in seconds, measured from the history table around
+    the switches of the last `days` days. Returns (seconds, switches measured).
+    """
+    measurements = []
+    try:
+        for switch in database.get_pool_switches(days=days):
+            rows = database.get_hashrate_between(switch['timestamp'] - switching_model.BASELINE_WINDOW,
+                                                 switch['timestamp'] + switching_model.RECOVERY_TIMEOUT)
+            measurements.append(switching_model.measure_switch_downtime(switch['timestamp'], rows))
+    except sqlite3.Error as e:
+        logger.warning("Could not measure restart downtime from history: %s", e)
+    return switching_model.estimate_restart_downtime(measurements)
+
+def active_pools(names: List[str]) -> List[Dict]:
+    """POOLS limited to the names in PROFIT_SWITCHING_POOLS; all pools when the list is empty."""
+    if not names:
+        return POOLS
+    wanted = {name.lower() for name in names}
+    pools = [pool for pool in POOLS if pool["name"].lower() in wanted]
+    unknown = wanted - {pool["name"].lower() for pool in pools}
+    if unknown:
+        logger.warning("Unknown pools in PROFIT_SWITCHING_POOLS: %s", ', '.join(sorted(unknown)))
+    return pools or POOLS
+
+def _on_settings_changed(changes: Dict[str, Any]) -> None:
+    logger.info("Profit switching settings changed: %s", ', '.join(sorted(changes)))
+    _settings_changed.set()
+
+def wait_for_next_check(interval: float) -> None:
+    """Sleeps `interval` seconds in IDLE_CHECK_INTERVAL steps, returning early once the settings change."""
+    deadline = time.time() + interval
+    while not _settings_changed.is_set():
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        time.sleep(min(IDLE_CHECK_INTERVAL, remaining))
+    _settings_changed.clear()
 
 def main():
     global last_switch_time
     logger.info("Profit Switcher started")
+    smoother = None
     while True:
         try:
-            env_vars = read_env_file()
+            # Parsed once and refreshed by the config watcher, not re-read from disk every loop
+            env_vars = settings.snapshot()
             auto_switching = env_vars.get("AUTO_PROFIT_SWITCHING", "false").lower() == "true"
             threshold = float(env_vars.get("PROFIT_SWITCHING_THRESHOLD", "0.005"))
             interval = int(env_vars.get("PROFIT_SWITCHING_INTERVAL", "3600"))
             min_runtime_cfg = int(env_vars.get("MIN_SWITCH_COOLDOWN", DEFAULT_MIN_RUNTIME))
+            scoring_deadline = float(env_vars.get("POOL_SCORING_DEADLINE", DEFAULT_SCORING_DEADLINE))
+            horizon = decision_horizon(float(env_vars.get("PROFIT_SWITCH_HORIZON", DEFAULT_SWITCH_HORIZON)),
+                                       interval, min_runtime_cfg)
+            round_loss = float(env_vars.get("SWITCH_ROUND_LOSS_SECONDS", "0"))
+            pools = active_pools(parse_list(env_vars.get("PROFIT_SWITCHING_POOLS", "")))
 
             if not auto_switching:
-                logger.info("Auto profit switching is disabled. Sleeping for 60s.")
-                time.sleep(60)
+                logger.debug("Auto profit switching is disabled. Sleeping for %ss.", IDLE_CHECK_INTERVAL)
+                time.sleep(IDLE_CHECK_INTERVAL)
                 continue
 
             # Safety check: ensure miner has been running for a minimum duration
@@ -162,32 +373,37 @@ def main():
             time_since_last_switch = current_time - last_switch_time if last_switch_time > 0 else runtime
 
             if runtime < min_runtime_cfg:
-                logger.info(f"Miner in initial grace period ({int(runtime)}s / {min_runtime_cfg}s). Skipping check.")
-                time.sleep(60)
+                logger.info("Miner in initial grace period (%ds / %ds). Skipping check.", runtime, min_runtime_cfg)
+                time.sleep(IDLE_CHECK_INTERVAL)
                 continue
 
             if time_since_last_switch < min_runtime_cfg:
-                logger.info(f"Cooldown active since last switch ({int(time_since_last_switch)}s / {min_runtime_cfg}s). Skipping check.")
-                time.sleep(60)
+                logger.info("Cooldown active since last switch (%ds / %ds). Skipping check.", time_since_last_switch, min_runtime_cfg)
+                time.sleep(IDLE_CHECK_INTERVAL)
                 continue
 
             logger.info("Auto profit switching is enabled. Checking pools...")
+            logger.debug("Pool stats cache: %s", pool_stats_cache.stats())
 
             current_pool_address = env_vars.get("POOL_ADDRESS")
-            best_pool = None
-            max_score = -1.0
-            pool_scores = {}
+            if smoother is None or smoother.config != smoothing_config(env_vars):
+                smoother = build_smoother(env_vars)
 
-            for pool in POOLS:
-                score = get_pool_profitability(pool)
-                pool_scores[pool["stratum"]] = score
-                if score > max_score:
-                    max_score = score
-                    best_pool = pool
+            now = time.time()
+            answered = set()
+            raw_scores = score_pools(pools, scoring_deadline, answered)
+            recorded = record_pool_samples(pools, raw_scores, now, answered)
+            # Decide on smoothed scores so a single lucky or unlucky round does not trigger a switch.
+            # Only new readings are samples; a pool scored from an old reading keeps its smoothed value.
+            pool_scores = smoother.smooth({stratum: score if stratum in recorded else None
+                                           for stratum, score in raw_scores.items()}, now)
+
+            best_stratum, max_score = pick_best_pool(pool_scores)
+            best_pool = next((pool for pool in pools if pool["stratum"] == best_stratum), None)
 
             # Log all scores for transparency
-            scores_summary = ", ".join([f"{p['name']}: {pool_scores.get(p['stratum'], 0):.4f}" for p in POOLS])
-            logger.info(f"Pool scores: {scores_summary}")
+            scores_summary = ", ".join([f"{p['name']}: {pool_scores.get(p['stratum'], 0):.4f} (latest {raw_scores.get(p['stratum'], 0):.4f})" for p in pools])
+            logger.info("Pool scores: %s", scores_summary)
 
             if best_pool and best_pool["stratum"] != current_pool_address:
                 # Use cached score for the current pool
@@ -195,43 +411,61 @@ def main():
 
                 # If current pool was not in POOLS (custom pool), fetch it once
                 if current_pool_score == 0.0:
-                   logger.info(f"Current pool {current_pool_address} not in standard list, attempting to identify...")
+                   logger.info("Current pool %s not in standard list, attempting to identify...", current_pool_address)
                    # We don't have the API URL for custom pools easily,
                    # but if it matches one of the known pools by address, we can use it.
                    for pool in POOLS:
                        if pool["stratum"] == current_pool_address:
                            current_pool_score = get_pool_profitability(pool)
-                           logger.info(f"Matched current pool to {pool['name']}, score: {current_pool_score:.4f}")
+                           logger.info("Matched current pool to %s, score: %.4f", pool['name'], current_pool_score)
                            break
 
                    # Still 0? Assume it's a generic pool with default luck (score 0.99 for 1% fee)
                    if current_pool_score == 0.0:
                        current_pool_score = 0.99
-                       logger.info(f"Using default score 0.99 for custom pool {current_pool_address}")
-
-                if max_score > current_pool_score * (1 + threshold):
-                    diff_pct = (max_score / current_pool_score - 1) * 100
-                    logger.info(f"Better pool found: {best_pool['name']} with score {max_score:.4f} (+{diff_pct:.2f}% over current {current_pool_score:.4f})")
-                    logger.info(f"Switching to {best_pool['stratum']}")
-
-                    env_vars["POOL_ADDRESS"] = best_pool["stratum"]
-                    write_env_file(env_vars)
+                       logger.info("Using default score 0.99 for custom pool %s", current_pool_address)
+
+                restart_downtime, measured = measure_restart_downtime()
+                switch_cost = restart_downtime + round_loss
+                switch, gain = decide_switch(max_score, current_pool_score, threshold, horizon, switch_cost)
+                diff_pct = (max_score / current_pool_score - 1) * 100
+                logger.info("Switch cost %.0fs (restart downtime %.0fs from %s measured switches), "
+                            "expected gain over %.1fh: %.2f%%",
+                            switch_cost, restart_downtime, measured or 'no', horizon / 3600, gain * 100)
+
+                if switch:
+                    logger.info("Better pool found: %s with score %.4f (+%.2f%% over current %.4f)",
+                                best_pool['name'], max_score, diff_pct, current_pool_score)
+                    logger.info("Switching to %s", best_pool['stratum'])
+
+                    settings.update({"POOL_ADDRESS": best_pool["stratum"]})
                     last_switch_time = time.time()
+                    try:
+                        database.log_pool_switch(current_pool_address, best_pool["stratum"], gain, last_switch_time)
+                    except sqlite3.Error as e:
+                        logger.error("Failed to record pool switch: %s", e)
 
                     logger.info("Restarting miner...")
-                    subprocess.run(["./restart.sh"], check=True)
+                    restart_coordinator.request_restart(f"Switching to {best_pool['name']}", source="profit_switcher",
+                                                        planned=True)
                     # Wait for restart to complete and miner to stabilize
-                    time.sleep(300)
+                    time.sleep(RESTART_SETTLE_TIME)
                 else:
-                    logger.info("Better pool found but gain is below threshold. Staying on current pool.")
+                    logger.info("Better pool found but gain after switching cost is below threshold. Staying on current pool.")
             else:
                 logger.info("Currently on the most profitable pool.")
 
         except Exception as e:
-            logger.error(f"Error in profit switcher loop: {e}")
+            logger.error("Error in profit switcher loop: %s", e)
             interval = 60 # Retry sooner on error
 
-        time.sleep(interval)
+        wait_for_next_check(interval)
 
 if __name__ == "__main__":
+    settings.subscribe(_on_settings_changed, keys=[
+        "AUTO_PROFIT_SWITCHING", "PROFIT_SWITCHING_THRESHOLD", "PROFIT_SWITCHING_INTERVAL", "PROFIT_SWITCHING_POOLS",
+        "MIN_SWITCH_COOLDOWN", "PROFIT_SWITCH_HORIZON", "POOL_SMOOTHING", "POOL_SMOOTHING_HALFLIFE",
+        "POOL_SMOOTHING_WINDOW",
+    ])
+    settings.start()
     main()
@@ -3,12 +3,10 @@ import time
 import logging
 from datetime import datetime
 import database
+import logging_setup
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+logging_setup.configure()
 logger = logging.getLogger("report_generator")
 
 DATA_DIR = os.getenv('DATA_DIR', '/app/data')
@@ -17,44 +15,16 @@ REPORT_FILE = os.path.join(DATA_DIR, 'weekly_report.txt')
 def generate_weekly_report():
     try:
         logger.info("Generating weekly report...")
-        history = database.get_history(days=7)
-        if not history:
+        summary = database.get_history_aggregates(days=7)
+        count = summary['samples']
+        if not count:
             logger.warning("No history data available for weekly report")
             return
 
-        total_hashrate = 0
-        total_dual_hashrate = 0
-        total_power = 0
-        total_efficiency = 0
-        count = len(history)
-
-        # Group by day for daily summary
-        daily_stats = {}
-
-        for entry in history:
-            h = entry.get('hashrate', 0)
-            dh = entry.get('dual_hashrate', 0)
-            p = entry.get('total_power_draw', 0)
-
-            total_hashrate += h
-            total_dual_hashrate += dh
-            total_power += p
-            if p > 0:
-                total_efficiency += h / p
-
-            # Use timestamp string to get the day
-            # Format is usually YYYY-MM-DDTHH:MM:SS.mmmmmm
-            day = entry['timestamp'][:10]
-            if day not in daily_stats:
-                daily_stats[day] = {'hashrate': 0, 'power': 0, 'count': 0}
-            daily_stats[day]['hashrate'] += h
-            daily_stats[day]['power'] += p
-            daily_stats[day]['count'] += 1
-
-        avg_hashrate = total_hashrate / count if count > 0 else 0
-        avg_dual_hashrate = total_dual_hashrate / count if count > 0 else 0
-        avg_power = total_power / count if count > 0 else 0
-        avg_efficiency = total_efficiency / count if count > 0 else 0
+        avg_hashrate = summary['hashrate_avg'] or 0
+        avg_dual_hashrate = summary['dual_hashrate_avg'] or 0
+        avg_power = summary['total_power_draw_avg'] or 0
+        avg_efficiency = summary['efficiency_avg'] or 0
 
         report_content = f"""Mining Weekly Report
 Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
@@ -68,12 +38,9 @@ Average Efficiency: {avg_efficiency:.3f} MH/W
 --------------------------------------
 Daily Summary:
 """
-        # Sort days descending
-        for day in sorted(daily_stats.keys(), reverse=True):
-            stats = daily_stats[day]
-            d_avg_h = stats['hashrate'] / stats['count']
-            d_avg_p = stats['power'] / stats['count']
-            report_content += f"{day}: {d_avg_h:.2f} MH/s | {d_avg_p:.1f} W\n"
+        # Days are returned newest first
+        for day in database.get_history_aggregates(days=7, group_by='day'):
+            report_content += f"{day['period']}: {day['hashrate_avg'] or 0:.2f} MH/s | {day['total_power_draw_avg'] or 0:.1f} W\n"
 
         report_content += "--------------------------------------\n"
 
@@ -82,10 +49,10 @@ Daily Summary:
 
         with open(REPORT_FILE, 'w') as f:
             f.write(report_content)
-        logger.info(f"Weekly report generated at {REPORT_FILE}")
+        logger.info("Weekly report generated at %s", REPORT_FILE)
 
     except Exception as e:
-        logger.error(f"Error generating weekly report: {e}")
+        logger.error("Error generating weekly report: %s", e)
 
 def main():
     database.init_db()
@@ -106,7 +73,7 @@ def main():
         if sleep_time < 60: # If we are very close to the hour, wait for the next one
             sleep_time += 3600
 
-        logger.info(f"Next report generation in {sleep_time} seconds")
+        logger.info("Next report generation in %s seconds", sleep_time)
         time.sleep(sleep_time)
 
 if __name__ == "__main__":
@@ -0,0 +1,239 @@
+"""
+Single entry point for restarting the miner.
+
+log_monitor.py, healthcheck.sh (through the CLI below) and profit_switcher.py
+all restart through request_restart(). An flock on RESTART_LOCK_FILE makes
+sure only one restart runs at a time, and a shared history in
+RESTART_STATE_FILE lets every caller see recent restarts:
+
+- Debounce: crash restarts requested within RESTART_DEBOUNCE seconds of the
+  last restart do not run at once (a CUDA error that prints 50 lines restarts once).
+- Backoff: each further crash restart within CRASH_LOOP_WINDOW doubles the
+  wait before the next one, from RESTART_BACKOFF_BASE up to RESTART_BACKOFF_MAX.
+- Requests inside the debounce or backoff window are kept: one restart per
+  process stays pending and runs when the window expires, unless another
+  restart ran after it was requested. A miner that fails again right after a
+  restart is therefore still restarted, only later.
+- Crash loop: after CRASH_LOOP_THRESHOLD crash restarts within the window,
+  the GPU tuning preset is lowered one step (High -> Efficient -> Quiet)
+  before restarting, when overclocking is applied. The new GPU_TUNING is saved
+  to $DATA_DIR/.env, which start.sh reads before applying the preset.
+
+Planned restarts (a profit switch) skip debounce and backoff, wait for the
+lock instead of being dropped, and do not count towards crash loops.
+
+Usage:
+    python3 restart_coordinator.py --source healthcheck --reason "GPU count mismatch"
+"""
+import os
+import sys
+import json
+import time
+import fcntl
+import logging
+import argparse
+import threading
+import subprocess
+from typing import Dict, Any, List, Optional
+
+from config_service import settings
+import logging_setup
+
+logging_setup.configure()
+logger = logging.getLogger("restart_coordinator")
+
+DATA_DIR = os.getenv('DATA_DIR', '/app/data')
+RESTART_SCRIPT = os.getenv('RESTART_SCRIPT', './restart.sh')
+RESTART_LOCK_FILE = os.getenv('RESTART_LOCK_FILE', os.path.join(DATA_DIR, 'restart.lock'))
+RESTART_STATE_FILE = os.getenv('RESTART_STATE_FILE', os.path.join(DATA_DIR, 'restart_state.json'))
+RESTART_DEBOUNCE = float(os.getenv('RESTART_DEBOUNCE', 60))
+RESTART_BACKOFF_BASE = float(os.getenv('RESTART_BACKOFF_BASE', 60))
+RESTART_BACKOFF_MAX = float(os.getenv('RESTART_BACKOFF_MAX', 1800))
+CRASH_LOOP_WINDOW = float(os.getenv('CRASH_LOOP_WINDOW', 3600))
+CRASH_LOOP_THRESHOLD = int(os.getenv('CRASH_LOOP_THRESHOLD', 4))
+# How long a planned restart waits for a restart already in progress
+PLANNED_LOCK_TIMEOUT = 60
+# Restart records kept in the state file
+MAX_HISTORY = 100
+
+# GPU_TUNING presets from most to least aggressive (see start.sh)
+TUNING_LADDER = ('High', 'Efficient', 'Quiet')
+
+class RestartCoordinator:
+    def __init__(self, script: str = RESTART_SCRIPT, lock_file: str = RESTART_LOCK_FILE,
+                 state_file: str = RESTART_STATE_FILE, debounce: float = RESTART_DEBOUNCE,
+                 backoff_base: float = RESTART_BACKOFF_BASE, backoff_max: float = RESTART_BACKOFF_MAX,
+                 crash_loop_window: float = CRASH_LOOP_WINDOW, crash_loop_threshold: int = CRASH_LOOP_THRESHOLD):
+        self.script = script
+        self.lock_file = lock_file
+        self.state_file = state_file
+        self.debounce = debounce
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.crash_loop_window = crash_loop_window
+        self.crash_loop_threshold = crash_loop_threshold
+        # Crash restart held back by debounce or backoff, run by a timer when the window expires
+        self._pending: Optional[threading.Timer] = None
+        self._pending_lock = threading.Lock()
+
+    def _acquire(self, blocking: bool) -> Optional[int]:
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_file)), exist_ok=True)
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.time() + PLANNED_LOCK_TIMEOUT
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                if not blocking or time.time() >= deadline:
+                    os.close(fd)
+                    return None
+                time.sleep(0.5)
+
+    def _release(self, fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = {}
+        except (OSError, ValueError) as e:
+            logger.warning("Could not read restart history from %s: %s", self.state_file, e)
+            state = {}
+        state.setdefault('restarts', [])
+        state.setdefault('escalations', [])
+        return state
+
+    def _save_state(self, state: Dict[str, Any]) -> None:
+        state['restarts'] = state['restarts'][-MAX_HISTORY:]
+        state['escalations'] = state['escalations'][-MAX_HISTORY:]
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            # The restart script may take this process down with the miner
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_file)
+
+    def recent_crash_restarts(self, state: Dict[str, Any], now: float) -> List[Dict[str, Any]]:
+        """Crash restarts in the crash-loop window after the last escalation (not counting the one that escalated)."""
+        restarts = [r for r in state['restarts'] if not r.get('planned') and r['time'] >= now - self.crash_loop_window]
+        if state['escalations']:
+            escalated = state['escalations'][-1]['time']
+            restarts = [r for r in restarts if r['time'] > escalated]
+        return restarts
+
+    def required_wait(self, state: Dict[str, Any], now: float) -> float:
+        """Seconds that must have passed since the last restart before a crash restart may run."""
+        crashes = len(self.recent_crash_restarts(state, now))
+        if crashes == 0:
+            return self.debounce
+        return max(self.debounce, min(self.backoff_base * 2 ** (crashes - 1), self.backoff_max))
+
+    def _escalate(self, state: Dict[str, Any], now: float) -> Optional[str]:
+        """Lowers GPU_TUNING one step. Returns the new preset, or None if there is nothing to lower."""
+        if not settings.get('APPLY_OC'):
+            logger.error("Crash loop detected, but overclocking is not applied; no GPU profile to lower")
+            return None
+        current = settings.get('GPU_TUNING') or ('Efficient' if settings.get('ECO_MODE') else 'High')
+        position = TUNING_LADDER.index(current)
+        if position + 1 >= len(TUNING_LADDER):
+            logger.error("Crash loop detected, already on the lowest tuning preset (%s)", current)
+            return None
+        lowered = TUNING_LADDER[position + 1]
+        settings.update({'GPU_TUNING': lowered})
+        state['escalations'].append({'time': now, 'from': current, 'to': lowered})
+        logger.error("Crash loop detected: lowered GPU tuning from %s to %s for the next miner start", current, lowered)
+        return lowered
+
+    def _defer(self, reason: str, source: str, delay: float, requested_at: float) -> None:
+        """Keeps a crash restart pending until the debounce or backoff window expires."""
+        with self._pending_lock:
+            if self._pending is not None:
+                # One pending restart covers every request made while it waits
+                return
+            timer = threading.Timer(delay, self._run_pending, args=(reason, source, requested_at))
+            timer.daemon = True
+            self._pending = timer
+            timer.start()
+
+    def _run_pending(self, reason: str, source: str, requested_at: float) -> None:
+        with self._pending_lock:
+            self._pending = None
+        try:
+            self.request_restart(reason, source, requested_at=requested_at)
+        except Exception as e:
+            logger.error("Pending restart failed: %s", e)
+
+    def cancel_pending(self) -> None:
+        """Drops a restart waiting for its debounce or backoff window."""
+        with self._pending_lock:
+            if self._pending is not None:
+                self._pending.cancel()
+                self._pending = None
+
+    def request_restart(self, reason: str, source: str, planned: bool = False,
+                        requested_at: Optional[float] = None) -> bool:
+        """
+        Restarts the miner unless another restart is running. A crash restart inside the
+        debounce or backoff window is deferred until it expires. Returns True if it restarted now.
+        `requested_at` is set for deferred requests, which are dropped if a restart ran since.
+        """
+        fd = self._acquire(blocking=planned)
+        if fd is None:
+            logger.info("Restart requested by %s (%s) while another restart is running; skipped", source, reason)
+            return False
+        try:
+            now = time.time()
+            state = self.load_state()
+            if not planned:
+                last = state['restarts'][-1]['time'] if state['restarts'] else None
+                if requested_at is not None and last is not None and last >= requested_at:
+                    logger.info("Pending restart (%s) dropped: the miner was restarted since it was requested", reason)
+                    return False
+                wait = self.required_wait(state, now)
+                if last is not None and now - last < wait:
+                    delay = last + wait - now
+                    logger.info("Restart requested by %s (%s) %.0fs after the last one; deferred for %.0fs",
+                                source, reason, now - last, delay)
+                    self._defer(reason, source, delay, now if requested_at is None else requested_at)
+                    return False
+                if len(self.recent_crash_restarts(state, now)) + 1 >= self.crash_loop_threshold:
+                    self._escalate(state, now)
+
+            state['restarts'].append({'time': now, 'source': source, 'reason': reason, 'planned': planned})
+            self._save_state(state)
+            logger.info("Restarting miner: %s (requested by %s)", reason, source)
+            try:
+                subprocess.run([self.script], check=True)
+            except Exception as e:
+                logger.error("Failed to run restart script: %s", e)
+                return False
+            return True
+        finally:
+            self._release(fd)
+
+_coordinator = None
+
+def get_coordinator() -> RestartCoordinator:
+    global _coordinator
+    if _coordinator is None:
+        _coordinator = RestartCoordinator()
+    return _coordinator
+
+def request_restart(reason: str, source: str, planned: bool = False) -> bool:
+    return get_coordinator().request_restart(reason, source, planned=planned)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Restart the miner through the shared restart coordinator")
+    parser.add_argument('--source', default='cli')
+    parser.add_argument('--reason', default='manual restart')
+    parser.add_argument('--planned', action='store_true', help="Skip debounce and backoff (a deliberate restart)")
+    args = parser.parse_args(argv)
+    return 0 if request_restart(args.reason, args.source, planned=args.planned) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import os
+import copy
+import json
+import time
+import logging
+import tempfile
+import threading
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger("rig_snapshot")
+
+# metrics.py is the single collector: it scrapes the miner, SMI tools, node and host
+# once per loop and publishes the result here. Readers (dashboard sessions, other
+# services) load the file instead of scraping the hardware themselves.
+SNAPSHOT_FILE = os.getenv('SNAPSHOT_FILE', os.path.join(os.getenv('DATA_DIR', '.'), 'latest_snapshot.json'))
+# Snapshots older than this are treated as missing (collector stopped or hung)
+SNAPSHOT_MAX_AGE = float(os.getenv('SNAPSHOT_MAX_AGE', 60))
+
+# Parsed copy of the file, reused until its mtime changes
+_read_cache = {'path': None, 'mtime': None, 'snapshot': None}
+_read_lock = threading.Lock()
+
+def publish_snapshot(miner_data: Optional[Dict[str, Any]], node_status: Dict[str, Any], system_info: Dict[str, Any]) -> bool:
+    """Atomically replaces the published snapshot, so readers never see a partial file."""
+    snapshot = {
+        'published_at': time.time(),
+        'miner': miner_data,
+        'node': node_status,
+        'system': system_info,
+    }
+    directory = os.path.dirname(os.path.abspath(SNAPSHOT_FILE))
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.snapshot-', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(snapshot, f)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, SNAPSHOT_FILE)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return True
+    except (OSError, TypeError, ValueError) as e:
+        logger.error("Failed to publish rig snapshot: %s", e)
+        return False
+
+def read_snapshot(max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Returns the latest published snapshot, or None if it is missing, unreadable or
+    older than max_age (SNAPSHOT_MAX_AGE by default). The file is only parsed again
+    when its mtime changes.
+    """
+    max_age = SNAPSHOT_MAX_AGE if max_age is None else max_age
+    try:
+        mtime = os.stat(SNAPSHOT_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+    with _read_lock:
+        if _read_cache['path'] != SNAPSHOT_FILE or _read_cache['mtime'] != mtime:
+            try:
+                with open(SNAPSHOT_FILE, 'r') as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("Could not read rig snapshot: %s", e)
+                return None
+            _read_cache.update(path=SNAPSHOT_FILE, mtime=mtime, snapshot=snapshot)
+        snapshot = _read_cache['snapshot']
+
+    if time.time() - snapshot.get('published_at', 0) > max_age:
+        return None
+    # Callers may annotate the result; keep the cached copy pristine
+    return copy.deepcopy(snapshot)
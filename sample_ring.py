@@ -0,0 +1,187 @@
+"""
+Fixed-size memory-mapped ring buffer of recent per-GPU samples.
+
+metrics.py appends one record per GPU on every scrape. Any process on the host
+can map the same file and read the most recent samples as a NumPy structured
+array, without touching SQLite or the Prometheus endpoint.
+
+File layout (little-endian):
+    header  HEADER_FORMAT, padded to HEADER_SIZE bytes
+    slots   capacity * RECORD_FORMAT
+
+Readers and the single writer coordinate with a seqlock: the writer makes the
+sequence counter odd while it updates slots and even when done, and readers
+retry until they see the same even value before and after copying.
+"""
+import os
+import sys
+import mmap
+import time
+import struct
+import logging
+import argparse
+import threading
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger("sample_ring")
+
+SAMPLE_RING_FILE = os.getenv('SAMPLE_RING_FILE', os.path.join(os.getenv('DATA_DIR', '.'), 'sample_ring.bin'))
+# Default holds one hour of 15 s scrapes for up to 16 GPUs
+SAMPLE_RING_CAPACITY = int(os.getenv('SAMPLE_RING_CAPACITY', 4096))
+
+MAGIC = b'ERGRING1'
+VERSION = 1
+# magic, version, record size, capacity, sequence (seqlock), total records written
+HEADER_FORMAT = '<8sIIIxxxxQQ'
+HEADER_SIZE = 64
+SEQ_OFFSET = struct.calcsize('<8sIIIxxxx')
+COUNT_OFFSET = SEQ_OFFSET + 8
+
+RECORD_FIELDS = (
+    ('timestamp', 'd'),
+    ('gpu_index', 'I'),
+    ('hashrate', 'f'),
+    ('dual_hashrate', 'f'),
+    ('temperature', 'f'),
+    ('power_draw', 'f'),
+    ('fan_speed', 'f'),
+    ('accepted_shares', 'I'),
+    ('rejected_shares', 'I'),
+)
+RECORD_FORMAT = '<' + ''.join(code for _, code in RECORD_FIELDS)
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+_NUMPY_CODES = {'d': '<f8', 'f': '<f4', 'I': '<u4'}
+RECORD_DTYPE = np.dtype([(name, _NUMPY_CODES[code]) for name, code in RECORD_FIELDS])
+
+class RingWriter:
+    """Single-writer side. Creates (or re-creates on layout change) the ring file and appends samples."""
+
+    def __init__(self, path: str = None, capacity: int = None):
+        self.path = path or SAMPLE_RING_FILE
+        self.capacity = capacity or SAMPLE_RING_CAPACITY
+        size = HEADER_SIZE + self.capacity * RECORD_SIZE
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            existing = os.fstat(fd).st_size
+            if existing != size:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+            self._mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        magic, version, record_size, capacity, seq, count = struct.unpack_from(HEADER_FORMAT, self._mm, 0)
+        if (magic, version, record_size, capacity) != (MAGIC, VERSION, RECORD_SIZE, self.capacity) or seq % 2:
+            # New file, different layout, or a writer died mid-update: start empty
+            struct.pack_into(HEADER_FORMAT, self._mm, 0, MAGIC, VERSION, RECORD_SIZE, self.capacity, 0, 0)
+            count = 0
+        self._count = count
+
+    def append(self, records: List[Dict[str, Any]], timestamp: Optional[float] = None) -> None:
+        """Appends one record per dict (GPU readings as produced by miner_api)."""
+        if not records:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        seq = struct.unpack_from('<Q', self._mm, SEQ_OFFSET)[0]
+        struct.pack_into('<Q', self._mm, SEQ_OFFSET, seq + 1)
+        for i, gpu in enumerate(records):
+            slot = (self._count + i) % self.capacity
+            struct.pack_into(
+                RECORD_FORMAT, self._mm, HEADER_SIZE + slot * RECORD_SIZE,
+                timestamp,
+                int(gpu.get('index', i)),
+                float(gpu.get('hashrate', 0) or 0),
+                float(gpu.get('dual_hashrate', 0) or 0),
+                float(gpu.get('temperature', 0) or 0),
+                float(gpu.get('power_draw', 0) or 0),
+                float(gpu.get('fan_speed', 0) or 0),
+                int(gpu.get('accepted_shares', 0) or 0),
+                int(gpu.get('rejected_shares', 0) or 0),
+            )
+        self._count += len(records)
+        struct.pack_into('<Q', self._mm, COUNT_OFFSET, self._count)
+        struct.pack_into('<Q', self._mm, SEQ_OFFSET, seq + 2)
+
+    def close(self) -> None:
+        self._mm.close()
+
+class RingReader:
+    """Read-only view of a ring file written by RingWriter, usable from any process."""
+
+    def __init__(self, path: str = None):
+        self.path = path or SAMPLE_RING_FILE
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, capacity, _, _ = struct.unpack_from(HEADER_FORMAT, self._mm, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+            self._mm.close()
+            raise ValueError(f"{self.path} is not a version {VERSION} sample ring")
+        self.capacity = capacity
+        # Zero-copy view of every slot, in slot order
+        self.slots = np.frombuffer(self._mm, dtype=RECORD_DTYPE, count=capacity, offset=HEADER_SIZE)
+
+    def read(self, last: Optional[int] = None, retries: int = 100) -> np.ndarray:
+        """Copies the newest `last` records (default: all held), oldest first."""
+        for _ in range(retries):
+            seq = struct.unpack_from('<Q', self._mm, SEQ_OFFSET)[0]
+            if seq % 2:
+                time.sleep(0)
+                continue
+            count = struct.unpack_from('<Q', self._mm, COUNT_OFFSET)[0]
+            held = min(count, self.capacity)
+            n = held if last is None else min(last, held)
+            start = (count - n) % self.capacity
+            if start + n <= self.capacity:
+                records = self.slots[start:start + n].copy()
+            else:
+                records = np.concatenate((self.slots[start:], self.slots[:start + n - self.capacity]))
+            if struct.unpack_from('<Q', self._mm, SEQ_OFFSET)[0] == seq:
+                return records
+        raise TimeoutError("Sample ring kept changing while being read")
+
+    def read_since(self, seconds: float) -> np.ndarray:
+        """Records from the last `seconds` seconds."""
+        records = self.read()
+        return records[records['timestamp'] >= time.time() - seconds]
+
+    def close(self) -> None:
+        # Drop the NumPy view first; the mmap cannot close while it is exported
+        self.slots = None
+        self._mm.close()
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def append_samples(gpus: List[Dict[str, Any]], timestamp: Optional[float] = None) -> None:
+    """Appends a scrape's GPU readings to the process-wide writer, opening it on first use."""
+    global _writer
+    with _writer_lock:
+        try:
+            if _writer is None:
+                _writer = RingWriter()
+            _writer.append(gpus, timestamp)
+        except (OSError, ValueError, struct.error) as e:
+            logger.error("Failed to append to sample ring: %s", e)
+
+def main(argv=None):
+    """Prints recent samples as CSV, for shell helpers: python3 sample_ring.py --seconds 300"""
+    parser = argparse.ArgumentParser(description="Dump recent per-GPU samples from the ring buffer")
+    parser.add_argument('--seconds', type=float, help="Only samples from the last N seconds")
+    parser.add_argument('--last', type=int, help="Only the newest N records")
+    parser.add_argument('--file', default=SAMPLE_RING_FILE)
+    args = parser.parse_args(argv)
+
+    reader = RingReader(args.file)
+    records = reader.read_since(args.seconds) if args.seconds else reader.read(args.last)
+    print(','.join(RECORD_DTYPE.names))
+    for record in records:
+        print(','.join(str(value.item()) for value in record))
+    reader.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
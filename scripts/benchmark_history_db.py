@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmarks history queries on a synthetic database, with and without the
+schema v2 indexes.
+
+Builds DAYS of samples at INTERVAL seconds for GPUS GPUs (default: 30 days,
+15 s, 12 GPUs, about 2M gpu_history rows) and times the read and prune paths
+used by the dashboard and metrics exporter.
+
+Usage: python3 scripts/benchmark_history_db.py [--days 30] [--gpus 12] [--interval 15]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import database
+
+INDEXES = ('idx_history_timestamp', 'idx_gpu_history_timestamp', 'idx_gpu_history_gpu_timestamp')
+
+def populate(days, gpus, interval):
+    start = int(time.time() - days * 86400)
+    samples = int(days * 86400 / interval)
+    history_rows = []
+    gpu_rows = []
+    for i in range(samples):
+        ts = start + i * interval
+        history_rows.append((ts, 120.0 * gpus, 0, 60.0, 50.0, 200.0 * gpus, i, 0))
+        for g in range(gpus):
+            gpu_rows.append((ts, g, 120.0 + random.random(), 0, 60.0, 200.0, 50.0, i, 0))
+        if len(gpu_rows) >= 100000:
+            _insert(history_rows, gpu_rows)
+            history_rows, gpu_rows = [], []
+    _insert(history_rows, gpu_rows)
+    # Rollups are normally maintained by flush(); build them from the raw rows in one pass
+    with database._writer_lock:
+        conn = database._get_writer()
+        with conn:
+            database.rebuild_rollups(conn.cursor())
+    return samples
+
+def _insert(history_rows, gpu_rows):
+    with database._writer_lock:
+        conn = database._get_writer()
+        with conn:
+            conn.executemany(database.HISTORY_INSERT, history_rows)
+            conn.executemany(database.GPU_HISTORY_INSERT, gpu_rows)
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run_queries(gpus):
+    return {
+        'get_history(days=1)': timed(lambda: database.get_history(days=1)),
+        'get_gpu_history(gpu, days=1)': timed(lambda: database.get_gpu_history(gpu_index=gpus - 1, days=1)),
+        'get_gpu_history(gpu, days=7)': timed(lambda: database.get_gpu_history(gpu_index=gpus - 1, days=7)),
+        'get_history_series(days=30)': timed(lambda: database.get_history_series(days=30)),
+        'get_gpu_history_series(gpu, days=30)': timed(lambda: database.get_gpu_history_series(gpus - 1, days=30)),
+        'get_gpu_indices(days=1)': timed(lambda: database.get_gpu_indices(days=1)),
+        'prune_history(days=60) [no-op]': timed(lambda: database.prune_history(days=60)),
+    }
+
+def set_indexes(enabled):
+    with database._writer_lock:
+        conn = database._get_writer()
+        if enabled:
+            database._migrate_add_indexes(conn.cursor())
+        else:
+            for name in INDEXES:
+                conn.execute(f'DROP INDEX IF EXISTS {name}')
+        conn.commit()
+        conn.execute('ANALYZE')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=float, default=30)
+    parser.add_argument('--gpus', type=int, default=12)
+    parser.add_argument('--interval', type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, 'bench.db')
+        database.init_db()
+
+        print(f"Populating {args.days} days x {args.gpus} GPUs at {args.interval}s...", flush=True)
+        start = time.perf_counter()
+        samples = populate(args.days, args.gpus, args.interval)
+        print(f"  {samples} history rows, {samples * args.gpus} gpu_history rows in {time.perf_counter() - start:.1f}s")
+
+        set_indexes(False)
+        without = run_queries(args.gpus)
+        set_indexes(True)
+        with_idx = run_queries(args.gpus)
+        database.close_connections()
+
+    print(f"\n{'query':<40}{'no index':>12}{'indexed':>12}{'speedup':>10}")
+    for name in without:
+        speedup = without[name] / with_idx[name] if with_idx[name] > 0 else float('inf')
+        print(f"{name:<40}{without[name] * 1000:>10.1f}ms{with_idx[name] * 1000:>10.1f}ms{speedup:>9.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -18,6 +18,21 @@ load_secret DUAL_WALLET
 # Default to /app/data if DATA_DIR is not set
 DATA_DIR=${DATA_DIR:-/app/data}
 
+# Settings changed at runtime are saved to $DATA_DIR/.env, while the container
+# environment keeps the values it was created with. Prefer the saved value.
+load_runtime_setting() {
+    local var=$1
+    local value
+    value=$(DATA_DIR="$DATA_DIR" python3 -c "import sys, env_config; print(env_config.read_env_file().get(sys.argv[1], ''))" "$var" 2>/dev/null)
+    if [ -n "$value" ] && [ "$value" != "${!var}" ]; then
+        export "$var"="$value"
+        echo "Using $var=$value from $DATA_DIR/.env."
+    fi
+}
+
+# restart_coordinator.py lowers GPU_TUNING when the miner is crash looping
+load_runtime_setting GPU_TUNING
+
 # Handle privilege dropping if running as root
 if [ "$(id -u)" = '0' ]; then
   echo "Running as root. Ensuring $DATA_DIR ownership and applying OC settings..."
@@ -2,16 +2,20 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
+import re
 import json
-import subprocess
 import logging
 from typing import Dict, Any, Optional
 
 import database
+import log_access
+import rig_snapshot
+import sample_ring
 from miner_api import get_full_miner_data, get_gpu_names, get_system_info, restart_service, get_node_status, refresh_gpu_names_cache, get_24h_average_hashrate
-from env_config import read_env_file, write_env_file
+from config_service import settings
+import restart_coordinator
 import profit_switcher
 
 def format_uptime(seconds: float) -> str:
@@ -26,6 +30,23 @@ def format_host_uptime(seconds: float) -> str:
     m = int((seconds % 3600) // 60)
     return f"{d}d {h}h {m}m"
 
+def to_local_datetime(series: pd.Series) -> pd.Series:
+    """Converts epoch-second history timestamps to local wall-clock datetimes for plotting."""
+    return pd.to_datetime(series, unit='s', utc=True).dt.tz_convert(datetime.now().astimezone().tzinfo).dt.tz_localize(None)
+
+def read_recent_samples(seconds: float):
+    """Recent per-GPU samples from metrics.py's ring buffer, or None if it is not available."""
+    try:
+        reader = sample_ring.RingReader()
+    except (OSError, ValueError):
+        return None
+    try:
+        return reader.read_since(seconds)
+    except TimeoutError:
+        return None
+    finally:
+        reader.close()
+
 def main():
     # Initialize database
     database.init_db()
@@ -51,10 +72,19 @@ def main():
         # Placeholder for real-time data
         placeholder = st.empty()
 
-        data = get_full_miner_data()
+        # Read what metrics.py last collected; scrape directly only if it is not running
+        snapshot = rig_snapshot.read_snapshot()
+        if snapshot:
+            data = snapshot['miner']
+            system_info = snapshot['system']
+            node_status = snapshot['node']
+            updated_at = datetime.fromtimestamp(snapshot['published_at'])
+        else:
+            data = get_full_miner_data()
+            system_info = get_system_info()
+            node_status = get_node_status()
+            updated_at = datetime.now()
         avg_hashrate_24h = get_24h_average_hashrate()
-        system_info = get_system_info()
-        node_status = get_node_status()
 
         if not data:
             data = {'status': 'Error: Miner API unreachable', 'total_hashrate': 0, 'total_power_draw': 0, 'efficiency': 0, 'avg_temperature': 0, 'uptime': 0}
@@ -69,7 +99,7 @@ def main():
             status_color = "status-mining" if status_val == 'Mining' else "status-error" if "Error" in status_val else "status-warning"
             st.markdown(f"### Status: <span class='{status_color}'>{status_val}</span>", unsafe_allow_html=True)
             col_h1, col_h2 = st.columns([4, 1])
-            col_h1.write(f"Miner: {data.get('miner', '--')} | Last Updated: {datetime.now().strftime('%H:%M:%S')}")
+            col_h1.write(f"Miner: {data.get('miner', '--')} | Last Updated: {updated_at.strftime('%H:%M:%S')}")
             if col_h2.button("🔄 Refresh Data"):
                 refresh_gpu_names_cache()
                 st.rerun()
@@ -111,6 +141,17 @@ def main():
             else:
                 st.info("No GPU data available")
 
+            # Last hour per GPU, straight from the collector's shared ring buffer
+            recent = read_recent_samples(3600)
+            if recent is not None and len(recent):
+                recent_df = pd.DataFrame(recent)
+                recent_df['timestamp'] = to_local_datetime(recent_df['timestamp'])
+                recent_df['gpu'] = 'GPU ' + recent_df['gpu_index'].astype(str)
+                fig_recent = px.line(recent_df, x='timestamp', y='hashrate', color='gpu',
+                                     labels={'hashrate': 'Hashrate (MH/s)', 'timestamp': 'Time', 'gpu': 'GPU'},
+                                     title="Per-GPU Hashrate (last hour)")
+                st.plotly_chart(fig_recent, use_container_width=True)
+
             # System Info & Services
             col_sys, col_ser = st.columns(2)
 
@@ -146,11 +187,14 @@ def main():
         st.title("Mining History")
 
         days = st.sidebar.slider("History Range (Days)", 1, 30, 7)
-        history = database.get_history(days=days)
+        # Long ranges are read from the rollup tables at a bounded number of points
+        resolution = database.choose_resolution(days)
+        history = database.get_history_series(days=days, resolution=resolution)
 
         if history:
+            st.caption(f"Resolution: {'raw samples' if resolution == 'raw' else resolution + ' averages'}")
             df = pd.DataFrame(history)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            df['timestamp'] = to_local_datetime(df['timestamp'])
 
             st.subheader("Hashrate History")
             # Determine which hashrates to show
@@ -188,10 +232,10 @@ def main():
             gpu_indices = database.get_gpu_indices(days=days)
             if gpu_indices:
                 selected_gpu = st.selectbox("Select GPU", gpu_indices, format_func=lambda x: f"GPU {x}")
-                gpu_history = database.get_gpu_history(gpu_index=selected_gpu, days=days)
+                gpu_history = database.get_gpu_history_series(selected_gpu, days=days, resolution=resolution)
                 if gpu_history:
                     gdf = pd.DataFrame(gpu_history)
-                    gdf['timestamp'] = pd.to_datetime(gdf['timestamp'])
+                    gdf['timestamp'] = to_local_datetime(gdf['timestamp'])
 
                     col_g1, col_g2 = st.columns(2)
 
@@ -261,7 +305,7 @@ def main():
     elif page == "Configuration":
         st.title("Configuration")
 
-        config = read_env_file()
+        config = settings.snapshot()
 
         with st.form("config_form"):
             # 1. Wallet & Pool
@@ -399,13 +443,15 @@ def main():
                 new_config['TELEGRAM_CHAT_ID'] = tg_chat_id
                 new_config['TELEGRAM_NOTIFY_THRESHOLD'] = str(tg_threshold)
 
-                write_env_file(new_config)
-                st.success("Configuration saved successfully! Restart the miner to apply changes.")
+                settings.update(new_config)
+                st.success("Configuration saved successfully! Profit switching and notification settings apply immediately; restart the miner to apply miner changes.")
 
         if st.button("Restart Miner"):
             try:
-                subprocess.run(['./restart.sh'], check=True)
-                st.info("Restart command sent...")
+                if restart_coordinator.request_restart("Restart requested from the dashboard", source="dashboard", planned=True):
+                    st.info("Restart command sent...")
+                else:
+                    st.error("Miner was not restarted: another restart is in progress or the restart script failed.")
             except Exception as e:
                 st.error(f"Failed to restart miner: {e}")
 
@@ -430,16 +476,41 @@ def main():
             log_path = os.path.join(data_dir, selected_log)
 
             if os.path.exists(log_path):
-                with open(log_path, 'r', errors='replace') as f:
-                    # For large logs, read only the last part
-                    f.seek(0, os.SEEK_END)
-                    size = f.tell()
-                    # Read last 50KB or so
-                    f.seek(max(0, size - 51200))
-                    content = f.read()
-                    lines = content.splitlines()
-
-                    st.text_area(f"Latest entries from {selected_log}", value="\n".join(lines[-100:]), height=400)
+                mode = st.radio("View", ["Latest", "Browse", "Search"], horizontal=True)
+
+                if mode == "Latest":
+                    line_count = st.number_input("Lines", min_value=10, max_value=5000, value=100, step=50)
+                    lines = log_access.tail_lines(log_path, int(line_count))
+                    st.text_area(f"Latest entries from {selected_log}", value="\n".join(lines), height=400)
+
+                elif mode == "Browse":
+                    page_size = 200
+                    index = log_access.get_index(log_path)
+                    page_count = index.page_count(page_size)
+                    page_number = st.number_input(f"Page (of {page_count}, {index.line_count} lines)",
+                                                  min_value=1, max_value=page_count, value=page_count)
+                    lines = index.page(int(page_number) - 1, page_size)
+                    st.text_area(f"{selected_log}, page {int(page_number)}", value="\n".join(lines), height=400)
+
+                else:
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        pattern = st.text_input("Regex", value="")
+                        levels = st.multiselect("Levels", list(log_access.LEVELS))
+                    with col2:
+                        hours = st.number_input("Last hours (0 = all)", min_value=0, value=0)
+                        include_rotated = st.checkbox("Include rotated logs", value=True)
+                    since = datetime.now() - timedelta(hours=hours) if hours else None
+                    try:
+                        results = log_access.search(log_path, pattern=pattern or None, levels=levels or None,
+                                                    since=since, include_rotated=include_rotated)
+                    except re.error as e:
+                        st.error(f"Invalid regex: {e}")
+                        results = None
+                    if results is not None:
+                        st.caption(f"{len(results)} matching lines (latest {log_access.SEARCH_LIMIT} shown at most)")
+                        if results:
+                            st.dataframe(pd.DataFrame(results)[['file', 'time', 'level', 'line']], use_container_width=True)
 
                 with open(log_path, 'rb') as f:
                     st.download_button(f"Download {selected_log}", data=f, file_name=selected_log, mime="text/plain")
@@ -448,19 +519,25 @@ def main():
         st.title("Pool Profitability")
         st.write("Real-time profitability analysis across supported Ergo pools.")
 
+        # Served from the stale-while-revalidate cache; never waits on the pool APIs
+        erg_price = profit_switcher.price_fetcher.fetch_erg_price(wait=False)
         stats = []
         for pool in profit_switcher.POOLS:
-            details = profit_switcher.get_pool_profitability(pool, return_details=True)
+            details = profit_switcher.get_pool_profitability(pool, return_details=True, erg_price=erg_price, wait=False)
             stats.append({
                 "Pool": pool["name"],
                 "Score": round(details['score'], 4),
                 "Effort (Luck)": f"{details['effort']*100:.1f}%",
                 "Fee": f"{details['fee']*100:.1f}%",
+                "Updated": "Fetching..." if details['age'] is None else f"{int(details['age'])}s ago",
                 "Address": pool["stratum"]
             })
 
         df_stats = pd.DataFrame(stats)
         st.dataframe(df_stats, use_container_width=True, hide_index=True)
+        cache_stats = profit_switcher.pool_stats_cache.stats()
+        st.caption(f"Pool stats cache: {cache_stats['hits']} hits, {cache_stats['stale_hits']} stale, "
+                   f"{cache_stats['misses']} misses, {cache_stats['refreshes']} refreshes, {cache_stats['failures']} failures")
 
         st.info("💡 **Score** is calculated as `(1 - Fee) / Effort`. Higher score means better profitability. Effort is estimated from pool's luck/effort statistics where available.")
 
@@ -0,0 +1,69 @@
+"""
+Switching-cost model for the profit switcher.
+
+A switch only pays off if the better pool's earnings over the decision horizon,
+minus the hashing time lost to the switch, beat staying put:
+
+    gain = (best * (horizon - cost) - current * horizon) / (current * horizon)
+
+The cost is the effective restart downtime measured from our own history table
+around past switches (time at zero hashrate plus partial hashrate while the DAG
+is rebuilt and the miner warms up), plus an allowance for unpaid round shares
+left behind. With zero cost the rule reduces to best > current * (1 + threshold).
+"""
+import statistics
+from typing import Dict, Any, List, Optional, Tuple
+
+# Used until enough switches have been measured; matches the old fixed restart wait
+DEFAULT_RESTART_DOWNTIME = 300
+# Switches needed before measurements replace the default
+MIN_MEASURED_SWITCHES = 1
+# Hashrate averaged over this many seconds before a switch is the baseline
+BASELINE_WINDOW = 1800
+# The miner counts as recovered once hashrate is back to this fraction of the baseline
+RECOVERY_FRACTION = 0.9
+# Give up measuring a switch the miner did not recover from within this time
+RECOVERY_TIMEOUT = 3600
+# Longest gap between two samples that is still treated as one sample interval (metrics logs every 15 s)
+MAX_SAMPLE_GAP = 30
+
+def expected_switch_gain(best_score: float, current_score: float, horizon: float, switch_cost: float) -> float:
+    """Relative earnings gain over `horizon` seconds from switching, after `switch_cost` lost seconds."""
+    if current_score <= 0 or horizon <= 0:
+        return float('inf') if best_score > 0 else 0.0
+    earning_time = max(horizon - switch_cost, 0)
+    return (best_score * earning_time - current_score * horizon) / (current_score * horizon)
+
+def measure_switch_downtime(switch_time: float, rows: List[Dict[str, Any]]) -> Optional[float]:
+    """
+    Effective seconds of hashing lost after one switch. Each sample interval after
+    switch_time counts by how far hashrate was below the pre-switch baseline, until
+    the first sample back at RECOVERY_FRACTION of it. `rows` are (timestamp, hashrate)
+    dicts spanning BASELINE_WINDOW before to RECOVERY_TIMEOUT after the switch.
+    Returns None when there is no baseline or the miner never recovered.
+    """
+    before = [r['hashrate'] for r in rows if r['timestamp'] < switch_time and r['hashrate']]
+    if not before:
+        return None
+    baseline = statistics.median(before)
+
+    lost = 0.0
+    previous = switch_time
+    for row in rows:
+        if row['timestamp'] < switch_time:
+            continue
+        hashrate = row['hashrate'] or 0
+        gap = row['timestamp'] - previous
+        # Time not covered by samples (metrics could not reach the miner) counts as fully lost
+        lost += min(gap, MAX_SAMPLE_GAP) * max(1 - hashrate / baseline, 0) + max(gap - MAX_SAMPLE_GAP, 0)
+        previous = row['timestamp']
+        if hashrate >= baseline * RECOVERY_FRACTION:
+            return lost
+    return None
+
+def estimate_restart_downtime(measurements: List[Optional[float]]) -> Tuple[float, int]:
+    """Median of the successful measurements, or DEFAULT_RESTART_DOWNTIME. Returns (seconds, measurements used)."""
+    measured = [m for m in measurements if m is not None]
+    if len(measured) < MIN_MEASURED_SWITCHES:
+        return float(DEFAULT_RESTART_DOWNTIME), 0
+    return float(statistics.median(measured)), len(measured)
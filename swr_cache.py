@@ -0,0 +1,195 @@
+"""
+Stale-while-revalidate cache for slow remote lookups (pool stats, ERG price).
+
+A value younger than `ttl * refresh_ahead` is served as is. Each successful load
+schedules the next one `ttl * refresh_ahead` seconds later on a timer, so a key
+that is read at least once every `max_stale` seconds is kept fresh in the
+background and readers never wait on the network for it, however far apart
+their reads are. A read that finds a value past `ttl * refresh_ahead` (e.g. after
+a failed refresh) still gets it, and starts a refresh. Callers only wait for a
+key they have never loaded (and not even then with wait=False).
+Values stay usable up to `max_stale` seconds after their last successful load.
+A failed load is remembered for `negative_ttl` seconds: the previous value keeps
+being served, and the failing source is retried after that.
+"""
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable
+
+logger = logging.getLogger("swr_cache")
+
+class SWRCache:
+    def __init__(self, name: str, ttl: float, max_stale: float, refresh_ahead: float = 0.8,
+                 negative_ttl: float = 60, max_workers: int = 4):
+        self.name = name
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.refresh_ahead = refresh_ahead
+        self.negative_ttl = negative_ttl
+        self.max_workers = max_workers
+        # key -> {'value', 'fetched_at', 'failed_at', 'error'}
+        self._entries: Dict[Any, Dict[str, Any]] = {}
+        self._inflight = set()
+        # Scheduled refreshes: the last loader and last read of each key, and its pending timer
+        self._loaders: Dict[Any, Callable[[], Any]] = {}
+        self._read_at: Dict[Any, float] = {}
+        self._timers: Dict[Any, threading.Timer] = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._executor = None
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'negative_hits': 0, 'refreshes': 0, 'failures': 0}
+
+    def get(self, key: Any, loader: Callable[[], Any], wait: bool = True) -> Optional[Any]:
+        """
+        Returns the cached value for key, refreshing it in the background when due.
+        On a miss, loads synchronously if `wait`, otherwise schedules a load and
+        returns None. Also returns None when the source is failing and there is no
+        usable value.
+        """
+        now = time.time()
+        with self._lock:
+            self._loaders[key] = loader
+            self._read_at[key] = now
+            entry = self._entries.get(key)
+            usable = entry is not None and entry['fetched_at'] is not None and now - entry['fetched_at'] < self.max_stale
+            if usable:
+                age = now - entry['fetched_at']
+                self._stats['hits' if age < self.ttl else 'stale_hits'] += 1
+                value = entry['value']
+                refresh = age >= self.ttl * self.refresh_ahead
+            elif entry is not None and self._failed_recently(entry, now):
+                self._stats['negative_hits'] += 1
+                return None
+            else:
+                self._stats['misses'] += 1
+                refresh = not wait
+
+        if usable:
+            if refresh:
+                self._refresh_async(key, loader)
+            return value
+        if refresh:
+            self._refresh_async(key, loader)
+            return None
+        return self._load(key, loader)
+
+    def load(self, key: Any, loader: Callable[[], Any]) -> Optional[Any]:
+        """Loads key now, bypassing freshness checks. Returns the new value or, on failure, the last usable one."""
+        with self._lock:
+            self._loaders[key] = loader
+            self._read_at[key] = time.time()
+        return self._load(key, loader)
+
+    def _load(self, key: Any, loader: Callable[[], Any]) -> Optional[Any]:
+        try:
+            value = loader()
+        except Exception as e:
+            now = time.time()
+            with self._lock:
+                entry = self._entries.setdefault(key, {'value': None, 'fetched_at': None})
+                entry['failed_at'] = now
+                entry['error'] = str(e)
+                self._stats['failures'] += 1
+                usable = entry['fetched_at'] is not None and now - entry['fetched_at'] < self.max_stale
+                fallback = entry['value'] if usable else None
+                self._schedule(key, self.negative_ttl)
+            logger.warning("%s cache: failed to load %s: %s", self.name, key, e)
+            return fallback
+
+        with self._lock:
+            self._entries[key] = {'value': value, 'fetched_at': time.time(), 'failed_at': None, 'error': None}
+            self._stats['refreshes'] += 1
+            self._schedule(key, self.ttl * self.refresh_ahead)
+        return value
+
+    def _schedule(self, key: Any, delay: float) -> None:
+        """Starts the timer for key's next refresh, replacing any pending one. Called with the lock held."""
+        pending = self._timers.get(key)
+        if pending is not None:
+            pending.cancel()
+        timer = threading.Timer(delay, self._scheduled_refresh, args=(key,))
+        timer.daemon = True
+        self._timers[key] = timer
+        timer.start()
+
+    def _scheduled_refresh(self, key: Any) -> None:
+        with self._lock:
+            if self._timers.get(key) is not threading.current_thread():
+                # Replaced by a newer timer, or cancelled by clear()
+                return
+            del self._timers[key]
+            loader = self._loaders.get(key)
+            read_at = self._read_at.get(key)
+            # Keys nobody read within max_stale are left to expire instead of being refreshed forever
+            if loader is None or read_at is None or time.time() - read_at >= self.max_stale:
+                return
+            if not self._start_refresh(key):
+                return
+        self._executor.submit(self._run_refresh, key, loader)
+
+    def _failed_recently(self, entry: Dict[str, Any], now: float) -> bool:
+        return entry.get('failed_at') is not None and now - entry['failed_at'] < self.negative_ttl
+
+    def _start_refresh(self, key: Any) -> bool:
+        """Marks key as refreshing unless it already is. Called with the lock held."""
+        if key in self._inflight:
+            return False
+        self._inflight.add(key)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f'{self.name}-refresh')
+        return True
+
+    def _refresh_async(self, key: Any, loader: Callable[[], Any]) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._failed_recently(entry, time.time()):
+                return
+            if not self._start_refresh(key):
+                return
+        self._executor.submit(self._run_refresh, key, loader)
+
+    def _run_refresh(self, key: Any, loader: Callable[[], Any]) -> None:
+        try:
+            self._load(key, loader)
+        finally:
+            with self._lock:
+                self._inflight.discard(key)
+                self._idle.notify_all()
+
+    def age(self, key: Any) -> Optional[float]:
+        """Seconds since key was last loaded successfully, or None if it never was."""
+        entry = self._entries.get(key)
+        if entry is None or entry['fetched_at'] is None:
+            return None
+        return time.time() - entry['fetched_at']
+
+    def loaded_at(self, key: Any) -> Optional[float]:
+        """Time key was last loaded successfully, or None if it never was."""
+        entry = self._entries.get(key)
+        return entry['fetched_at'] if entry is not None else None
+
+    def peek(self, key: Any) -> Optional[Any]:
+        """Last successfully loaded value, however old, without loading or counting a lookup."""
+        entry = self._entries.get(key)
+        return entry['value'] if entry is not None else None
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Blocks until no background refresh is running. Returns False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._inflight, timeout)
+
+    def clear(self) -> None:
+        """Drops every entry and cancels their scheduled refreshes."""
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+            self._loaders.clear()
+            self._read_at.clear()
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), refreshing=len(self._inflight))
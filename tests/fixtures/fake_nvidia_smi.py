@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""Stand-in for `nvidia-smi --query-gpu=... --format=csv,noheader,nounits --loop-ms=N`.
+
+Streams one CSV row per GPU every loop period. The temperature increases by one
+degree per loop so tests can tell successive samples apart.
+"""
+import sys
+import time
+
+interval_ms = 50
+gpu_count = 2
+for arg in sys.argv[1:]:
+    if arg.startswith('--loop-ms='):
+        interval_ms = int(arg.split('=', 1)[1])
+    elif arg.startswith('--gpus='):
+        gpu_count = int(arg.split('=', 1)[1])
+
+loop = 0
+while True:
+    for index in range(gpu_count):
+        print(f"{index}, Fake GPU {index}, {50 + loop}, {150.5 + index}, {40 + index}, 1500, 7000", flush=True)
+    loop += 1
+    time.sleep(interval_ms / 1000.0)
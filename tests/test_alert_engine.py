@@ -0,0 +1,177 @@
+import unittest
+from unittest.mock import MagicMock
+import os
+import json
+import time
+import shutil
+import threading
+import alert_engine
+
+def _miner(temps=(60, 60), accepted=100, rejected=0, instances=None, hashrate=120):
+    return {
+        'total_hashrate': hashrate,
+        'total_accepted_shares': accepted,
+        'total_rejected_shares': rejected,
+        'miner_instances': instances or {},
+        'gpus': [{'index': i, 'temperature': t} for i, t in enumerate(temps)],
+    }
+
+class TestAlertEngine(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = 'test_alert_engine'
+        os.makedirs(self.test_data_dir, exist_ok=True)
+        self.profiles_file = os.path.join(self.test_data_dir, 'gpu_profiles.json')
+        self.rules_file = os.path.join(self.test_data_dir, 'alert_rules.json')
+        self._write(self.profiles_file, {'Test GPU': {'GPU_TEMP_THRESHOLD': 70}})
+
+    def tearDown(self):
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+
+    def _write(self, path, content, mtime=None):
+        with open(path, 'w') as f:
+            json.dump(content, f)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def _engine(self, rules_file='', profile='Test GPU'):
+        return alert_engine.AlertEngine({}, rules_file=rules_file, profiles_file=self.profiles_file, profile=profile)
+
+    def _events(self, engine, snapshot, now, rule=None):
+        events = engine.evaluate(snapshot, now=now)
+        return [(e['rule'], e['status'], e['subject']) for e in events if rule is None or e['rule'] == rule]
+
+    def test_gpu_temperature_uses_profile_threshold_and_hysteresis(self):
+        engine = self._engine()
+        duration = alert_engine.DISCORD_NOTIFY_THRESHOLD
+        hot = {'miner': _miner(temps=(60, 75)), 'node': {}}
+
+        self.assertEqual(self._events(engine, hot, 0, 'gpu_temperature'), [])
+        self.assertEqual(self._events(engine, hot, duration, 'gpu_temperature'),
+                         [('gpu_temperature', 'firing', '1')])
+
+        # Below threshold but inside the hysteresis band (threshold 70, clears below 65)
+        warm = {'miner': _miner(temps=(60, 67)), 'node': {}}
+        self.assertEqual(self._events(engine, warm, duration + 15, 'gpu_temperature'), [])
+        cool = {'miner': _miner(temps=(60, 64)), 'node': {}}
+        events = engine.evaluate(cool, now=duration + 30)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['status'], 'resolved')
+        self.assertIn("GPU 1 below 65°C", events[0]['message'])
+
+    def test_duration_resets_when_condition_clears(self):
+        engine = self._engine()
+        duration = alert_engine.DISCORD_NOTIFY_THRESHOLD
+        hot = {'miner': _miner(temps=(75,)), 'node': {}}
+        cool = {'miner': _miner(temps=(60,)), 'node': {}}
+        engine.evaluate(hot, now=0)
+        engine.evaluate(cool, now=duration - 1)
+        self.assertEqual(self._events(engine, hot, duration + 1, 'gpu_temperature'), [])
+
+    def test_notify_threshold_change_applies_to_running_engine(self):
+        engine = self._engine()
+        hot = {'miner': _miner(temps=(75,)), 'node': {}}
+        engine.evaluate(hot, now=0)
+        engine.set_duration('DISCORD_NOTIFY_THRESHOLD', 30)
+        self.assertEqual(self._events(engine, hot, 30, 'gpu_temperature'), [('gpu_temperature', 'firing', '0')])
+        self.assertEqual([r['duration'] for r in engine.rules if r['name'] == 'gpu_temperature'], [30])
+
+    def test_reject_ratio_needs_enough_shares(self):
+        engine = self._engine()
+        few = {'miner': _miner(accepted=5, rejected=5), 'node': {}}
+        engine.evaluate(few, now=0)
+        self.assertEqual(self._events(engine, few, 120, 'reject_ratio'), [])
+
+        many = {'miner': _miner(accepted=80, rejected=20), 'node': {}}
+        engine.evaluate(many, now=200)
+        events = engine.evaluate(many, now=260)
+        self.assertEqual([e['rule'] for e in events], ['reject_ratio'])
+        self.assertIn("20.0%", events[0]['message'])
+
+    def test_instance_down_and_node_sync(self):
+        engine = self._engine()
+        snapshot = {
+            'miner': _miner(instances={'4444': 'UP', '4445': 'TIMEOUT'}),
+            'node': {'enabled': True, 'is_synced': False, 'full_height': 10, 'headers_height': 20},
+        }
+        engine.evaluate(snapshot, now=0)
+        self.assertEqual(self._events(engine, snapshot, 60), [('instance_down', 'firing', '4445')])
+        events = engine.evaluate(snapshot, now=300)
+        self.assertEqual([e['rule'] for e in events], ['node_out_of_sync'])
+        self.assertIn("(10 / 20)", events[0]['message'])
+
+        # Node sync is not evaluated when the check is disabled
+        disabled = {'miner': _miner(), 'node': {'enabled': False}}
+        engine = self._engine()
+        engine.evaluate(disabled, now=0)
+        self.assertEqual(self._events(engine, disabled, 1000, 'node_out_of_sync'), [])
+
+    def test_rules_reloaded_only_when_files_change(self):
+        self._write(self.rules_file, [
+            {'name': 'hot', 'scope': 'gpu', 'metric': 'temperature', 'op': '>', 'threshold': 50, 'channels': ['discord']}
+        ], mtime=1000)
+        engine = self._engine(rules_file=self.rules_file)
+        self.assertTrue(engine.reload_if_changed())
+        self.assertFalse(engine.reload_if_changed())
+        self.assertEqual([r['name'] for r in engine.rules], ['hot'])
+        self.assertEqual(self._events(engine, {'miner': _miner(temps=(55,)), 'node': {}}, 0), [('hot', 'firing', '0')])
+
+        self._write(self.rules_file, [
+            {'name': 'very_hot', 'scope': 'gpu', 'metric': 'temperature', 'op': '>', 'threshold': 90}
+        ], mtime=2000)
+        self.assertTrue(engine.reload_if_changed())
+        self.assertEqual([r['name'] for r in engine.rules], ['very_hot'])
+
+        # A broken file keeps the previous rules
+        self._write(self.rules_file, [{'name': 'broken'}], mtime=3000)
+        self.assertFalse(engine.reload_if_changed())
+        self.assertEqual([r['name'] for r in engine.rules], ['very_hot'])
+
+    def test_profile_change_recompiles_threshold(self):
+        engine = self._engine()
+        engine.reload_if_changed()
+        temp_rule = next(r for r in engine.rules if r['name'] == 'gpu_temperature')
+        self.assertEqual(temp_rule['threshold'], 70)
+
+        self._write(self.profiles_file, {'Test GPU': {'GPU_TEMP_THRESHOLD': 85}}, mtime=time.time() + 10)
+        engine.reload_if_changed()
+        temp_rule = next(r for r in engine.rules if r['name'] == 'gpu_temperature')
+        self.assertEqual(temp_rule['threshold'], 85)
+
+    def test_slow_notifier_does_not_block_submit(self):
+        release = threading.Event()
+        delivered = []
+
+        def slow_notifier(message):
+            release.wait(5)
+            delivered.append(message)
+
+        engine = alert_engine.AlertEngine({'telegram': slow_notifier}, rules_file='', profile='')
+        engine.reload_if_changed()
+        for rule in engine.rules:
+            rule['duration'] = 0
+        engine.start()
+        try:
+            start = time.monotonic()
+            engine.submit({'miner': None, 'node': {}})
+            time.sleep(0.05)
+            engine.submit({'miner': None, 'node': {}})
+            self.assertLess(time.monotonic() - start, 1.0)
+            release.set()
+            deadline = time.monotonic() + 5
+            while not delivered and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            engine.stop()
+        self.assertEqual(len(delivered), 1)
+        self.assertIn("Status: DOWN", delivered[0])
+
+    def test_notifier_errors_are_contained(self):
+        failing = MagicMock(side_effect=RuntimeError("boom"))
+        working = MagicMock()
+        engine = alert_engine.AlertEngine({'telegram': failing, 'discord': working}, rules_file='', profile='')
+        engine.dispatch([{'rule': 'x', 'status': 'firing', 'subject': 'rig', 'value': 1,
+                          'message': 'hello', 'channels': ['telegram', 'discord']}])
+        working.assert_called_once_with('hello')
+
+if __name__ == '__main__':
+    unittest.main()
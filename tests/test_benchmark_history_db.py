@@ -0,0 +1,42 @@
+import unittest
+import os
+import shutil
+import importlib.util
+import database
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts', 'benchmark_history_db.py')
+
+def _load_script():
+    spec = importlib.util.spec_from_file_location('benchmark_history_db', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class TestBenchmarkHistoryDb(unittest.TestCase):
+    """Smoke test so schema changes cannot silently break the benchmark script."""
+
+    def setUp(self):
+        self.test_data_dir = 'test_db_benchmark'
+        os.makedirs(self.test_data_dir, exist_ok=True)
+        self.original_db_file = database.DB_FILE
+        database.DB_FILE = os.path.join(self.test_data_dir, 'bench.db')
+        database.init_db()
+        self.benchmark = _load_script()
+
+    def tearDown(self):
+        database.close_connections()
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+        database.DB_FILE = self.original_db_file
+
+    def test_populate_builds_rollups_and_queries_run(self):
+        samples = self.benchmark.populate(days=0.05, gpus=2, interval=60)
+        with database.get_connection() as conn:
+            raw = conn.execute('SELECT COUNT(*) FROM gpu_history').fetchone()[0]
+            rolled = conn.execute('SELECT SUM(samples), SUM(hashrate_count) FROM gpu_history_1h').fetchone()
+        self.assertEqual(raw, samples * 2)
+        self.assertEqual(rolled, (raw, raw))
+        timings = self.benchmark.run_queries(2)
+        self.assertTrue(all(seconds >= 0 for seconds in timings.values()))
+
+if __name__ == '__main__':
+    unittest.main()
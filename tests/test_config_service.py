@@ -0,0 +1,124 @@
+import unittest
+from unittest.mock import patch
+import os
+import time
+import shutil
+import tempfile
+import threading
+import env_config
+import config_service
+import profit_switcher
+import metrics
+
+class TestConfigService(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = tempfile.mkdtemp()
+        self.env_file = os.path.join(self.test_data_dir, '.env')
+        self._write("AUTO_PROFIT_SWITCHING=true\nPROFIT_SWITCHING_THRESHOLD=0.01\nWORKER_NAME=rig1\n")
+        self.service = config_service.ConfigService(path=self.env_file)
+
+    def tearDown(self):
+        self.service.stop()
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+
+    def _write(self, content, mtime=None):
+        with open(self.env_file, 'w') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(self.env_file, (mtime, mtime))
+
+    def test_typed_values_and_defaults(self):
+        self.assertIs(self.service.get('AUTO_PROFIT_SWITCHING'), True)
+        self.assertEqual(self.service.get('PROFIT_SWITCHING_THRESHOLD'), 0.01)
+        self.assertEqual(self.service.get('PROFIT_SWITCHING_INTERVAL'), 3600)
+        self.assertEqual(self.service.get('WORKER_NAME'), 'rig1')
+        self.assertEqual(self.service.get('MISSING', 'fallback'), 'fallback')
+        self.assertEqual(self.service.snapshot()['PROFIT_SWITCHING_THRESHOLD'], '0.01')
+
+    def test_invalid_value_keeps_previous(self):
+        self.service.snapshot()
+        self._write("AUTO_PROFIT_SWITCHING=maybe\nPROFIT_SWITCHING_THRESHOLD=abc\n", mtime=time.time() + 10)
+        self.service.reload()
+        self.assertEqual(self.service.snapshot()['PROFIT_SWITCHING_THRESHOLD'], '0.01')
+        self.assertIs(self.service.get('AUTO_PROFIT_SWITCHING'), True)
+
+    def test_watcher_parses_once_and_pushes_changes(self):
+        received = []
+        changed = threading.Event()
+        self.service.subscribe(lambda changes: (received.append(changes), changed.set()),
+                               keys=['PROFIT_SWITCHING_THRESHOLD'])
+        self.service.start()
+
+        with patch('config_service.env_config.read_env_file', wraps=env_config.read_env_file) as mock_read:
+            for _ in range(100):
+                self.service.snapshot()
+                self.service.get('PROFIT_SWITCHING_THRESHOLD')
+            mock_read.assert_not_called()
+
+        # Another process (the dashboard) saves the file
+        env_config.write_env_file({'PROFIT_SWITCHING_THRESHOLD': '0.05', 'WORKER_NAME': 'rig2'}, self.env_file)
+        self.assertTrue(changed.wait(5))
+        self.assertEqual(received[-1], {'PROFIT_SWITCHING_THRESHOLD': 0.05})
+        self.assertEqual(self.service.get('WORKER_NAME'), 'rig2')
+
+    def test_update_applies_immediately(self):
+        received = []
+        self.service.subscribe(received.append)
+        changes = self.service.update({'POOL_ADDRESS': 'stratum+tcp://pool:1', 'PROFIT_SWITCHING_POOLS': 'a, b'})
+        self.assertEqual(changes, {'POOL_ADDRESS': 'stratum+tcp://pool:1', 'PROFIT_SWITCHING_POOLS': ['a', 'b']})
+        self.assertEqual(received, [changes])
+        # Settings not in the update are kept
+        self.assertEqual(env_config.read_env_file(self.env_file)['WORKER_NAME'], 'rig1')
+
+    def test_update_keeps_file_mode(self):
+        os.chmod(self.env_file, 0o600)
+        self.service.update({'TELEGRAM_BOT_TOKEN': 'secret'})
+        self.assertEqual(os.stat(self.env_file).st_mode & 0o777, 0o600)
+        os.remove(self.env_file)
+        env_config.write_env_file({'DISCORD_WEBHOOK_URL': 'https://example/hook'}, self.env_file)
+        self.assertEqual(os.stat(self.env_file).st_mode & 0o777, 0o600)
+
+    def test_without_watcher_changes_are_seen_on_access(self):
+        self.assertEqual(self.service.get('PROFIT_SWITCHING_THRESHOLD'), 0.01)
+        self._write("PROFIT_SWITCHING_THRESHOLD=0.02\n", mtime=time.time() + 10)
+        self.assertEqual(self.service.get('PROFIT_SWITCHING_THRESHOLD'), 0.02)
+
+    def test_failing_subscriber_does_not_block_others(self):
+        received = []
+        self.service.subscribe(lambda changes: 1 / 0)
+        self.service.subscribe(received.append)
+        self.service.update({'MIN_SWITCH_COOLDOWN': '600'})
+        self.assertEqual(received, [{'MIN_SWITCH_COOLDOWN': 600}])
+
+class TestLiveSettings(unittest.TestCase):
+    def test_active_pools(self):
+        self.assertEqual(profit_switcher.active_pools([]), profit_switcher.POOLS)
+        self.assertEqual([p['name'] for p in profit_switcher.active_pools(['herominers', 'Nope'])], ['HeroMiners'])
+        self.assertEqual(profit_switcher.active_pools(['Nope']), profit_switcher.POOLS)
+
+    @patch('profit_switcher.time.sleep')
+    def test_settings_change_ends_wait_early(self, mock_sleep):
+        def change_settings(seconds):
+            profit_switcher._on_settings_changed({'PROFIT_SWITCHING_THRESHOLD': 0.02})
+        mock_sleep.side_effect = change_settings
+
+        profit_switcher.wait_for_next_check(3600)
+        mock_sleep.assert_called_once_with(profit_switcher.IDLE_CHECK_INTERVAL)
+        self.assertFalse(profit_switcher._settings_changed.is_set())
+
+    def test_metrics_applies_notification_settings(self):
+        with patch.object(metrics, 'TELEGRAM_ENABLE', False), \
+             patch.object(metrics.discord_notifier, 'DISCORD_WEBHOOK_URL', None), \
+             patch.object(metrics.alerts, 'profile', None):
+            metrics.apply_settings({'TELEGRAM_ENABLE': True, 'DISCORD_WEBHOOK_URL': 'https://example/hook',
+                                    'GPU_PROFILE': 'NVIDIA GeForce RTX 3070'})
+            self.assertTrue(metrics.TELEGRAM_ENABLE)
+            self.assertEqual(metrics.discord_notifier.DISCORD_WEBHOOK_URL, 'https://example/hook')
+            self.assertEqual(metrics.alerts.profile, 'NVIDIA GeForce RTX 3070')
+
+        with patch.object(metrics.alerts, 'set_duration') as mock_set_duration:
+            metrics.apply_settings({'TELEGRAM_NOTIFY_THRESHOLD': 120})
+            mock_set_duration.assert_called_once_with('TELEGRAM_NOTIFY_THRESHOLD', 120)
+
+if __name__ == '__main__':
+    unittest.main()
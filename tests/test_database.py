@@ -17,6 +17,7 @@ class TestDatabase(unittest.TestCase):
         database.clear_history()
 
     def tearDown(self):
+        database.close_connections()
         if os.path.exists('test_miner_history.db'):
             os.remove('test_miner_history.db')
 
@@ -68,7 +69,7 @@ class TestDatabase(unittest.TestCase):
         # Insert some old data
         with database.get_connection() as conn:
             cursor = conn.cursor()
-            old_time = (datetime.now() - timedelta(days=31)).isoformat()
+            old_time = int((datetime.now() - timedelta(days=31)).timestamp())
             cursor.execute('''
                 INSERT INTO history (timestamp, hashrate, dual_hashrate, avg_temp, avg_fan_speed, accepted_shares, rejected_shares)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
@@ -87,6 +88,33 @@ class TestDatabase(unittest.TestCase):
         self.assertEqual(len(history_after), 1)
         self.assertEqual(history_after[0]['hashrate'], 120.5)
 
+    def test_get_history_aggregates(self):
+        database.log_history(100.0, 60.0, 50.0, 10, 0, total_power_draw=200.0)
+        database.log_history(120.0, 70.0, 50.0, 20, 1, total_power_draw=0)
+
+        summary = database.get_history_aggregates(days=1)
+        self.assertEqual(summary['samples'], 2)
+        self.assertEqual(summary['hashrate_avg'], 110.0)
+        self.assertEqual(summary['hashrate_min'], 100.0)
+        self.assertEqual(summary['avg_temp_max'], 70.0)
+        self.assertEqual(summary['accepted_shares_sum'], 30)
+        # Samples without power count as zero efficiency
+        self.assertAlmostEqual(summary['efficiency_avg'], 0.25)
+
+        daily = database.get_history_aggregates(days=1, group_by='day')
+        self.assertEqual(len(daily), 1)
+        self.assertEqual(daily[0]['period'], datetime.now().strftime('%Y-%m-%d'))
+        self.assertEqual(daily[0]['samples'], 2)
+
+        hourly = database.get_history_aggregates(days=1, group_by='hour')
+        self.assertEqual(hourly[0]['period'], datetime.now().strftime('%Y-%m-%d %H:00'))
+
+    def test_get_history_aggregates_empty(self):
+        summary = database.get_history_aggregates(days=1)
+        self.assertEqual(summary['samples'], 0)
+        self.assertIsNone(summary['hashrate_avg'])
+        self.assertEqual(database.get_history_aggregates(days=1, group_by='day'), [])
+
     def test_clear_history(self):
         # Insert some data
         database.log_history(120.5, 45.0, 60.0, 100, 2)
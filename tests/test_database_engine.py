@@ -0,0 +1,88 @@
+import unittest
+from unittest.mock import patch
+import os
+import time
+import shutil
+import database
+
+GPUS = [
+    {'index': 0, 'hashrate': 60.0, 'temperature': 60, 'power_draw': 150, 'fan_speed': 40},
+    {'index': 1, 'hashrate': 61.0, 'temperature': 62, 'power_draw': 155, 'fan_speed': 45}
+]
+
+class TestDatabaseEngine(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = 'test_db_engine'
+        os.makedirs(self.test_data_dir, exist_ok=True)
+        self.original_db_file = database.DB_FILE
+        database.DB_FILE = os.path.join(self.test_data_dir, 'miner_history.db')
+        database.init_db()
+
+    def tearDown(self):
+        database.close_connections()
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+        database.DB_FILE = self.original_db_file
+
+    def test_wal_mode_enabled(self):
+        with database.get_connection() as conn:
+            mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(mode.lower(), 'wal')
+
+    def test_writer_connection_is_reused(self):
+        database.log_history(100, 60, 40, 1, 0, gpus=GPUS)
+        writer = database._writer['conn']
+        database.log_history(101, 60, 40, 2, 0, gpus=GPUS)
+        self.assertIs(database._writer['conn'], writer)
+        self.assertEqual(len(database.get_history(days=1)), 2)
+        self.assertEqual(len(database.get_gpu_history(days=1)), 4)
+
+    def test_writer_reopened_when_file_replaced(self):
+        database.log_history(100, 60, 40, 1, 0)
+        database.close_connections()
+        os.remove(database.DB_FILE)
+        database.init_db()
+        database.log_history(100, 60, 40, 1, 0)
+        self.assertEqual(len(database.get_history(days=1)), 1)
+
+    def test_write_buffer_flushes_every_n_samples(self):
+        with patch.object(database, 'DB_WRITE_BUFFER_SIZE', 3):
+            database.log_history(100, 60, 40, 1, 0, gpus=GPUS)
+            database.log_history(101, 60, 40, 2, 0, gpus=GPUS)
+            self.assertEqual(database.get_history(days=1), [])
+
+            database.log_history(102, 60, 40, 3, 0, gpus=GPUS)
+            self.assertEqual(len(database.get_history(days=1)), 3)
+            self.assertEqual(len(database.get_gpu_history(days=1)), 6)
+
+    def test_write_buffer_flushes_after_interval(self):
+        with patch.object(database, 'DB_WRITE_BUFFER_SIZE', 100), patch.object(database, 'DB_FLUSH_INTERVAL', 30):
+            with patch('database.time.monotonic', return_value=1000.0):
+                database.log_history(100, 60, 40, 1, 0)
+            self.assertEqual(database.get_history(days=1), [])
+            with patch('database.time.monotonic', return_value=1031.0):
+                database.log_history(101, 60, 40, 2, 0)
+            self.assertEqual(len(database.get_history(days=1)), 2)
+
+    def test_close_connections_flushes_buffer(self):
+        with patch.object(database, 'DB_WRITE_BUFFER_SIZE', 100):
+            database.log_history(100, 60, 40, 1, 0)
+            database.close_connections()
+        self.assertEqual(len(database.get_history(days=1)), 1)
+
+    def test_reads_not_blocked_by_open_write(self):
+        database.log_history(100, 60, 40, 1, 0)
+        with database._writer_lock:
+            writer = database._get_writer()
+            writer.execute('BEGIN IMMEDIATE')
+            writer.execute(database.HISTORY_INSERT, (int(time.time()), 1, 0, 0, 0, 0, 0, 0))
+            try:
+                start = time.monotonic()
+                history = database.get_history(days=1)
+                self.assertLess(time.monotonic() - start, 1.0)
+                # Uncommitted row is not visible to the reader
+                self.assertEqual(len(history), 1)
+            finally:
+                writer.rollback()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -34,6 +34,7 @@ class TestDatabaseEnhancements(unittest.TestCase):
         self.assertEqual(history1[0]['hashrate'], 60)
 
     def tearDown(self):
+        database.close_connections()
         if os.path.exists('miner_history.db'):
             os.remove('miner_history.db')
 
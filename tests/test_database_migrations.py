@@ -0,0 +1,105 @@
+import unittest
+import os
+import shutil
+import sqlite3
+from datetime import datetime, timedelta
+import database
+
+class TestDatabaseMigrations(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = 'test_db_migrations'
+        os.makedirs(self.test_data_dir, exist_ok=True)
+        self.original_db_file = database.DB_FILE
+        database.DB_FILE = os.path.join(self.test_data_dir, 'miner_history.db')
+
+    def tearDown(self):
+        database.close_connections()
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+        database.DB_FILE = self.original_db_file
+
+    def _index_names(self):
+        with database.get_connection() as conn:
+            rows = conn.execute("SELECT name FROM sqlite_master WHERE type='index'").fetchall()
+        return {row[0] for row in rows}
+
+    def test_fresh_database_at_latest_version(self):
+        database.init_db()
+        self.assertEqual(database.get_schema_version(), database.SCHEMA_VERSION)
+        indexes = self._index_names()
+        self.assertIn('idx_history_timestamp', indexes)
+        self.assertIn('idx_gpu_history_timestamp', indexes)
+        self.assertIn('idx_gpu_history_gpu_timestamp', indexes)
+
+    def test_legacy_database_upgraded(self):
+        # Schema as shipped before dual_hashrate/power columns, no version recorded
+        conn = sqlite3.connect(database.DB_FILE)
+        conn.execute('CREATE TABLE history (timestamp DATETIME, hashrate REAL, avg_temp REAL, avg_fan_speed REAL, accepted_shares INTEGER, rejected_shares INTEGER)')
+        conn.execute('CREATE TABLE gpu_history (timestamp DATETIME, gpu_index INTEGER, hashrate REAL, temperature REAL, fan_speed REAL, accepted_shares INTEGER, rejected_shares INTEGER)')
+        conn.execute("INSERT INTO history VALUES ('2020-01-01T00:00:00', 100, 60, 50, 1, 0)")
+        conn.commit()
+        conn.close()
+
+        database.init_db()
+
+        self.assertEqual(database.get_schema_version(), database.SCHEMA_VERSION)
+        with database.get_connection() as conn:
+            columns = [c[1] for c in conn.execute('PRAGMA table_info(gpu_history)').fetchall()]
+            count = conn.execute('SELECT COUNT(*) FROM history').fetchone()[0]
+        self.assertIn('dual_hashrate', columns)
+        self.assertIn('power_draw', columns)
+        self.assertEqual(count, 1)
+
+    def test_iso_timestamps_converted_to_epoch(self):
+        # v2 schema with ISO string timestamps as written by older releases
+        recent = datetime.now().replace(microsecond=123456) - timedelta(hours=1)
+        conn = sqlite3.connect(database.DB_FILE)
+        conn.execute('CREATE TABLE history (timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, hashrate REAL, dual_hashrate REAL DEFAULT 0, avg_temp REAL, avg_fan_speed REAL, total_power_draw REAL DEFAULT 0, accepted_shares INTEGER, rejected_shares INTEGER)')
+        conn.execute('CREATE TABLE gpu_history (timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, gpu_index INTEGER, hashrate REAL, dual_hashrate REAL DEFAULT 0, temperature REAL, power_draw REAL, fan_speed REAL, accepted_shares INTEGER, rejected_shares INTEGER)')
+        conn.execute('INSERT INTO history VALUES (?, 100, 0, 60, 50, 200, 1, 0)', (recent.isoformat(),))
+        conn.execute("INSERT INTO history VALUES ('not a date', 100, 0, 60, 50, 200, 1, 0)")
+        conn.execute('INSERT INTO gpu_history VALUES (?, 0, 50, 0, 60, 100, 50, 1, 0)', (recent.isoformat(),))
+        conn.execute('PRAGMA user_version = 2')
+        conn.commit()
+        conn.close()
+
+        database.init_db()
+
+        expected = int(recent.timestamp())
+        with database.get_connection() as conn:
+            types = {c[1]: c[2] for c in conn.execute('PRAGMA table_info(history)').fetchall()}
+            rows = conn.execute('SELECT timestamp, typeof(timestamp) FROM history').fetchall()
+            gpu_rows = conn.execute('SELECT timestamp FROM gpu_history').fetchall()
+        self.assertEqual(types['timestamp'], 'INTEGER')
+        # Unparseable rows are dropped
+        self.assertEqual(rows, [(expected, 'integer')])
+        self.assertEqual(gpu_rows, [(expected,)])
+        self.assertIn('idx_gpu_history_gpu_timestamp', self._index_names())
+        self.assertEqual(len(database.get_history(days=1)), 1)
+        self.assertEqual(database.get_gpu_indices(days=1), [0])
+
+    def test_migrations_run_once(self):
+        database.init_db()
+        calls = []
+        original = database.MIGRATIONS
+        database.MIGRATIONS = original + [(database.SCHEMA_VERSION + 1, lambda cursor: calls.append(1))]
+        try:
+            database.init_db()
+            database.init_db()
+        finally:
+            database.MIGRATIONS = original
+        self.assertEqual(calls, [1])
+
+    def test_range_queries_use_indexes(self):
+        database.init_db()
+        with database.get_connection() as conn:
+            plan = ' '.join(str(r) for r in conn.execute(
+                'EXPLAIN QUERY PLAN SELECT * FROM gpu_history WHERE gpu_index = ? AND timestamp >= ? ORDER BY timestamp', (0, 1577836800)
+            ).fetchall())
+            self.assertIn('idx_gpu_history_gpu_timestamp', plan)
+            plan = ' '.join(str(r) for r in conn.execute(
+                'EXPLAIN QUERY PLAN SELECT * FROM history WHERE timestamp >= ?', (1577836800,)
+            ).fetchall())
+            self.assertIn('idx_history_timestamp', plan)
+
+if __name__ == '__main__':
+    unittest.main()
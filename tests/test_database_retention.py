@@ -0,0 +1,99 @@
+import unittest
+from unittest.mock import patch
+import os
+import time
+import shutil
+import sqlite3
+import database
+
+DAY = 86400
+
+class TestDatabaseRetention(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = 'test_db_retention'
+        os.makedirs(self.test_data_dir, exist_ok=True)
+        self.original_db_file = database.DB_FILE
+        database.DB_FILE = os.path.join(self.test_data_dir, 'miner_history.db')
+
+    def tearDown(self):
+        database.close_connections()
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+        database.DB_FILE = self.original_db_file
+
+    def _log_days_ago(self, days, hashrate=100):
+        with patch('database.time.time', return_value=time.time() - days * DAY):
+            database.log_history(hashrate, 60, 40, 1, 0, gpus=[{'index': 0, 'hashrate': hashrate}])
+
+    def _count(self, table):
+        with database.get_connection() as conn:
+            return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    def test_new_database_uses_incremental_vacuum(self):
+        database.init_db()
+        with database.get_connection() as conn:
+            self.assertEqual(conn.execute('PRAGMA auto_vacuum').fetchone()[0], 2)
+
+    def test_existing_database_converted_to_incremental_vacuum(self):
+        conn = sqlite3.connect(database.DB_FILE)
+        conn.execute('CREATE TABLE unrelated (x)')
+        conn.commit()
+        conn.close()
+
+        database.init_db()
+        with database.get_connection() as conn:
+            self.assertEqual(conn.execute('PRAGMA auto_vacuum').fetchone()[0], 2)
+
+    def test_tiers_expire_independently(self):
+        database.init_db()
+        for days in (200, 40, 10, 3, 0):
+            self._log_days_ago(days)
+
+        retention = {'raw': 5, '1m': 7, '5m': 30, '1h': 100, '1d': 0}
+        with patch.dict(database.RETENTION_DAYS, retention):
+            deleted = database.apply_retention()
+
+        self.assertEqual(self._count('history'), 2)
+        self.assertEqual(self._count('gpu_history'), 2)
+        self.assertEqual(self._count('history_1m'), 2)
+        self.assertEqual(self._count('gpu_history_5m'), 3)
+        self.assertEqual(self._count('history_1h'), 4)
+        # Daily rollups are kept forever
+        self.assertEqual(self._count('gpu_history_1d'), 5)
+        self.assertEqual(deleted['history'], 3)
+        self.assertEqual(deleted['gpu_history_1h'], 1)
+        self.assertNotIn('history_1d', deleted)
+
+    def test_deletes_in_chunks_and_reclaims_pages(self):
+        database.init_db()
+        with patch.object(database, 'DB_WRITE_BUFFER_SIZE', 1000):
+            for i in range(50):
+                self._log_days_ago(30 + i / 100, hashrate='x' * 2000)
+        database.flush()
+
+        statements = []
+        original = database._get_writer
+
+        def tracing_writer():
+            conn = original()
+            conn.set_trace_callback(lambda sql: statements.append(sql) if sql.lstrip().startswith('DELETE FROM history ') else None)
+            return conn
+
+        with patch.object(database, 'RETENTION_CHUNK_SIZE', 20), patch.object(database, 'RETENTION_VACUUM_PAGES', 0), \
+                patch.object(database, '_get_writer', tracing_writer):
+            deleted = database.apply_retention()
+        database._get_writer().set_trace_callback(None)
+
+        self.assertEqual(deleted['history'], 50)
+        self.assertEqual(len(statements), 3)
+        with database.get_connection() as conn:
+            self.assertEqual(conn.execute('PRAGMA freelist_count').fetchone()[0], 0)
+
+    def test_resolution_respects_retention(self):
+        with patch.dict(database.RETENTION_DAYS, {'raw': 1, '1m': 3}):
+            self.assertEqual(database.choose_resolution(0.5, target_points=5000), 'raw')
+            self.assertEqual(database.choose_resolution(2, target_points=5000), '1m')
+            # 1m would fit the point budget but only holds 3 days
+            self.assertEqual(database.choose_resolution(4, target_points=6000), '5m')
+
+if __name__ == '__main__':
+    unittest.main()
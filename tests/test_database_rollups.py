@@ -0,0 +1,132 @@
+import unittest
+from unittest.mock import patch
+import os
+import time
+import shutil
+import database
+
+BASE = 1700000000 - 1700000000 % 86400
+
+def _gpus(hashrate, temperature):
+    return [
+        {'index': 0, 'hashrate': hashrate, 'temperature': temperature, 'power_draw': 100, 'fan_speed': 40},
+        {'index': 1, 'hashrate': hashrate * 2, 'temperature': temperature, 'power_draw': 150, 'fan_speed': 50}
+    ]
+
+class TestDatabaseRollups(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = 'test_db_rollups'
+        os.makedirs(self.test_data_dir, exist_ok=True)
+        self.original_db_file = database.DB_FILE
+        database.DB_FILE = os.path.join(self.test_data_dir, 'miner_history.db')
+        database.init_db()
+
+    def tearDown(self):
+        database.close_connections()
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+        database.DB_FILE = self.original_db_file
+
+    def _log_at(self, timestamp, hashrate, temperature=60):
+        with patch('database.time.time', return_value=timestamp):
+            database.log_history(hashrate, temperature, 40, 10, 0, total_power_draw=250, gpus=_gpus(hashrate, temperature))
+
+    def _rows(self, table):
+        with database.get_connection() as conn:
+            return conn.execute(f'SELECT * FROM {table} ORDER BY 1, 2').fetchall()
+
+    def test_rollups_track_min_max_sum(self):
+        self._log_at(BASE + 5, 100, temperature=60)
+        self._log_at(BASE + 20, 120, temperature=70)
+        self._log_at(BASE + 65, 90, temperature=65)
+
+        with database.get_connection() as conn:
+            minute = conn.execute(
+                'SELECT bucket, samples, hashrate_min, hashrate_max, hashrate_sum, avg_temp_max FROM history_1m ORDER BY bucket'
+            ).fetchall()
+            hour = conn.execute('SELECT bucket, samples, hashrate_min, hashrate_max FROM history_1h').fetchall()
+            gpu1 = conn.execute(
+                'SELECT bucket, samples, hashrate_max FROM gpu_history_1m WHERE gpu_index = 1 ORDER BY bucket'
+            ).fetchall()
+        self.assertEqual(minute, [(BASE, 2, 100, 120, 220, 70), (BASE + 60, 1, 90, 90, 90, 65)])
+        self.assertEqual(hour, [(BASE, 3, 90, 120)])
+        self.assertEqual(gpu1, [(BASE, 2, 240), (BASE + 60, 1, 180)])
+
+    def test_missing_values_are_not_counted_as_zero(self):
+        self._log_at(BASE, 100, temperature=60)
+        with patch('database.time.time', return_value=BASE + 20):
+            database.log_history(120, None, 40, 10, 0, total_power_draw=None,
+                                 gpus=[{'index': 0, 'hashrate': 120, 'temperature': None, 'power_draw': None}])
+
+        series = database.get_history_series(days=36500, resolution='1m')
+        self.assertEqual(series[0]['samples'], 2)
+        self.assertEqual(series[0]['hashrate'], 110)
+        self.assertEqual((series[0]['avg_temp'], series[0]['avg_temp_min'], series[0]['avg_temp_max']), (60, 60, 60))
+        self.assertEqual((series[0]['total_power_draw'], series[0]['total_power_draw_min']), (250, 250))
+
+        gpu0 = database.get_gpu_history_series(0, days=36500, resolution='1h')
+        self.assertEqual((gpu0[0]['temperature'], gpu0[0]['temperature_min'], gpu0[0]['power_draw']), (60, 60, 100))
+
+        # The v7 rebuild from raw rows gives the same result for buckets fully covered by raw rows
+        incremental = self._rows('history_1m'), self._rows('gpu_history_1h')
+        with database._writer_lock:
+            conn = database._get_writer()
+            with conn:
+                for source, _, _ in database.ROLLUP_SOURCES:
+                    for name, _ in database.ROLLUP_RESOLUTIONS:
+                        conn.execute(f'DROP TABLE {source}_{name}')
+            conn.execute('PRAGMA user_version = 3')
+        database.init_db()
+        self.assertEqual((self._rows('history_1m'), self._rows('gpu_history_1h')), incremental)
+
+    def test_choose_resolution(self):
+        self.assertEqual(database.choose_resolution(0.1, target_points=1000), 'raw')
+        self.assertEqual(database.choose_resolution(1, target_points=2500), '1m')
+        self.assertEqual(database.choose_resolution(7, target_points=2500), '5m')
+        self.assertEqual(database.choose_resolution(30, target_points=2500), '1h')
+        self.assertEqual(database.choose_resolution(3650, target_points=100), '1d')
+
+    def test_series_returns_bucket_averages(self):
+        now = int(time.time())
+        start = now - now % 300 - 600
+        for i in range(10):
+            self._log_at(start + i * 60, 100 + i)
+
+        series = database.get_history_series(days=1, resolution='5m')
+        self.assertEqual([row['timestamp'] for row in series], [start, start + 300])
+        self.assertEqual(series[0]['samples'], 5)
+        self.assertEqual(series[0]['hashrate'], 102)
+        self.assertEqual(series[0]['hashrate_min'], 100)
+        self.assertEqual(series[1]['hashrate_max'], 109)
+        self.assertEqual(series[0]['total_power_draw'], 250)
+
+        gpu_series = database.get_gpu_history_series(1, days=1, resolution='5m')
+        self.assertEqual(len(gpu_series), 2)
+        self.assertEqual(gpu_series[0]['hashrate'], 204)
+
+        raw = database.get_history_series(days=1, resolution='raw')
+        self.assertEqual(len(raw), 10)
+
+    def test_backfill_matches_incremental_rollups(self):
+        for i in range(6):
+            self._log_at(BASE + i * 45, 100 + i)
+        incremental = self._rows('gpu_history_5m'), self._rows('history_1m')
+
+        with database._writer_lock:
+            conn = database._get_writer()
+            with conn:
+                for source, _, _ in database.ROLLUP_SOURCES:
+                    for name, _ in database.ROLLUP_RESOLUTIONS:
+                        conn.execute(f'DROP TABLE {source}_{name}')
+            conn.execute('PRAGMA user_version = 3')
+        database.init_db()
+
+        self.assertEqual((self._rows('gpu_history_5m'), self._rows('history_1m')), incremental)
+
+    def test_clear_history_clears_rollups(self):
+        self._log_at(BASE, 100)
+        database.clear_history()
+        self.assertEqual(self._rows('history_1d'), [])
+        self.assertEqual(self._rows('gpu_history_1m'), [])
+
+if __name__ == '__main__':
+    unittest.main()
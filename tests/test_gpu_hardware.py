@@ -0,0 +1,78 @@
+import unittest
+from unittest.mock import patch
+import gpu_hardware
+
+ROCM_CSV = """device,Temperature (Sensor edge) (C),Average Graphics Package Power (W),Fan speed (level),Fan speed (%),sclk clock speed:,mclk clock speed:,Card series
+card0,55.0,120.0,120,47.0,(1500Mhz),(1000Mhz),Navi 21 [Radeon RX 6800]
+card1,58.0,125.0,130,51.0,(1450Mhz),(1000Mhz),Navi 21 [Radeon RX 6800]
+"""
+
+class TestGpuHardware(unittest.TestCase):
+    def setUp(self):
+        gpu_hardware.invalidate_snapshot()
+
+    def test_parse_nvidia_output(self):
+        gpus = gpu_hardware.parse_nvidia_output(
+            "0, NVIDIA GeForce RTX 3070, 61, 130.25, 55, 1500, 7000\n"
+            "1, NVIDIA GeForce RTX 3080, 66, [N/A], [Not Supported], 1600, 9500\n"
+        )
+        self.assertEqual(len(gpus), 2)
+        self.assertEqual(gpus[0]['index'], 0)
+        self.assertEqual(gpus[0]['name'], 'NVIDIA GeForce RTX 3070')
+        self.assertEqual(gpus[0]['power_draw'], 130.25)
+        self.assertEqual(gpus[0]['core_clock'], 1500.0)
+        self.assertEqual(gpus[1]['power_draw'], 0.0)
+        self.assertEqual(gpus[1]['fan_speed'], 0.0)
+
+    def test_parse_nvidia_name_with_comma(self):
+        gpu = gpu_hardware.parse_nvidia_row("2, Tesla T4, Rev B, 50, 70, 30, 1200, 5000")
+        self.assertEqual(gpu['index'], 2)
+        self.assertEqual(gpu['name'], 'Tesla T4, Rev B')
+        self.assertEqual(gpu['temperature'], 50.0)
+        self.assertEqual(gpu['mem_clock'], 5000.0)
+
+    def test_parse_rocm_output(self):
+        gpus = gpu_hardware.parse_rocm_output(ROCM_CSV)
+        self.assertEqual(len(gpus), 2)
+        self.assertEqual(gpus[1]['index'], 1)
+        self.assertEqual(gpus[0]['name'], 'Navi 21 [Radeon RX 6800]')
+        self.assertEqual(gpus[0]['temperature'], 55.0)
+        self.assertEqual(gpus[0]['power_draw'], 120.0)
+        self.assertEqual(gpus[0]['fan_speed'], 47.0)
+        self.assertEqual(gpus[0]['core_clock'], 1500.0)
+
+    @patch('gpu_hardware.shutil.which')
+    def test_tool_detection_is_memoized(self, mock_which):
+        mock_which.side_effect = lambda tool: '/usr/bin/nvidia-smi' if tool == 'nvidia-smi' else None
+        self.assertEqual(gpu_hardware.detect_smi_tool(refresh=True), 'nvidia')
+        self.assertEqual(gpu_hardware.detect_smi_tool(), 'nvidia')
+        self.assertEqual(mock_which.call_count, 1)
+        gpu_hardware.detect_smi_tool(refresh=True)
+
+    @patch('gpu_hardware.subprocess.check_output')
+    @patch('gpu_hardware.detect_smi_tool', return_value='nvidia')
+    def test_snapshot_ttl(self, mock_detect, mock_output):
+        mock_output.return_value = b'0, RTX 3070, 60, 120, 50, 1500, 7000\n'
+
+        with patch('gpu_hardware.time.monotonic', return_value=1000.0):
+            gpu_hardware.get_hardware_snapshot()
+            snapshot = gpu_hardware.get_hardware_snapshot()
+        self.assertEqual(mock_output.call_count, 1)
+
+        # Callers get copies, not the shared cache entries
+        snapshot[0]['temperature'] = 99
+        with patch('gpu_hardware.time.monotonic', return_value=1001.0):
+            self.assertEqual(gpu_hardware.get_hardware_snapshot()[0]['temperature'], 60.0)
+
+        with patch('gpu_hardware.time.monotonic', return_value=1000.0 + gpu_hardware.SMI_CACHE_TTL + 1):
+            gpu_hardware.get_hardware_snapshot()
+        self.assertEqual(mock_output.call_count, 2)
+
+    @patch('gpu_hardware.subprocess.check_output')
+    @patch('gpu_hardware.detect_smi_tool', return_value=None)
+    def test_no_smi_tool(self, mock_detect, mock_output):
+        self.assertEqual(gpu_hardware.get_hardware_snapshot(), [])
+        mock_output.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,11 @@
 
 # Cleanup previous state
 export HEALTHCHECK_STATE_FILE="/tmp/test_miner_unhealthy_since"
+# Restarts go through restart_coordinator.py; give each run fresh state and no debounce
+export RESTART_STATE_FILE="$(mktemp -u)"
+export RESTART_LOCK_FILE="$(mktemp -u)"
+export RESTART_DEBOUNCE=0
+export RESTART_BACKOFF_BASE=0
 rm -f "$HEALTHCHECK_STATE_FILE"
 rm -f /tmp/mock_api_response /tmp/mock_process_running /tmp/restart_called /tmp/test_output
 
@@ -4,6 +4,11 @@
 # E2E test for healthcheck.sh using real metrics.py and mock_miner_api.py
 
 export HEALTHCHECK_STATE_FILE="/tmp/test_miner_unhealthy_since_e2e"
+# Restarts go through restart_coordinator.py; give each run fresh state and no debounce
+export RESTART_STATE_FILE="$(mktemp -u)"
+export RESTART_LOCK_FILE="$(mktemp -u)"
+export RESTART_DEBOUNCE=0
+export RESTART_BACKOFF_BASE=0
 export METRICS_PORT=4456
 export API_PORT=4445
 export GPU_MOCK=false
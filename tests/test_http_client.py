@@ -0,0 +1,76 @@
+import unittest
+from unittest.mock import patch
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import http_client
+
+class _EchoPeerHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps({'peer_port': self.client_address[1]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestHttpClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _EchoPeerHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        http_client.close_all()
+
+    def test_connection_is_reused(self):
+        first = http_client.get(f"{self.base_url}/").json()
+        second = http_client.get(f"{self.base_url}/").json()
+        # Same client port means the keep-alive connection was reused
+        self.assertEqual(first['peer_port'], second['peer_port'])
+
+    def test_one_session_per_host(self):
+        s1 = http_client.get_session('http://localhost:4444/')
+        s2 = http_client.get_session('http://localhost:4444/summary')
+        s3 = http_client.get_session('http://localhost:4445/')
+        s4 = http_client.get_session('https://api.telegram.org/botX/sendMessage')
+        self.assertIs(s1, s2)
+        self.assertIsNot(s1, s3)
+        self.assertIsNot(s1, s4)
+
+    def test_host_policies(self):
+        self.assertEqual(http_client.get_policy('http://localhost:4444/')['timeout'], 2)
+        self.assertEqual(http_client.get_policy('http://localhost:4444/')['retries'], 0)
+        self.assertEqual(http_client.get_policy('https://api.coingecko.com/api/v3/simple/price'),
+                         http_client.HOST_POLICIES['api.coingecko.com'])
+        self.assertEqual(http_client.get_policy('https://unknown.example.org/'), http_client.DEFAULT_POLICY)
+
+    def test_worst_case_stays_near_single_request_timeout(self):
+        for policy in list(http_client.HOST_POLICIES.values()) + [http_client.DEFAULT_POLICY]:
+            sleeps = sum(policy['backoff'] * 2 ** (n - 1) for n in range(2, policy['retries'] + 1))
+            self.assertLessEqual(policy['timeout'] * (policy['retries'] + 1) + sleeps, 10)
+
+    def test_default_timeout_applied(self):
+        session = http_client.get_session('http://localhost:4444/')
+        with patch.object(session, 'request') as mock_request:
+            http_client.get('http://localhost:4444/')
+            self.assertEqual(mock_request.call_args[1]['timeout'], 2)
+
+            # Explicit timeout wins over the host policy
+            http_client.get('http://localhost:4444/', timeout=7)
+            self.assertEqual(mock_request.call_args[1]['timeout'], 7)
+
+if __name__ == '__main__':
+    unittest.main()
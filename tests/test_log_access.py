@@ -0,0 +1,123 @@
+import unittest
+from unittest.mock import patch
+import os
+import re
+import gzip
+import shutil
+import tempfile
+from datetime import datetime
+import log_access
+
+class TestTailLines(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.test_data_dir, 'miner.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+
+    def _write(self, data):
+        with open(self.log_file, 'wb') as f:
+            f.write(data)
+
+    def test_last_lines_across_block_boundaries(self):
+        self._write(b''.join(b"line %d\n" % i for i in range(1000)))
+        self.assertEqual(log_access.tail_lines(self.log_file, 3, block_size=16), ['line 997', 'line 998', 'line 999'])
+        self.assertEqual(len(log_access.tail_lines(self.log_file, 5000, block_size=16)), 1000)
+
+    def test_unterminated_last_line_and_empty_file(self):
+        self._write(b"a\nb\nc")
+        self.assertEqual(log_access.tail_lines(self.log_file, 2, block_size=2), ['b', 'c'])
+        self._write(b"")
+        self.assertEqual(log_access.tail_lines(self.log_file, 10), [])
+
+    def test_reads_only_the_end_of_a_large_file(self):
+        self._write(b"x" * 99 + b"\n" * 1 + (b"y" * 99 + b"\n") * 100000)
+        with patch('log_access.logger.debug') as mock_debug:
+            lines = log_access.tail_lines(self.log_file, 100, block_size=4096)
+        self.assertEqual(len(lines), 100)
+        self.assertEqual(mock_debug.call_args.args[1], 12288)
+
+class TestSearch(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.test_data_dir, 'profit_switcher.log')
+        with gzip.open(self.log_file + '.2.gz', 'wb') as f:
+            f.write(b"2024-05-01 10:00:00,000 - profit_switcher - ERROR - Failed to fetch stats for 2Miners\n")
+        with open(self.log_file + '.1', 'wb') as f:
+            f.write(b"2024-05-02 10:00:00,000 - profit_switcher - INFO - Switching to HeroMiners\n"
+                    b"2024-05-02 11:00:00,000 - profit_switcher - WARNING - Failed to fetch stats for WoolyPooly\n")
+        with open(self.log_file, 'wb') as f:
+            f.write(b"2024-05-03 10:00:00,000 - profit_switcher - INFO - Current pool is the most profitable\n"
+                    b"Traceback (most recent call last):\n"
+                    b"2024-05-03 12:00:00,000 - profit_switcher - ERROR - failed to fetch ERG price\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+
+    def test_rotated_files_oldest_first(self):
+        self.assertEqual([os.path.basename(f) for f in log_access.rotated_files(self.log_file)],
+                         ['profit_switcher.log.2.gz', 'profit_switcher.log.1', 'profit_switcher.log'])
+
+    def test_regex_across_rotated_and_compressed_files(self):
+        results = log_access.search(self.log_file, pattern=r'failed to fetch (stats|erg)')
+        self.assertEqual([r['file'] for r in results],
+                         ['profit_switcher.log.2.gz', 'profit_switcher.log.1', 'profit_switcher.log'])
+        self.assertEqual(results[0]['time'], '2024-05-01 10:00:00')
+        self.assertEqual(results[1]['level'], 'WARNING')
+        self.assertEqual(len(log_access.search(self.log_file, pattern='failed', include_rotated=False)), 1)
+
+    def test_level_and_time_filters(self):
+        errors = log_access.search(self.log_file, levels=['error'])
+        self.assertEqual([r['time'] for r in errors], ['2024-05-01 10:00:00', '2024-05-03 12:00:00'])
+        recent = log_access.search(self.log_file, since=datetime(2024, 5, 2, 10, 30), until=datetime(2024, 5, 3, 11))
+        self.assertEqual([r['time'] for r in recent], ['2024-05-02 11:00:00', '2024-05-03 10:00:00'])
+        # Lines without a timestamp only show up when no time filter is set
+        self.assertEqual(len(log_access.search(self.log_file, include_rotated=False)), 3)
+
+    def test_limit_keeps_most_recent_matches(self):
+        results = log_access.search(self.log_file, pattern='profit_switcher', limit=2)
+        self.assertEqual([r['time'] for r in results], ['2024-05-03 10:00:00', '2024-05-03 12:00:00'])
+
+    def test_invalid_regex_raises(self):
+        with self.assertRaises(re.error):
+            log_access.search(self.log_file, pattern='(')
+
+class TestLineIndex(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.test_data_dir, 'miner.log')
+        with open(self.log_file, 'wb') as f:
+            f.write(b''.join(b"line %d\n" % i for i in range(2500)))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+
+    def test_pages_use_sparse_offsets(self):
+        index = log_access.LineIndex(self.log_file, stride=100).refresh()
+        self.assertEqual(index.line_count, 2500)
+        self.assertEqual(len(index.offsets), 26)
+        self.assertEqual(index.read_lines(1234, 3), ['line 1234', 'line 1235', 'line 1236'])
+        self.assertEqual(index.page_count(1000), 3)
+        self.assertEqual(index.page(2, 1000)[-1], 'line 2499')
+        self.assertEqual(len(index.page(2, 1000)), 500)
+
+    def test_refresh_is_incremental_and_handles_truncation(self):
+        index = log_access.LineIndex(self.log_file, stride=100).refresh()
+        with open(self.log_file, 'ab') as f:
+            f.write(b"line 2500\npartial")
+        index.refresh()
+        self.assertEqual(index.line_count, 2502)
+        self.assertEqual(index.read_lines(2500, 5), ['line 2500', 'partial'])
+
+        # copytruncate
+        with open(self.log_file, 'wb') as f:
+            f.write(b"fresh\n")
+        index.refresh()
+        self.assertEqual((index.line_count, index.read_lines(0, 10)), (1, ['fresh']))
+
+    def test_indexes_are_cached_per_file(self):
+        self.assertIs(log_access.get_index(self.log_file), log_access.get_index(self.log_file))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+import unittest
+from unittest.mock import patch
+import os
+import time
+import shutil
+import tempfile
+import threading
+from watchdog.events import FileCreatedEvent, FileMovedEvent
+import log_monitor
+
+class TestErrorMatcher(unittest.TestCase):
+    def setUp(self):
+        self.matcher = log_monitor.ErrorMatcher()
+
+    def test_classifies_by_most_specific_type(self):
+        data = (b"GPU 0: 120.5 MH/s\n"
+                b"Error: CUDA error: out of memory\n"
+                b"CUDA error in CudaProgram.cu: an illegal memory access was encountered (700)\n"
+                b"GPU fell off the bus\n"
+                b"Illegal instruction (core dumped)\n"
+                b"CUDA error 719 launch failure\n")
+        self.assertEqual([error_type for error_type, _ in self.matcher.scan(data)],
+                         ['out_of_memory', 'illegal_memory_access', 'gpu_lost', 'illegal_instruction', 'cuda_error'])
+
+    def test_one_result_per_line(self):
+        matches = list(self.matcher.scan(b"CUDA error: out of memory, CUDA error again\nok\n"))
+        self.assertEqual(matches, [('out_of_memory', 'CUDA error: out of memory, CUDA error again')])
+
+    def test_normal_lines_do_not_match(self):
+        self.assertEqual(list(self.matcher.scan(b"Normal: Miner started\nGPU 0: 45 MH/s\n" * 1000)), [])
+
+class TestLogTail(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.test_data_dir, 'miner.log')
+        open(self.log_file, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+
+    def _append(self, data):
+        with open(self.log_file, 'ab') as f:
+            f.write(data)
+
+    def test_partial_lines_are_carried_over(self):
+        tail = log_monitor.LogTail(self.log_file)
+        self._append(b"first line\nsecond ")
+        self.assertEqual(b''.join(tail.read_chunks()), b"first line\n")
+        self.assertEqual(tail.committed_offset, len(b"first line\n"))
+        self._append(b"half\n")
+        self.assertEqual(b''.join(tail.read_chunks()), b"second half\n")
+        tail.close()
+
+    def test_large_burst_is_read_in_bounded_chunks(self):
+        tail = log_monitor.LogTail(self.log_file)
+        self._append(b"x" * 99 + b"\n" * 1 + (b"y" * 99 + b"\n") * 20000)
+        chunks = list(tail.read_chunks(chunk_size=4096))
+        self.assertGreater(len(chunks), 100)
+        self.assertTrue(all(len(chunk) <= 4096 + 100 for chunk in chunks))
+        self.assertEqual(sum(len(chunk) for chunk in chunks), 100 * 20001)
+        tail.close()
+
+    def test_copytruncate_restarts_from_the_beginning(self):
+        tail = log_monitor.LogTail(self.log_file)
+        self._append(b"old line 1\nold line 2\n")
+        list(tail.read_chunks())
+        with open(self.log_file, 'wb') as f:
+            f.write(b"new\n")
+        self.assertEqual(b''.join(tail.read_chunks()), b"new\n")
+        tail.close()
+
+class TestLogHandler(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.test_data_dir, 'miner.log')
+        self.offsets_file = os.path.join(self.test_data_dir, 'offsets.json')
+        with open(self.log_file, 'w') as f:
+            f.write("Error: CUDA error: out of memory (from an earlier run)\n")
+        self.patches = [patch.object(log_monitor, 'DATA_DIR', self.test_data_dir),
+                        patch.object(log_monitor, 'LOG_PATTERN', 'miner*.log')]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+
+    def _append(self, text):
+        with open(self.log_file, 'a') as f:
+            f.write(text)
+
+    @patch('log_monitor.restart_coordinator.request_restart')
+    def test_offsets_survive_monitor_restart(self, mock_restart):
+        handler = log_monitor.LogHandler(offsets_file=self.offsets_file)
+        handler._check_for_new_files(from_end=True)
+        self._append("GPU 0: 120 MH/s\n")
+        handler._process_log_file(self.log_file)
+        handler.stop()
+        # Existing errors from before the monitor started are not acted on
+        mock_restart.assert_not_called()
+
+        self._append("Error: GPU fell off the bus\n")
+        handler = log_monitor.LogHandler(offsets_file=self.offsets_file)
+        handler._check_for_new_files(from_end=True)
+        handler.stop()
+        mock_restart.assert_called_once_with("gpu_lost: Error: GPU fell off the bus", source='log_monitor')
+
+    def test_restart_runs_off_the_event_thread(self):
+        handler = log_monitor.LogHandler(offsets_file=self.offsets_file)
+        handler._check_for_new_files(from_end=True)
+        with patch('log_monitor.restart_coordinator.request_restart', side_effect=lambda *a, **k: time.sleep(0.5)) as mock_restart:
+            # A burst of error lines queues a single restart request
+            self._append("Error: CUDA error: out of memory\n" * 50)
+            started = time.monotonic()
+            handler._process_log_file(self.log_file)
+            self.assertLess(time.monotonic() - started, 0.4)
+            handler.stop()
+            mock_restart.assert_called_once()
+
+class TestEventTracking(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.test_data_dir, 'miner.log')
+        open(self.log_file, 'w').close()
+        self.patches = [patch.object(log_monitor, 'DATA_DIR', self.test_data_dir),
+                        patch.object(log_monitor, 'LOG_PATTERN', 'miner*.log'),
+                        patch('log_monitor.restart_coordinator.request_restart')]
+        self.mock_restart = [p.start() for p in self.patches][-1]
+        self.restarted = threading.Event()
+        self.mock_restart.side_effect = lambda *a, **k: self.restarted.set()
+        self.handler = log_monitor.LogHandler(offsets_file=os.path.join(self.test_data_dir, 'offsets.json'),
+                                              read_interval=0.1)
+        self.thread = None
+
+    def tearDown(self):
+        if self.thread:
+            self.handler.stop()
+            self.thread.join(5)
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+
+    def _start(self):
+        self.thread = threading.Thread(target=self.handler.start, daemon=True)
+        self.thread.start()
+        deadline = time.monotonic() + 5
+        while self.log_file not in self.handler.log_files and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_error_is_seen_without_polling(self):
+        self._start()
+        with patch('log_monitor.glob.glob') as mock_glob:
+            with open(self.log_file, 'a') as f:
+                f.write("Error: CUDA error: out of memory\n")
+            self.assertTrue(self.restarted.wait(2))
+            mock_glob.assert_not_called()
+
+    def test_new_log_file_is_read_from_the_start(self):
+        self._start()
+        with open(os.path.join(self.test_data_dir, 'miner-2.log'), 'w') as f:
+            f.write("GPU fell off the bus\n")
+        self.assertTrue(self.restarted.wait(2))
+        self.assertEqual(self.mock_restart.call_args.args[0], "gpu_lost: GPU fell off the bus")
+
+    def test_modify_events_are_coalesced(self):
+        self.handler._check_for_new_files(from_end=True)
+        reader = threading.Thread(target=self.handler._reader_loop, daemon=True)
+        reader.start()
+        with patch.object(self.handler, '_process_log_file', wraps=self.handler._process_log_file) as mock_process:
+            started = time.monotonic()
+            while time.monotonic() - started < 0.35:
+                self.handler._schedule(self.log_file)
+                time.sleep(0.001)
+            time.sleep(0.15)
+            # Hundreds of events in 0.35 s at one read per 0.1 s
+            self.assertLessEqual(mock_process.call_count, 5)
+        self.handler.stop()
+        reader.join(5)
+
+    def test_rename_rotation_reads_old_and_new_file(self):
+        self.handler._check_for_new_files(from_end=True)
+        with open(self.log_file, 'a') as f:
+            f.write("Error: GPU fell off the bus\n")
+        # Rotated before the reader got to the new line
+        rotated = self.log_file + '.1'
+        os.rename(self.log_file, rotated)
+        self.handler.on_moved(FileMovedEvent(self.log_file, rotated))
+        self.assertNotIn(self.log_file, self.handler.log_files)
+        self.handler._restart_executor.shutdown(wait=True)
+        self.mock_restart.assert_called_once()
+
+        self.handler._restart_executor = log_monitor.ThreadPoolExecutor(max_workers=1)
+        self.handler._restart_pending.clear()
+        with open(self.log_file, 'w') as f:
+            f.write("Illegal instruction (core dumped)\n")
+        self.handler.on_created(FileCreatedEvent(self.log_file))
+        self.handler.stop()
+        self.assertEqual(self.mock_restart.call_args.args[0], "illegal_instruction: Illegal instruction (core dumped)")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+from unittest.mock import patch
+import io
+import os
+import ast
+import glob
+import json
+import shutil
+import logging
+import tempfile
+import threading
+import config_service
+import logging_setup
+import log_access
+
+class TestLoggingSetup(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = tempfile.mkdtemp()
+        self.env_file = os.path.join(self.test_data_dir, '.env')
+        with open(self.env_file, 'w') as f:
+            f.write("LOG_LEVEL=INFO\nLOG_LEVELS=test.verbose=DEBUG\n")
+        self.settings = config_service.ConfigService(path=self.env_file)
+        self.settings_patch = patch.object(logging_setup, 'settings', self.settings)
+        self.settings_patch.start()
+        self.root_level = logging.getLogger().level
+        self.stream = io.StringIO()
+        logging_setup.configure(stream=self.stream, fmt='json', force=True)
+        self.settings.subscribe(logging_setup.apply_levels, keys=logging_setup.LEVEL_SETTINGS)
+
+    def tearDown(self):
+        logging_setup.shutdown()
+        for name in ('test.verbose', 'test.quiet'):
+            logging.getLogger(name).setLevel(logging.NOTSET)
+        logging.getLogger().setLevel(self.root_level)
+        self.settings_patch.stop()
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+        # Back to the process-wide setup the services' imports installed
+        logging_setup.configure()
+
+    def _lines(self):
+        logging_setup.shutdown()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_json_lines_with_extra_fields_and_traceback(self):
+        log = logging.getLogger('test.json')
+        log.info("Pool %s scored %.2f", 'HeroMiners', 1.5, extra={'pool': 'HeroMiners'})
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            log.exception("Scoring failed")
+        first, second = self._lines()
+        self.assertEqual((first['level'], first['logger'], first['message'], first['pool']),
+                         ('INFO', 'test.json', 'Pool HeroMiners scored 1.50', 'HeroMiners'))
+        self.assertIn('ZeroDivisionError', second['exc_info'])
+
+    def test_disabled_levels_are_never_formatted(self):
+        class Expensive:
+            formatted = 0
+            def __str__(self):
+                Expensive.formatted += 1
+                return 'expensive'
+        logging.getLogger('test.json').debug("Details: %s", Expensive())
+        self.assertEqual(self._lines(), [])
+        self.assertEqual(Expensive.formatted, 0)
+
+    def test_records_are_formatted_off_the_calling_thread(self):
+        thread_names = []
+        def record_thread(formatter, record):
+            thread_names.append(threading.current_thread().name)
+            return '{}'
+        with patch.object(logging_setup.JsonFormatter, 'format', autospec=True, side_effect=record_thread):
+            logging.getLogger('test.json').warning("Queued")
+            logging_setup.shutdown()
+        self.assertEqual(len(thread_names), 1)
+        self.assertNotEqual(thread_names[0], threading.current_thread().name)
+
+    def test_per_logger_levels_follow_config(self):
+        logging.getLogger('test.verbose').debug("shown")
+        logging.getLogger('test.quiet').debug("hidden")
+        self.settings.update({'LOG_LEVELS': 'test.quiet=DEBUG, bogus'})
+        self.assertEqual(logging.getLogger('test.verbose').level, logging.NOTSET)
+        logging.getLogger('test.verbose').debug("hidden now")
+        logging.getLogger('test.quiet').debug("shown now")
+        messages = [line['message'] for line in self._lines()]
+        self.assertEqual([m for m in messages if m.startswith(('shown', 'hidden'))], ['shown', 'shown now'])
+
+    def test_dashboard_search_reads_json_lines(self):
+        logging.getLogger('test.json').error("Failed to fetch stats for WoolyPooly")
+        logging_setup.shutdown()
+        log_file = os.path.join(self.test_data_dir, 'profit_switcher.log')
+        with open(log_file, 'w') as f:
+            f.write(self.stream.getvalue())
+        results = log_access.search(log_file, levels=['ERROR'])
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['level'], 'ERROR')
+        self.assertIsNotNone(results[0]['time'])
+
+class TestLoggingStyle(unittest.TestCase):
+    LOG_METHODS = {'debug', 'info', 'warning', 'error', 'exception', 'critical', 'log'}
+
+    def test_services_log_with_lazy_arguments(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        offenders = []
+        for path in glob.glob(os.path.join(root, '*.py')) + glob.glob(os.path.join(root, 'scripts', '*.py')):
+            with open(path) as f:
+                tree = ast.parse(f.read(), path)
+            for node in ast.walk(tree):
+                if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                        and node.func.attr in self.LOG_METHODS
+                        and isinstance(node.func.value, ast.Name) and node.func.value.id in ('logger', 'logging')
+                        and any(isinstance(arg, ast.JoinedStr) for arg in node.args)):
+                    offenders.append(f"{os.path.relpath(path, root)}:{node.lineno}")
+        # Pass values as %-style arguments; f-strings are formatted even when the level is off
+        self.assertEqual(offenders, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,6 +11,13 @@ from metrics import update_metrics, HASHRATE, DUAL_HASHRATE, AVG_FAN_SPEED, TOTA
 
 class TestMetrics(unittest.TestCase):
     def setUp(self):
+        # Keep the collector from writing its snapshot and ring files during tests
+        publish_patcher = patch('rig_snapshot.publish_snapshot')
+        self.mock_publish = publish_patcher.start()
+        self.addCleanup(publish_patcher.stop)
+        ring_patcher = patch('sample_ring.append_samples')
+        self.mock_ring = ring_patcher.start()
+        self.addCleanup(ring_patcher.stop)
         metrics.last_prune_time = 0
         # Reset Prometheus metrics
         HASHRATE.labels(worker=WORKER).set(0)
@@ -23,9 +30,9 @@ class TestMetrics(unittest.TestCase):
         UPTIME.labels(worker=WORKER).set(0)
 
     @patch('database.log_history')
-    @patch('database.prune_history')
+    @patch('database.apply_retention', return_value={})
     @patch('metrics.get_full_miner_data')
-    def test_update_metrics_consolidated(self, mock_full_data, mock_prune, mock_log):
+    def test_update_metrics_consolidated(self, mock_full_data, mock_retention, mock_log):
         mock_full_data.return_value = {
             'miner': 'lolminer',
             'total_hashrate': 120.5,
@@ -78,12 +85,16 @@ class TestMetrics(unittest.TestCase):
         mock_log.assert_called_once_with(
             120.5, 37.5, 57.5, 210, 5, 250.5, 245.5, mock_full_data.return_value['gpus']
         )
-        mock_prune.assert_called_once()
+        mock_retention.assert_called_once()
+
+        # The same scrape is published for the dashboard
+        self.mock_publish.assert_called_once()
+        self.assertIs(self.mock_publish.call_args[0][0], mock_full_data.return_value)
 
     @patch('database.log_history')
-    @patch('database.prune_history')
+    @patch('database.apply_retention', return_value={})
     @patch('metrics.get_full_miner_data')
-    def test_api_error(self, mock_full_data, mock_prune, mock_log):
+    def test_api_error(self, mock_full_data, mock_retention, mock_log):
         mock_full_data.return_value = None
 
         update_metrics()
@@ -4,10 +4,11 @@ import os
 import subprocess
 import requests
 import miner_api
+import gpu_hardware
 
 class TestMinerApi(unittest.TestCase):
 
-    @patch('requests.get')
+    @patch('http_client.get')
     def test_get_normalized_miner_data_lolminer(self, mock_get):
         # Mock lolMiner API response
         mock_response = MagicMock()
@@ -34,7 +35,7 @@ class TestMinerApi(unittest.TestCase):
             self.assertEqual(data['gpus'][0]['hashrate'], 60.2)
             self.assertEqual(data['gpus'][0]['dual_hashrate'], 125.0)
 
-    @patch('requests.get')
+    @patch('http_client.get')
     def test_get_normalized_miner_data_trex(self, mock_get):
         # Mock T-Rex API response
         mock_response = MagicMock()
@@ -60,7 +61,7 @@ class TestMinerApi(unittest.TestCase):
             self.assertEqual(data['gpus'][0]['temperature'], 55)
             self.assertEqual(data['gpus'][0]['power_draw'], 150)
 
-    @patch('requests.get')
+    @patch('http_client.get')
     def test_get_normalized_miner_data_retry(self, mock_get):
         # Mock failure then success
         mock_get.side_effect = [
@@ -74,22 +75,18 @@ class TestMinerApi(unittest.TestCase):
             self.assertEqual(data['total_hashrate'], 100.0)
             self.assertEqual(mock_get.call_count, 2)
 
-    @patch('subprocess.check_output')
-    def test_get_gpu_smi_data_nvidia(self, mock_check_output):
-        def side_effect(cmd, *args, **kwargs):
-            if cmd == ['which', 'nvidia-smi']:
-                return b'/usr/bin/nvidia-smi'
-            if 'nvidia-smi --query-gpu' in cmd:
-                return b'60, 120, 50\n65, 130, 55'
-            raise subprocess.CalledProcessError(1, cmd)
-
-        mock_check_output.side_effect = side_effect
+    @patch('gpu_hardware.subprocess.check_output')
+    @patch('gpu_hardware.detect_smi_tool', return_value='nvidia')
+    def test_get_gpu_smi_data_nvidia(self, mock_detect, mock_check_output):
+        gpu_hardware.invalidate_snapshot()
+        mock_check_output.return_value = b'0, RTX 3070, 60, 120, 50, 1500, 7000\n1, RTX 3080, 65, 130, 55, 1600, 9500'
 
         data = miner_api.get_gpu_smi_data()
         self.assertEqual(len(data), 2)
         self.assertEqual(data[0]['temperature'], 60.0)
         self.assertEqual(data[0]['power_draw'], 120.0)
         self.assertEqual(data[0]['fan_speed'], 50.0)
+        self.assertEqual(data[1]['mem_clock'], 9500.0)
 
     @patch('psutil.process_iter')
     def test_get_services_status(self, mock_iter):
@@ -112,16 +109,13 @@ class TestMinerApi(unittest.TestCase):
                 status = miner_api.get_services_status()
                 self.assertEqual(status['cuda_monitor.sh']['status'], 'Disabled')
 
-    @patch('subprocess.check_output')
-    def test_get_gpu_names_nvidia(self, mock_check_output):
-        def side_effect(cmd, *args, **kwargs):
-            if cmd == ['which', 'nvidia-smi']:
-                return b'/usr/bin/nvidia-smi'
-            if cmd == ['nvidia-smi', '--query-gpu=name', '--format=csv,noheader']:
-                return b'NVIDIA GeForce RTX 3070\nNVIDIA GeForce RTX 3080'
-            raise subprocess.CalledProcessError(1, cmd)
-
-        mock_check_output.side_effect = side_effect
+    @patch('gpu_hardware.get_hardware_snapshot')
+    def test_get_gpu_names_nvidia(self, mock_snapshot):
+        miner_api._gpu_names_cache = []
+        mock_snapshot.return_value = [
+            {'index': 0, 'name': 'NVIDIA GeForce RTX 3070'},
+            {'index': 1, 'name': 'NVIDIA GeForce RTX 3080'}
+        ]
 
         names = miner_api.get_gpu_names()
         self.assertEqual(names, ['NVIDIA GeForce RTX 3070', 'NVIDIA GeForce RTX 3080'])
@@ -160,7 +154,7 @@ class TestMinerApi(unittest.TestCase):
         self.assertEqual(data['efficiency'], 120.0 / 150.0)
         self.assertEqual(data['gpus'][0]['efficiency'], 60.0 / 150.0)
 
-    @patch('requests.get')
+    @patch('http_client.get')
     def test_get_normalized_miner_data_multi_process(self, mock_get):
         # Mock responses for two miners on ports 4444 and 4445
         resp1 = MagicMock()
@@ -175,7 +169,9 @@ class TestMinerApi(unittest.TestCase):
             'Total_Performance': [70.0, 0],
             'GPUs': [{'Performance': [70.0, 0], 'Fan_Speed': 55, 'Accepted_Shares': 6, 'Rejected_Shares': 1}]
         }
-        mock_get.side_effect = [resp1, resp2]
+        # Instances are polled concurrently, so answer by port rather than call order
+        responses = {'http://localhost:4444/': resp1, 'http://localhost:4445/': resp2}
+        mock_get.side_effect = lambda url, **kwargs: responses[url]
 
         # Use patch.dict to set environment variables
         with patch.dict(os.environ, {
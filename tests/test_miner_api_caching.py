@@ -1,16 +1,19 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import miner_api
+import gpu_hardware
 import os
 
 class TestMinerApiCaching(unittest.TestCase):
     def setUp(self):
-        # Reset cache before each test
+        # Reset caches before each test
         miner_api._gpu_names_cache = []
+        gpu_hardware.invalidate_snapshot()
 
-    @patch('miner_api.subprocess.check_output')
-    def test_get_gpu_names_caching(self, mock_output):
-        mock_output.return_value = b'RTX 3070\nRTX 3080\n'
+    @patch('gpu_hardware.subprocess.check_output')
+    @patch('gpu_hardware.detect_smi_tool', return_value='nvidia')
+    def test_get_gpu_names_caching(self, mock_detect, mock_output):
+        mock_output.return_value = b'0, RTX 3070, 60, 120, 50, 1500, 7000\n1, RTX 3080, 65, 130, 55, 1600, 9500\n'
 
         # First call
         names1 = miner_api.get_gpu_names()
@@ -20,13 +23,23 @@ class TestMinerApiCaching(unittest.TestCase):
         # Second call should use cache (mock_output should not be called again for smi)
         names2 = miner_api.get_gpu_names()
         self.assertEqual(names1, names2)
-        # 1 for 'nvidia-smi ...' (no longer calls 'which')
+        # A single combined SMI query
         self.assertEqual(mock_output.call_count, 1)
 
-    @patch('miner_api.subprocess.check_output')
+    @patch('gpu_hardware.subprocess.check_output')
+    @patch('gpu_hardware.detect_smi_tool', return_value='nvidia')
+    def test_smi_snapshot_shared_between_callers(self, mock_detect, mock_output):
+        mock_output.return_value = b'0, RTX 3070, 60, 120, 50, 1500, 7000\n'
+
+        miner_api.get_gpu_names()
+        miner_api.get_gpu_smi_data()
+        miner_api.get_gpu_smi_data()
+        self.assertEqual(mock_output.call_count, 1)
+
+    @patch('gpu_hardware.get_hardware_snapshot')
     @patch('miner_api._fetch_single_miner_data')
     @patch('os.getenv')
-    def test_get_normalized_miner_data_multi_process_auto(self, mock_getenv, mock_fetch, mock_output):
+    def test_get_normalized_miner_data_multi_process_auto(self, mock_getenv, mock_fetch, mock_snapshot):
         def getenv_side_effect(key, default=None):
             vals = {
                 'MINER': 'lolminer',
@@ -37,14 +50,15 @@ class TestMinerApiCaching(unittest.TestCase):
             return vals.get(key, default)
         mock_getenv.side_effect = getenv_side_effect
 
-        # Mock nvidia-smi returning 2 GPUs
-        mock_output.return_value = b'0\n1\n'
+        # Mock hardware snapshot with 2 GPUs
+        mock_snapshot.return_value = [{'index': 0, 'name': 'RTX 3070'}, {'index': 1, 'name': 'RTX 3070'}]
 
         # Mock fetch_single_miner_data
-        mock_fetch.side_effect = [
-            {'miner': 'lolminer', 'uptime': 100, 'total_hashrate': 50, 'total_dual_hashrate': 0, 'gpus': [{'index': 0, 'hashrate': 50}]},
-            {'miner': 'lolminer', 'uptime': 120, 'total_hashrate': 60, 'total_dual_hashrate': 0, 'gpus': [{'index': 0, 'hashrate': 60}]}
-        ]
+        responses = {
+            4444: {'miner': 'lolminer', 'uptime': 100, 'total_hashrate': 50, 'total_dual_hashrate': 0, 'gpus': [{'index': 0, 'hashrate': 50}]},
+            4445: {'miner': 'lolminer', 'uptime': 120, 'total_hashrate': 60, 'total_dual_hashrate': 0, 'gpus': [{'index': 0, 'hashrate': 60}]}
+        }
+        mock_fetch.side_effect = lambda miner, port: responses[port]
 
         data = miner_api.get_normalized_miner_data()
         self.assertIsNotNone(data)
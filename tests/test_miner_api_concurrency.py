@@ -0,0 +1,69 @@
+import unittest
+from unittest.mock import patch
+import os
+import time
+import threading
+import miner_api
+
+def _instance_data(hashrate, uptime=100):
+    return {'miner': 'lolminer', 'uptime': uptime, 'total_hashrate': hashrate, 'total_dual_hashrate': 0,
+            'gpus': [{'index': 0, 'hashrate': hashrate}]}
+
+MULTI_ENV = {
+    'MINER': 'lolminer',
+    'MULTI_PROCESS': 'true',
+    'GPU_DEVICES': '0,1,2',
+    'API_PORT': '4444'
+}
+
+class TestMinerApiConcurrency(unittest.TestCase):
+    @patch('miner_api._fetch_single_miner_data')
+    def test_instances_polled_concurrently(self, mock_fetch):
+        def slow_fetch(miner, port):
+            time.sleep(0.3)
+            return _instance_data(50)
+        mock_fetch.side_effect = slow_fetch
+
+        with patch.dict(os.environ, MULTI_ENV):
+            start = time.monotonic()
+            data = miner_api.get_normalized_miner_data()
+            elapsed = time.monotonic() - start
+
+        self.assertEqual(data['total_hashrate'], 150)
+        self.assertEqual([g['index'] for g in data['gpus']], [0, 1, 2])
+        # Sequential polling would take ~0.9s
+        self.assertLess(elapsed, 0.7)
+
+    @patch('miner_api._fetch_single_miner_data')
+    def test_hung_instance_hits_deadline(self, mock_fetch):
+        release = threading.Event()
+
+        def fetch(miner, port):
+            if port == 4445:
+                release.wait(5)
+                return _instance_data(99)
+            if port == 4446:
+                return None
+            return _instance_data(60)
+        mock_fetch.side_effect = fetch
+
+        try:
+            with patch.object(miner_api, 'SCRAPE_DEADLINE', 0.2), patch.dict(os.environ, MULTI_ENV):
+                start = time.monotonic()
+                data = miner_api.get_normalized_miner_data()
+                elapsed = time.monotonic() - start
+        finally:
+            release.set()
+
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(data['total_hashrate'], 60)
+        self.assertEqual(data['miner_instances'], {4444: 'UP', 4445: 'TIMEOUT', 4446: 'DOWN'})
+
+    @patch('miner_api._fetch_single_miner_data', return_value=None)
+    def test_all_instances_down(self, mock_fetch):
+        with patch.dict(os.environ, MULTI_ENV):
+            self.assertIsNone(miner_api.get_normalized_miner_data())
+        self.assertEqual(mock_fetch.call_count, 3)
+
+if __name__ == '__main__':
+    unittest.main()
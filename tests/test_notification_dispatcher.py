@@ -0,0 +1,195 @@
+import unittest
+from unittest.mock import patch
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import http_client
+import discord_notifier
+import notification_dispatcher
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    """Stand-in for a webhook: records posted messages and replies with scripted responses."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server = self.server
+        with server.lock:
+            server.received.append((time.monotonic(), body['content']))
+            status, headers = server.responses.pop(0) if server.responses else (204, {})
+        if server.delay:
+            time.sleep(server.delay)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+class TestNotificationDispatcher(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _WebhookHandler)
+        cls.server.lock = threading.Lock()
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.webhook_url = f"http://127.0.0.1:{cls.server.server_address[1]}/webhook"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.received = []
+        self.server.responses = []
+        self.server.delay = 0
+        http_client.close_all()
+        for name, value in (('DISCORD_ENABLE', True), ('DISCORD_WEBHOOK_URL', self.webhook_url)):
+            patcher = patch.object(discord_notifier, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.object(notification_dispatcher, 'NOTIFY_BACKOFF_MAX', 0.05)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.dispatcher = notification_dispatcher.NotificationDispatcher()
+        self.addCleanup(self.dispatcher.stop)
+
+    def _channel(self, **options):
+        options.setdefault('rate_per_minute', 600)
+        options.setdefault('digest_window', 0.2)
+        return self.dispatcher.add_channel('discord', discord_notifier.post_discord_message, **options)
+
+    def _wait_for(self, count, timeout=5):
+        deadline = time.monotonic() + timeout
+        while len(self.server.received) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return [message for _, message in self.server.received]
+
+    def test_burst_is_coalesced_into_one_digest(self):
+        self._channel()
+        self.dispatcher.start()
+        for i in range(5):
+            self.dispatcher.notify('discord', f"alert {i}")
+
+        messages = self._wait_for(1)
+        time.sleep(0.3)
+        self.assertEqual(len(self.server.received), 1)
+        self.assertEqual(messages[0], "\n\n".join(f"alert {i}" for i in range(5)))
+
+    def test_digest_is_split_at_channel_max_length(self):
+        self._channel(max_length=25)
+        self.dispatcher.start()
+        for i in range(3):
+            self.dispatcher.notify('discord', f"message number {i}")
+
+        messages = self._wait_for(3)
+        self.assertEqual(messages, [f"message number {i}" for i in range(3)])
+        self.assertEqual(notification_dispatcher.pack_digests(['x' * 30], 25), ['x' * 25, 'x' * 5])
+
+    def test_server_errors_are_retried(self):
+        self.server.responses = [(500, {}), (500, {})]
+        channel = self._channel(digest_window=0)
+        self.dispatcher.start()
+        self.dispatcher.notify('discord', "retry me")
+
+        messages = self._wait_for(3)
+        self.assertEqual(messages, ["retry me"] * 3)
+        self.dispatcher.stop()
+        self.assertEqual((channel.sent, channel.failed), (1, 0))
+
+    def test_gives_up_after_max_retries(self):
+        self.server.responses = [(500, {})] * 3
+        channel = self._channel(digest_window=0, max_retries=2)
+        self.dispatcher.start()
+        self.dispatcher.notify('discord', "lost")
+
+        self._wait_for(3)
+        time.sleep(0.2)
+        self.dispatcher.stop()
+        self.assertEqual(len(self.server.received), 3)
+        self.assertEqual((channel.sent, channel.failed), (0, 1))
+
+    def test_client_errors_are_not_retried(self):
+        self.server.responses = [(400, {}), (403, {})]
+        channel = self._channel(digest_window=0)
+        self.dispatcher.start()
+        self.dispatcher.notify('discord', "bad markup")
+        self._wait_for(1)
+        self.dispatcher.notify('discord', "bad token")
+        self._wait_for(2)
+        time.sleep(0.2)
+        self.dispatcher.stop()
+        self.assertEqual([message for _, message in self.server.received], ["bad markup", "bad token"])
+        self.assertEqual((channel.sent, channel.failed), (0, 2))
+
+    def test_digests_split_between_lines_not_inside_markup(self):
+        alert = "⚠️ <b>Rig Alert</b>\nStatus: DOWN\nReason: GPU lost"
+        digests = notification_dispatcher.pack_digests([alert, alert, alert], 2 * len(alert) + 2)
+        self.assertEqual(digests, [alert + "\n\n" + alert, alert])
+        # A single message over the limit is split at its line breaks
+        self.assertEqual(notification_dispatcher.pack_digests([alert], 25),
+                         ["⚠️ <b>Rig Alert</b>", "Status: DOWN", "Reason: GPU lost"])
+        # A line that must be cut is never cut inside a tag
+        self.assertEqual(notification_dispatcher.pack_digests(["abcdefg <b>x</b>"], 10), ["abcdefg ", "<b>x</b>"])
+
+    def test_retry_after_is_honoured(self):
+        self.server.responses = [(429, {'Retry-After': '1'})]
+        self._channel(digest_window=0)
+        self.dispatcher.start()
+        self.dispatcher.notify('discord', "slow down")
+
+        self._wait_for(2)
+        (first, _), (second, _) = self.server.received
+        self.assertGreaterEqual(second - first, 0.9)
+
+    def test_rate_limit_delays_and_coalesces(self):
+        # One message per second
+        self._channel(rate_per_minute=60, digest_window=0)
+        self.dispatcher.start()
+        self.dispatcher.notify('discord', "first")
+        self._wait_for(1)
+        for i in range(3):
+            self.dispatcher.notify('discord', f"later {i}")
+
+        messages = self._wait_for(2)
+        (first, _), (second, _) = self.server.received
+        self.assertGreaterEqual(second - first, 0.9)
+        self.assertEqual(messages[1], "later 0\n\nlater 1\n\nlater 2")
+
+    def test_full_queue_drops_oldest(self):
+        channel = self._channel(queue_size=3)
+        for i in range(5):
+            self.dispatcher.notify('discord', f"alert {i}")
+        self.assertEqual(channel.dropped, 2)
+
+        self.dispatcher.start()
+        messages = self._wait_for(1)
+        self.assertEqual(messages, ["alert 2\n\nalert 3\n\nalert 4"])
+
+    def test_notify_does_not_block_on_slow_webhook(self):
+        self.server.delay = 1
+        self._channel(digest_window=0)
+        self.dispatcher.start()
+
+        start = time.monotonic()
+        for i in range(10):
+            self.assertTrue(self.dispatcher.notify('discord', f"alert {i}"))
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertFalse(self.dispatcher.notify('telegram', "no such channel"))
+        self.assertEqual(len(self._wait_for(1)), 1)
+
+    def test_stop_flushes_pending_messages(self):
+        self._channel(digest_window=10)
+        self.dispatcher.start()
+        self.dispatcher.notify('discord', "pending")
+        time.sleep(0.1)
+        self.dispatcher.stop()
+        self.assertEqual([message for _, message in self.server.received], ["pending"])
+
+if __name__ == '__main__':
+    unittest.main()
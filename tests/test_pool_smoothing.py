@@ -0,0 +1,134 @@
+import unittest
+from unittest.mock import patch
+import os
+import time
+import shutil
+import statistics
+import database
+import config_service
+import profit_switcher
+from pool_smoothing import EWMA, RollingMedian, PoolScoreSmoother
+
+HOUR = 3600
+
+class TestEstimators(unittest.TestCase):
+    def test_ewma_halflife(self):
+        ewma = EWMA(halflife=HOUR)
+        self.assertEqual(ewma.update(1.0, 0), 1.0)
+        # After one half-life the new sample has half the weight
+        self.assertAlmostEqual(ewma.update(2.0, HOUR), 1.5)
+        # No time elapsed: no change
+        self.assertAlmostEqual(ewma.update(10.0, HOUR), 1.5)
+
+    def test_rolling_median_matches_full_recompute(self):
+        median = RollingMedian(window=5 * HOUR)
+        values = [1.2, 0.4, 3.0, 0.9, 1.1, 0.2, 5.0, 1.0, 0.95, 1.05]
+        for i, value in enumerate(values):
+            result = median.update(value, i * HOUR)
+            window = values[max(0, i - 4):i + 1]
+            self.assertAlmostEqual(result, statistics.median(window))
+
+    def test_non_positive_window_keeps_latest_sample(self):
+        smoother = PoolScoreSmoother('median', window=0)
+        self.assertEqual(smoother.update('a', 1.0, 0), 1.0)
+        self.assertEqual(smoother.update('a', 2.0, HOUR), 2.0)
+        self.assertEqual(RollingMedian(window=-HOUR).update(3.0, 0), 3.0)
+
+    def test_schema_rejects_non_positive_window(self):
+        parser = config_service.SCHEMA['POOL_SMOOTHING_WINDOW'][0]
+        self.assertEqual(parser('3600'), 3600)
+        for value in ('0', '-60', 'nan'):
+            with self.assertRaises(ValueError):
+                parser(value)
+
+    def test_failed_readings_are_not_samples(self):
+        smoother = PoolScoreSmoother('ewma', halflife=HOUR)
+        smoother.update('a', 1.0, 0)
+        self.assertEqual(smoother.update('a', 0.0, HOUR), 1.0)
+        self.assertEqual(smoother.update('b', None, HOUR), 0.0)
+
+    def test_unknown_method_rejected(self):
+        with self.assertRaises(ValueError):
+            PoolScoreSmoother('mean')
+
+class TestPoolStatsPersistence(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = 'test_pool_stats'
+        os.makedirs(self.test_data_dir, exist_ok=True)
+        self.original_db_file = database.DB_FILE
+        database.DB_FILE = os.path.join(self.test_data_dir, 'miner_history.db')
+        database.init_db()
+
+    def tearDown(self):
+        database.close_connections()
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+        database.DB_FILE = self.original_db_file
+
+    def test_log_and_read_pool_stats(self):
+        now = int(time.time())
+        database.log_pool_stats([
+            {'pool': 'a', 'effort': 1.2, 'fee': 0.01, 'erg_price': 1.5, 'score': 1.2375},
+            {'pool': 'b', 'effort': 0.8, 'fee': 0.009, 'erg_price': 1.5, 'score': 1.858},
+        ], timestamp=now - HOUR)
+        database.log_pool_stats([{'pool': 'a', 'effort': 1.0, 'fee': 0.01, 'erg_price': 1.5, 'score': 1.485}], timestamp=now)
+
+        rows = database.get_pool_stats(days=1)
+        self.assertEqual([(r['pool'], r['timestamp']) for r in rows], [('a', now - HOUR), ('b', now - HOUR), ('a', now)])
+        self.assertEqual([r['score'] for r in database.get_pool_stats(days=1, pool='a')], [1.2375, 1.485])
+
+    def test_retention_prunes_pool_stats(self):
+        now = int(time.time())
+        database.log_pool_stats([{'pool': 'a', 'score': 1.0}], timestamp=now - 100 * 86400)
+        database.log_pool_stats([{'pool': 'a', 'score': 1.0}], timestamp=now)
+        with patch.dict(database.RETENTION_DAYS, {'pool_stats': 90}):
+            deleted = database.apply_retention()
+        self.assertEqual(deleted['pool_stats'], 1)
+        self.assertEqual(len(database.get_pool_stats(days=365)), 1)
+
+    def test_switcher_smoother_warms_up_from_stored_samples(self):
+        now = int(time.time())
+        for hours_ago, score in ((3, 1.0), (2, 1.0), (1, 1.0)):
+            database.log_pool_stats([{'pool': 'a', 'score': score}], timestamp=now - hours_ago * HOUR)
+
+        smoother = profit_switcher.build_smoother({'POOL_SMOOTHING': 'ewma', 'POOL_SMOOTHING_HALFLIFE': str(HOUR)})
+        # A lucky round after three average ones only moves the estimate part way
+        smoothed = smoother.update('a', 2.0, now)
+        self.assertGreater(smoothed, 1.0)
+        self.assertLess(smoothed, 1.6)
+
+    @patch('profit_switcher.price_fetcher.fetch_erg_price', return_value=None)
+    @patch('profit_switcher.settings.snapshot')
+    @patch('profit_switcher.settings.update')
+    @patch('profit_switcher.get_pool_profitability')
+    @patch('profit_switcher.time.sleep', side_effect=Exception("Break Loop"))
+    def test_single_lucky_reading_does_not_trigger_switch(self, mock_sleep, mock_get_profit, mock_write_env,
+                                                          mock_read_env, mock_price):
+        profit_switcher.start_time = time.time() - 2000
+        profit_switcher.last_switch_time = 0.0
+        now = int(time.time())
+        # A day of history with 2Miners ahead of HeroMiners
+        for hours_ago in range(24, 0, -1):
+            database.log_pool_stats([
+                {'pool': pool['stratum'], 'score': 1.0 if pool['name'] == '2Miners' else 0.9}
+                for pool in profit_switcher.POOLS
+            ], timestamp=now - hours_ago * HOUR)
+
+        mock_read_env.return_value = {
+            "AUTO_PROFIT_SWITCHING": "true",
+            "POOL_ADDRESS": profit_switcher.POOLS[0]["stratum"],
+            "PROFIT_SWITCHING_THRESHOLD": "0.05",
+        }
+        # HeroMiners has one very lucky round
+        scores = {"2Miners": 1.0, "HeroMiners": 1.5, "Nanopool": 0.9, "WoolyPooly": 0.9}
+        mock_get_profit.side_effect = lambda pool, **kwargs: scores[pool["name"]]
+
+        with self.assertRaises(Exception):
+            profit_switcher.main()
+
+        mock_write_env.assert_not_called()
+        # The raw reading was still stored
+        latest = database.get_pool_stats(days=1, pool=profit_switcher.POOLS[1]["stratum"])[-1]
+        self.assertEqual(latest['score'], 1.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,8 +4,15 @@ import profit_switcher
 import os
 
 class TestProfitSwitcher(unittest.TestCase):
-
-    @patch('profit_switcher.requests.get')
+    def setUp(self):
+        # Keep the main loop away from the real pool_stats database
+        patcher = patch('profit_switcher.database')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        profit_switcher.pool_stats_cache.clear()
+        profit_switcher._last_recorded_fetch.clear()
+
+    @patch('profit_switcher.http_client.get')
     def test_get_pool_profitability_2miners(self, mock_get):
         mock_response = MagicMock()
         mock_response.json.return_value = {"luck": 120}
@@ -17,7 +24,7 @@ class TestProfitSwitcher(unittest.TestCase):
         # Score = (1 - 0.01) / 1.2 = 0.99 / 1.2 = 0.825
         self.assertAlmostEqual(score, 0.825)
 
-    @patch('profit_switcher.requests.get')
+    @patch('profit_switcher.http_client.get')
     def test_get_pool_profitability_herominers(self, mock_get):
         mock_response = MagicMock()
         mock_response.json.return_value = {"effort_1d": 0.8}
@@ -29,12 +36,13 @@ class TestProfitSwitcher(unittest.TestCase):
         # Score = (1 - 0.009) / 0.8 = 0.991 / 0.8 = 1.23875
         self.assertAlmostEqual(score, 1.23875)
 
-    @patch('profit_switcher.read_env_file')
-    @patch('profit_switcher.write_env_file')
+    @patch('profit_switcher.price_fetcher.fetch_erg_price', return_value=None)
+    @patch('profit_switcher.settings.snapshot')
+    @patch('profit_switcher.settings.update')
     @patch('profit_switcher.get_pool_profitability')
-    @patch('profit_switcher.subprocess.run')
+    @patch('profit_switcher.restart_coordinator.request_restart')
     @patch('profit_switcher.time.sleep', side_effect=Exception("Break Loop"))
-    def test_main_loop_switching(self, mock_sleep, mock_run, mock_get_profit, mock_write_env, mock_read_env):
+    def test_main_loop_switching(self, mock_sleep, mock_run, mock_get_profit, mock_write_env, mock_read_env, mock_price):
         # Move start_time back so cooldown is not active
         profit_switcher.start_time = profit_switcher.time.time() - 2000
 
@@ -53,7 +61,7 @@ class TestProfitSwitcher(unittest.TestCase):
             "Nanopool": 1.0,
             "WoolyPooly": 1.05
         }
-        mock_get_profit.side_effect = lambda pool: scores[pool["name"]]
+        mock_get_profit.side_effect = lambda pool, **kwargs: scores[pool["name"]]
 
         try:
             profit_switcher.main()
@@ -61,19 +69,20 @@ class TestProfitSwitcher(unittest.TestCase):
             if str(e) != "Break Loop":
                 raise e
 
-        # Verify write_env_file was called with HeroMiners address
+        # Verify the new pool was saved through the config service
         mock_write_env.assert_called_once()
         args, _ = mock_write_env.call_args
         self.assertEqual(args[0]["POOL_ADDRESS"], "stratum+tcp://herominers.com:1180")
 
-        # Verify restart.sh was called
-        mock_run.assert_called_once_with(["./restart.sh"], check=True)
+        # Verify a planned restart was requested
+        mock_run.assert_called_once_with("Switching to HeroMiners", source="profit_switcher", planned=True)
 
-    @patch('profit_switcher.read_env_file')
+    @patch('profit_switcher.price_fetcher.fetch_erg_price', return_value=None)
+    @patch('profit_switcher.settings.snapshot')
     @patch('profit_switcher.get_pool_profitability')
-    @patch('profit_switcher.write_env_file')
+    @patch('profit_switcher.settings.update')
     @patch('profit_switcher.time.sleep', side_effect=Exception("Break Loop"))
-    def test_main_loop_no_switching_below_threshold(self, mock_sleep, mock_write, mock_get_profit, mock_read_env):
+    def test_main_loop_no_switching_below_threshold(self, mock_sleep, mock_write, mock_get_profit, mock_read_env, mock_price):
         # Move start_time back so cooldown is not active
         profit_switcher.start_time = profit_switcher.time.time() - 2000
 
@@ -84,7 +93,8 @@ class TestProfitSwitcher(unittest.TestCase):
         }
 
         # HeroMiners is only slightly more profitable (below 0.5% threshold)
-        mock_get_profit.side_effect = [0.99, 0.991, 0.99, 0.991]
+        scores = {"2Miners": 0.99, "HeroMiners": 0.991, "Nanopool": 0.99, "WoolyPooly": 0.991}
+        mock_get_profit.side_effect = lambda pool, **kwargs: scores[pool["name"]]
 
         try:
             profit_switcher.main()
@@ -92,7 +102,7 @@ class TestProfitSwitcher(unittest.TestCase):
             if str(e) != "Break Loop":
                 raise e
 
-        # Verify write_env_file was NOT called
+        # Verify the config was NOT updated
         mock_write.assert_not_called()
 
 if __name__ == '__main__':
@@ -6,10 +6,10 @@ import profit_switcher
 class TestProfitSwitcherCaching(unittest.TestCase):
     def setUp(self):
         # Clear cache before each test
-        profit_switcher._pool_score_cache = {}
+        profit_switcher.pool_stats_cache.clear()
 
     @patch('price_fetcher.fetch_erg_price')
-    @patch('requests.get')
+    @patch('http_client.get')
     def test_caching_logic(self, mock_get, mock_fetch_price):
         mock_fetch_price.return_value = None
         pool = {
@@ -42,7 +42,7 @@ class TestProfitSwitcherCaching(unittest.TestCase):
         self.assertEqual(score3, 0.99)
 
     @patch('price_fetcher.fetch_erg_price')
-    @patch('requests.get')
+    @patch('http_client.get')
     def test_cache_expiration(self, mock_get, mock_fetch_price):
         mock_fetch_price.return_value = None
         pool = {
@@ -58,18 +58,40 @@ class TestProfitSwitcherCaching(unittest.TestCase):
         mock_response.json.return_value = {"luck": 100.0}
         mock_get.return_value = mock_response
 
-        # Set CACHE_TTL to 0 for testing expiration
-        original_ttl = profit_switcher.CACHE_TTL
-        profit_switcher.CACHE_TTL = 0
+        # Set the TTL to 0 for testing expiration
+        original_ttl = profit_switcher.pool_stats_cache.ttl
+        profit_switcher.pool_stats_cache.ttl = 0
         try:
             profit_switcher.get_pool_profitability(pool, use_cache=True)
             self.assertEqual(mock_get.call_count, 1)
 
-            # Should hit API again because TTL is 0
-            profit_switcher.get_pool_profitability(pool, use_cache=True)
+            # Expired: the stale score is served at once and the API is hit in the background
+            mock_response.json.return_value = {"luck": 50.0}
+            score = profit_switcher.get_pool_profitability(pool, use_cache=True)
+            self.assertEqual(score, 0.99)
+            self.assertTrue(profit_switcher.pool_stats_cache.wait_idle(5))
             self.assertEqual(mock_get.call_count, 2)
+            self.assertAlmostEqual(profit_switcher.get_pool_profitability(pool, use_cache=True), 1.98)
         finally:
-            profit_switcher.CACHE_TTL = original_ttl
+            profit_switcher.pool_stats_cache.ttl = original_ttl
+            profit_switcher.pool_stats_cache.wait_idle(5)
+
+    @patch('price_fetcher.fetch_erg_price')
+    @patch('http_client.get')
+    def test_failed_refresh_keeps_last_score(self, mock_get, mock_fetch_price):
+        mock_fetch_price.return_value = None
+        pool = profit_switcher.POOLS[0]
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"luck": 100.0}
+        mock_get.return_value = mock_response
+        profit_switcher.get_pool_profitability(pool)
+
+        # A failing API no longer makes the pool look like the worst one
+        mock_get.side_effect = Exception("Pool API down")
+        self.assertEqual(profit_switcher.get_pool_profitability(pool, use_cache=False), 0.99)
+        details = profit_switcher.get_pool_profitability(pool, return_details=True)
+        self.assertEqual(details['score'], 0.99)
+        self.assertIsNotNone(details['age'])
 
 if __name__ == '__main__':
     unittest.main()
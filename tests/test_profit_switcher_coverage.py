@@ -7,16 +7,23 @@ from unittest.mock import MagicMock
 @pytest.fixture(autouse=True)
 def setup_teardown():
     # Clear cache before each test
-    profit_switcher._pool_score_cache = {}
+    profit_switcher.pool_stats_cache.clear()
+    profit_switcher._last_good_scores = {}
+    profit_switcher._last_recorded_fetch.clear()
     # Reset globals
     profit_switcher.last_switch_time = 0.0
     profit_switcher.start_time = time.time()
     yield
 
+@pytest.fixture(autouse=True)
+def no_live_price(mocker):
+    mocker.patch('profit_switcher.price_fetcher.fetch_erg_price', return_value=None)
+    mocker.patch('profit_switcher.database')
+
 def test_get_pool_profitability_cache_hit_with_details(mocker):
     mocker.patch('profit_switcher.price_fetcher.fetch_erg_price', return_value=None)
     pool = profit_switcher.POOLS[0]
-    mock_get = mocker.patch('profit_switcher.requests.get')
+    mock_get = mocker.patch('profit_switcher.http_client.get')
 
     # First call to populate cache
     mock_response = MagicMock()
@@ -33,7 +40,7 @@ def test_get_pool_profitability_cache_hit_with_details(mocker):
 
 def test_get_pool_profitability_invalid_json(mocker):
     pool = profit_switcher.POOLS[0]
-    mock_get = mocker.patch('profit_switcher.requests.get')
+    mock_get = mocker.patch('profit_switcher.http_client.get')
     mock_response = MagicMock()
     mock_response.json.side_effect = ValueError("Invalid JSON")
     mock_response.status_code = 200
@@ -48,7 +55,7 @@ def test_get_pool_profitability_invalid_json(mocker):
 
 def test_get_pool_profitability_2miners_formats(mocker):
     pool = profit_switcher.POOLS[0] # 2Miners
-    mock_get = mocker.patch('profit_switcher.requests.get')
+    mock_get = mocker.patch('profit_switcher.http_client.get')
 
     # Format as list
     mock_response = MagicMock()
@@ -64,7 +71,7 @@ def test_get_pool_profitability_2miners_formats(mocker):
 
 def test_get_pool_profitability_nanopool_formats(mocker):
     pool = profit_switcher.POOLS[2] # Nanopool
-    mock_get = mocker.patch('profit_switcher.requests.get')
+    mock_get = mocker.patch('profit_switcher.http_client.get')
 
     # Direct luck
     mock_response = MagicMock()
@@ -80,7 +87,7 @@ def test_get_pool_profitability_nanopool_formats(mocker):
 
 def test_get_pool_profitability_woolypooly_formats(mocker):
     pool = profit_switcher.POOLS[3] # WoolyPooly
-    mock_get = mocker.patch('profit_switcher.requests.get')
+    mock_get = mocker.patch('profit_switcher.http_client.get')
 
     # Luck field
     mock_response = MagicMock()
@@ -96,7 +103,7 @@ def test_get_pool_profitability_woolypooly_formats(mocker):
 
 def test_get_pool_profitability_return_details_miss(mocker):
     pool = profit_switcher.POOLS[0]
-    mock_get = mocker.patch('profit_switcher.requests.get')
+    mock_get = mocker.patch('profit_switcher.http_client.get')
     mock_response = MagicMock()
     mock_response.json.return_value = {"luck": 100.0}
     mock_response.status_code = 200
@@ -109,7 +116,7 @@ def test_get_pool_profitability_return_details_miss(mocker):
 
 def test_get_pool_profitability_parsing_error(mocker):
     pool = profit_switcher.POOLS[1] # HeroMiners
-    mock_get = mocker.patch('profit_switcher.requests.get')
+    mock_get = mocker.patch('profit_switcher.http_client.get')
     mock_response = MagicMock()
     mock_response.json.return_value = {"effort_1d": "not a number"}
     mock_get.return_value = mock_response
@@ -120,7 +127,7 @@ def test_get_pool_profitability_parsing_error(mocker):
 
 def test_get_pool_profitability_network_errors(mocker):
     pool = profit_switcher.POOLS[0]
-    mock_get = mocker.patch('profit_switcher.requests.get')
+    mock_get = mocker.patch('profit_switcher.http_client.get')
 
     # RequestException
     mock_get.side_effect = requests.exceptions.RequestException("Network error")
@@ -133,13 +140,13 @@ def test_get_pool_profitability_network_errors(mocker):
     assert score == 0.0
 
 def test_main_auto_switching_disabled(mocker):
-    mocker.patch('profit_switcher.read_env_file', return_value={"AUTO_PROFIT_SWITCHING": "false"})
+    mocker.patch('profit_switcher.settings.snapshot', return_value={"AUTO_PROFIT_SWITCHING": "false"})
     mock_sleep = mocker.patch('profit_switcher.time.sleep', side_effect=Exception("Break Loop"))
     with pytest.raises(Exception, match="Break Loop"):
         profit_switcher.main()
 
 def test_main_grace_period(mocker):
-    mocker.patch('profit_switcher.read_env_file', return_value={
+    mocker.patch('profit_switcher.settings.snapshot', return_value={
         "AUTO_PROFIT_SWITCHING": "true",
         "MIN_SWITCH_COOLDOWN": "1000"
     })
@@ -150,7 +157,7 @@ def test_main_grace_period(mocker):
         profit_switcher.main()
 
 def test_main_cooldown_period(mocker):
-    mocker.patch('profit_switcher.read_env_file', return_value={
+    mocker.patch('profit_switcher.settings.snapshot', return_value={
         "AUTO_PROFIT_SWITCHING": "true",
         "MIN_SWITCH_COOLDOWN": "1000"
     })
@@ -163,7 +170,7 @@ def test_main_cooldown_period(mocker):
 
 def test_main_custom_pool(mocker):
     profit_switcher.start_time = time.time() - 2000
-    mocker.patch('profit_switcher.read_env_file', return_value={
+    mocker.patch('profit_switcher.settings.snapshot', return_value={
         "AUTO_PROFIT_SWITCHING": "true",
         "POOL_ADDRESS": "stratum+tcp://custom-pool.com:1234",
         "PROFIT_SWITCHING_THRESHOLD": "0.01"
@@ -177,7 +184,7 @@ def test_main_custom_pool(mocker):
 
 def test_main_custom_pool_match(mocker):
     profit_switcher.start_time = time.time() - 2000
-    mocker.patch('profit_switcher.read_env_file', return_value={
+    mocker.patch('profit_switcher.settings.snapshot', return_value={
         "AUTO_PROFIT_SWITCHING": "true",
         "POOL_ADDRESS": "custom-stratum",
         "PROFIT_SWITCHING_THRESHOLD": "0.1",
@@ -191,24 +198,28 @@ def test_main_custom_pool_match(mocker):
     ]
     mocker.patch('profit_switcher.POOLS', test_pools)
 
-    # First loop returns 1.0 for Other, and 0.0 for MatchMe (intentionally to trigger block)
+    # Scoring returns 1.0 for Other, and 0.0 for MatchMe (intentionally to trigger block)
     # Then it identifies MatchMe and calls get_pool_profitability again, returning 0.5.
-    mocker.patch('profit_switcher.get_pool_profitability', side_effect=[1.0, 0.0, 0.5])
+    matched = iter([0.0, 0.5])
+    mock_profit = mocker.patch('profit_switcher.get_pool_profitability',
+                               side_effect=lambda pool, **kwargs: 1.0 if pool["name"] == "Other" else next(matched))
 
     mock_sleep = mocker.patch('profit_switcher.time.sleep', side_effect=Exception("Break Loop"))
 
     with pytest.raises(Exception, match="Break Loop"):
         profit_switcher.main()
+    assert mock_profit.call_count == 3
 
 def test_main_best_pool_case(mocker):
     profit_switcher.start_time = time.time() - 2000
-    mocker.patch('profit_switcher.read_env_file', return_value={
+    mocker.patch('profit_switcher.settings.snapshot', return_value={
         "AUTO_PROFIT_SWITCHING": "true",
         "POOL_ADDRESS": profit_switcher.POOLS[1]["stratum"], # Herominers
         "PROFIT_SWITCHING_THRESHOLD": "0.01"
     })
     # 2Miners: 0.9, HeroMiners: 1.1, Nanopool: 1.0, WoolyPooly: 1.05
-    mocker.patch('profit_switcher.get_pool_profitability', side_effect=[0.9, 1.1, 1.0, 1.05])
+    scores = {"2Miners": 0.9, "HeroMiners": 1.1, "Nanopool": 1.0, "WoolyPooly": 1.05}
+    mocker.patch('profit_switcher.get_pool_profitability', side_effect=lambda pool, **kwargs: scores[pool["name"]])
     mock_sleep = mocker.patch('profit_switcher.time.sleep', side_effect=Exception("Break Loop"))
 
     with pytest.raises(Exception, match="Break Loop"):
@@ -216,15 +227,16 @@ def test_main_best_pool_case(mocker):
 
 def test_main_switching_occurs(mocker):
     profit_switcher.start_time = time.time() - 2000
-    mocker.patch('profit_switcher.read_env_file', return_value={
+    mocker.patch('profit_switcher.settings.snapshot', return_value={
         "AUTO_PROFIT_SWITCHING": "true",
         "POOL_ADDRESS": profit_switcher.POOLS[0]["stratum"], # 2Miners
         "PROFIT_SWITCHING_THRESHOLD": "0.01"
     })
     # 2Miners: 1.0, HeroMiners: 1.2, Nanopool: 1.0, WoolyPooly: 1.0
-    mocker.patch('profit_switcher.get_pool_profitability', side_effect=[1.0, 1.2, 1.0, 1.0])
-    mock_write_env = mocker.patch('profit_switcher.write_env_file')
-    mock_run = mocker.patch('profit_switcher.subprocess.run')
+    scores = {"2Miners": 1.0, "HeroMiners": 1.2, "Nanopool": 1.0, "WoolyPooly": 1.0}
+    mocker.patch('profit_switcher.get_pool_profitability', side_effect=lambda pool, **kwargs: scores[pool["name"]])
+    mock_write_env = mocker.patch('profit_switcher.settings.update')
+    mock_run = mocker.patch('profit_switcher.restart_coordinator.request_restart')
     mock_sleep = mocker.patch('profit_switcher.time.sleep', side_effect=Exception("Break Loop"))
 
     with pytest.raises(Exception, match="Break Loop"):
@@ -233,10 +245,10 @@ def test_main_switching_occurs(mocker):
     # Assert switching side effects
     mock_write_env.assert_called_once()
     assert mock_write_env.call_args[0][0]["POOL_ADDRESS"] == profit_switcher.POOLS[1]["stratum"]
-    mock_run.assert_called_once_with(["./restart.sh"], check=True)
+    mock_run.assert_called_once_with(f"Switching to {profit_switcher.POOLS[1]['name']}", source="profit_switcher", planned=True)
 
 def test_main_exception_handling(mocker):
-    mocker.patch('profit_switcher.read_env_file', side_effect=Exception("Env Error"))
+    mocker.patch('profit_switcher.settings.snapshot', side_effect=Exception("Env Error"))
     mock_sleep = mocker.patch('profit_switcher.time.sleep', side_effect=Exception("Break Loop"))
     with pytest.raises(Exception, match="Break Loop"):
         profit_switcher.main()
@@ -8,8 +8,11 @@ class TestProfitSwitcherEnhancements(unittest.TestCase):
         # Reset global state to avoid cross-test interference
         profit_switcher.last_switch_time = 0.0
         profit_switcher.start_time = time.time()
+        patcher = patch('profit_switcher.database')
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
-    @patch('profit_switcher.read_env_file')
+    @patch('profit_switcher.settings.snapshot')
     @patch('profit_switcher.get_pool_profitability')
     @patch('profit_switcher.time.sleep', side_effect=Exception("Break Loop"))
     def test_configurable_cooldown(self, mock_sleep, mock_get_profit, mock_read_env):
@@ -32,10 +35,11 @@ class TestProfitSwitcherEnhancements(unittest.TestCase):
             any_grace = any("initial grace period" in call.args[0] for call in mock_info.call_args_list)
             self.assertTrue(any_grace)
 
-    @patch('profit_switcher.read_env_file')
+    @patch('profit_switcher.price_fetcher.fetch_erg_price', return_value=None)
+    @patch('profit_switcher.settings.snapshot')
     @patch('profit_switcher.get_pool_profitability')
     @patch('profit_switcher.time.sleep', side_effect=Exception("Break Loop"))
-    def test_score_caching(self, mock_sleep, mock_get_profit, mock_read_env):
+    def test_score_caching(self, mock_sleep, mock_get_profit, mock_read_env, mock_price):
         profit_switcher.start_time = time.time() - 2000
 
         mock_read_env.return_value = {
@@ -45,7 +49,8 @@ class TestProfitSwitcherEnhancements(unittest.TestCase):
         }
 
         # 4 pools in POOLS list. get_pool_profitability should be called exactly 4 times if caching works.
-        mock_get_profit.side_effect = [1.0, 1.1, 1.0, 1.0] # 2Miners, HeroMiners, Nanopool, WoolyPooly
+        scores = {"2Miners": 1.0, "HeroMiners": 1.1, "Nanopool": 1.0, "WoolyPooly": 1.0}
+        mock_get_profit.side_effect = lambda pool, **kwargs: scores[pool["name"]]
 
         try:
             profit_switcher.main()
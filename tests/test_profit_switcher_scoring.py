@@ -0,0 +1,112 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import time
+import threading
+import profit_switcher
+
+class TestConcurrentPoolScoring(unittest.TestCase):
+    def setUp(self):
+        profit_switcher.pool_stats_cache.clear()
+        profit_switcher._last_good_scores = {}
+        profit_switcher._last_recorded_fetch.clear()
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def test_pools_are_scored_concurrently(self):
+        def slow_score(pool, **kwargs):
+            time.sleep(0.3)
+            return 1.0
+
+        with patch('profit_switcher.price_fetcher.fetch_erg_price', return_value=None), \
+             patch('profit_switcher.get_pool_profitability', side_effect=slow_score):
+            start = time.monotonic()
+            scores = profit_switcher.score_pools(profit_switcher.POOLS, deadline=5)
+            elapsed = time.monotonic() - start
+
+        self.assertEqual(scores, {pool['stratum']: 1.0 for pool in profit_switcher.POOLS})
+        # Four 0.3 s fetches in sequence would take 1.2 s
+        self.assertLess(elapsed, 0.9)
+
+    @patch('profit_switcher.http_client.get')
+    def test_price_fetched_once_per_cycle(self, mock_get):
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"luck": 100.0}
+        mock_get.return_value = mock_response
+
+        with patch('profit_switcher.price_fetcher.fetch_erg_price', return_value=2.0) as mock_price:
+            scores = profit_switcher.score_pools(profit_switcher.POOLS[:2], deadline=5)
+
+        mock_price.assert_called_once()
+        self.assertAlmostEqual(scores[profit_switcher.POOLS[0]['stratum']], 0.99 * 2.0)
+        # HeroMiners reads effort_1d, missing here, so effort defaults to 1.0
+        self.assertAlmostEqual(scores[profit_switcher.POOLS[1]['stratum']], 0.991 * 2.0)
+
+    def test_slow_pool_uses_last_good_score(self):
+        dead, alive = profit_switcher.POOLS[0], profit_switcher.POOLS[1]
+        profit_switcher._last_good_scores[dead['stratum']] = {'score': 0.8, 'timestamp': time.time() - 60}
+
+        def score(pool, **kwargs):
+            if pool is dead:
+                self.release.wait(5)
+            return 1.1
+
+        with patch('profit_switcher.price_fetcher.fetch_erg_price', return_value=None), \
+             patch('profit_switcher.get_pool_profitability', side_effect=score):
+            start = time.monotonic()
+            scores = profit_switcher.score_pools([dead, alive], deadline=0.3)
+            elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(scores, {dead['stratum']: 0.8, alive['stratum']: 1.1})
+        self.assertEqual(profit_switcher._last_good_scores[alive['stratum']]['score'], 1.1)
+
+    @patch('profit_switcher.database.log_pool_stats')
+    def test_only_fresh_readings_are_recorded(self, mock_log):
+        dead, alive = profit_switcher.POOLS[0], profit_switcher.POOLS[1]
+        profit_switcher._last_good_scores[dead['stratum']] = {'score': 0.8, 'timestamp': time.time() - 60}
+        profit_switcher.pool_stats_cache.load(alive['url'], lambda: {'effort': 0.9})
+
+        def score(pool, **kwargs):
+            if pool is dead:
+                self.release.wait(5)
+            return 1.1
+
+        answered = set()
+        with patch('profit_switcher.price_fetcher.fetch_erg_price', return_value=None), \
+             patch('profit_switcher.get_pool_profitability', side_effect=score):
+            scores = profit_switcher.score_pools([dead, alive], deadline=0.3, answered=answered)
+        self.assertEqual(answered, {alive['stratum']})
+
+        # The slow pool's fallback score is not a sample
+        recorded = profit_switcher.record_pool_samples([dead, alive], scores, time.time(), answered)
+        self.assertEqual(recorded, {alive['stratum']})
+        self.assertEqual([s['pool'] for s in mock_log.call_args.args[0]], [alive['stratum']])
+        # Nor is the same cached reading served again on the next cycle
+        recorded = profit_switcher.record_pool_samples([dead, alive], scores, time.time(), answered)
+        self.assertEqual(recorded, set())
+
+    def test_slow_pool_without_history_scores_zero(self):
+        def score(pool, **kwargs):
+            self.release.wait(5)
+            return 1.0
+
+        with patch('profit_switcher.price_fetcher.fetch_erg_price', return_value=None), \
+             patch('profit_switcher.get_pool_profitability', side_effect=score):
+            scores = profit_switcher.score_pools(profit_switcher.POOLS[:1], deadline=0.2)
+
+        self.assertEqual(scores, {profit_switcher.POOLS[0]['stratum']: 0.0})
+
+    def test_slow_price_falls_back_to_last_known_price(self):
+        def slow_price():
+            self.release.wait(5)
+            return 3.0
+
+        with patch('profit_switcher.price_fetcher.fetch_erg_price', side_effect=slow_price), \
+             patch('profit_switcher.price_fetcher.last_known_price', return_value=1.5), \
+             patch('profit_switcher.get_pool_profitability', return_value=1.0) as mock_score:
+            profit_switcher.score_pools(profit_switcher.POOLS[:1], deadline=0.2)
+
+        self.assertEqual(mock_score.call_args.kwargs['erg_price'], 1.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -21,6 +21,7 @@ class TestReportGenerator(unittest.TestCase):
         database.init_db()
 
     def tearDown(self):
+        database.close_connections()
         if os.path.exists(self.test_data_dir):
             import shutil
             shutil.rmtree(self.test_data_dir)
@@ -0,0 +1,191 @@
+import unittest
+from unittest.mock import patch
+import os
+import time
+import shutil
+import fcntl
+import tempfile
+import threading
+import subprocess
+import config_service
+import restart_coordinator
+
+class FakeTimer:
+    """Stands in for threading.Timer so tests decide when a deferred restart runs."""
+    created = []
+
+    def __init__(self, interval, function, args=()):
+        self.interval, self.function, self.args = interval, function, args
+        self.started = self.cancelled = False
+        FakeTimer.created.append(self)
+
+    def start(self):
+        self.started = True
+
+    def cancel(self):
+        self.cancelled = True
+
+    def fire(self):
+        self.function(*self.args)
+
+class TestRestartCoordinator(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = tempfile.mkdtemp()
+        self.calls_file = os.path.join(self.test_data_dir, 'restarts.txt')
+        # Stub restart script: records each call instead of killing PID 1
+        self.script = os.path.join(self.test_data_dir, 'restart.sh')
+        with open(self.script, 'w') as f:
+            f.write(f"#!/bin/bash\necho restarted >> {self.calls_file}\n")
+        os.chmod(self.script, 0o755)
+
+        self.env_file = os.path.join(self.test_data_dir, '.env')
+        with open(self.env_file, 'w') as f:
+            f.write("APPLY_OC=true\nGPU_PROFILE=RTX 3070\nGPU_TUNING=High\n")
+        self.settings = config_service.ConfigService(path=self.env_file)
+        self.settings_patch = patch.object(restart_coordinator, 'settings', self.settings)
+        self.settings_patch.start()
+
+        self.now = 1_000_000.0
+        self.time_patch = patch('restart_coordinator.time.time', side_effect=lambda: self.now)
+        self.time_patch.start()
+        FakeTimer.created = []
+        self.timer_patch = patch('restart_coordinator.threading.Timer', FakeTimer)
+        self.timer_patch.start()
+
+    def tearDown(self):
+        self.timer_patch.stop()
+        self.time_patch.stop()
+        self.settings_patch.stop()
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+
+    def _coordinator(self, **options):
+        options.setdefault('debounce', 60)
+        options.setdefault('backoff_base', 60)
+        options.setdefault('backoff_max', 1800)
+        options.setdefault('crash_loop_window', 3600)
+        options.setdefault('crash_loop_threshold', 4)
+        return restart_coordinator.RestartCoordinator(
+            script=self.script, lock_file=os.path.join(self.test_data_dir, 'restart.lock'),
+            state_file=os.path.join(self.test_data_dir, 'restart_state.json'), **options)
+
+    def _restarts(self):
+        if not os.path.exists(self.calls_file):
+            return 0
+        with open(self.calls_file) as f:
+            return len(f.readlines())
+
+    def test_burst_of_requests_restarts_once(self):
+        coordinator = self._coordinator()
+        results = [coordinator.request_restart("cuda_error: CUDA error 700", 'log_monitor') for _ in range(50)]
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(self._restarts(), 1)
+
+    def test_crash_during_backoff_restarts_when_window_expires(self):
+        coordinator = self._coordinator()
+        self.assertTrue(coordinator.request_restart("cuda_error: CUDA error 700", 'log_monitor'))
+        # The miner hangs right after one more error line inside the debounce window
+        self.now += 10
+        self.assertFalse(coordinator.request_restart("cuda_error: CUDA error 700", 'log_monitor'))
+        self.now += 20
+        self.assertFalse(coordinator.request_restart("cuda_error: CUDA error 700", 'log_monitor'))
+        self.assertEqual(self._restarts(), 1)
+        self.assertEqual(len(FakeTimer.created), 1)
+        pending = FakeTimer.created[0]
+        self.assertEqual(pending.interval, 50)
+
+        self.now += 30
+        pending.fire()
+        self.assertEqual(self._restarts(), 2)
+        self.assertEqual(coordinator.load_state()['restarts'][-1]['source'], 'log_monitor')
+
+    def test_pending_restart_dropped_after_another_restart(self):
+        coordinator = self._coordinator()
+        self.assertTrue(coordinator.request_restart("crash", 'log_monitor'))
+        self.now += 10
+        self.assertFalse(coordinator.request_restart("crash", 'log_monitor'))
+        self.now += 5
+        self.assertTrue(coordinator.request_restart("Switching to HeroMiners", 'profit_switcher', planned=True))
+        self.now += 60
+        FakeTimer.created[0].fire()
+        self.assertEqual(self._restarts(), 2)
+
+    def test_backoff_doubles_between_crash_restarts(self):
+        coordinator = self._coordinator(crash_loop_threshold=100)
+        self.assertTrue(coordinator.request_restart("crash", 'healthcheck'))
+        waits = []
+        for _ in range(4):
+            state = coordinator.load_state()
+            waits.append(coordinator.required_wait(state, self.now))
+            self.now += waits[-1] - 1
+            self.assertFalse(coordinator.request_restart("crash", 'healthcheck'))
+            self.now += 1
+            self.assertTrue(coordinator.request_restart("crash", 'healthcheck'))
+        self.assertEqual(waits, [60, 120, 240, 480])
+        self.assertEqual(self._restarts(), 5)
+
+    def test_planned_restart_skips_debounce_and_is_not_a_crash(self):
+        coordinator = self._coordinator()
+        self.assertTrue(coordinator.request_restart("crash", 'log_monitor'))
+        self.now += 5
+        self.assertTrue(coordinator.request_restart("Switching to HeroMiners", 'profit_switcher', planned=True))
+        self.assertEqual(len(coordinator.recent_crash_restarts(coordinator.load_state(), self.now)), 1)
+        # ...but a crash restart right after it is still debounced
+        self.assertFalse(coordinator.request_restart("crash", 'healthcheck'))
+
+    def test_crash_loop_lowers_gpu_tuning(self):
+        coordinator = self._coordinator(backoff_base=1, debounce=1)
+        for _ in range(4):
+            self.assertTrue(coordinator.request_restart("gpu_lost", 'log_monitor'))
+            self.now += 100
+        self.assertEqual(self.settings.get('GPU_TUNING'), 'Efficient')
+        self.assertEqual(coordinator.load_state()['escalations'][-1]['to'], 'Efficient')
+
+        # The count starts over after escalating
+        for _ in range(3):
+            coordinator.request_restart("gpu_lost", 'log_monitor')
+            self.now += 100
+        self.assertEqual(self.settings.get('GPU_TUNING'), 'Efficient')
+        coordinator.request_restart("gpu_lost", 'log_monitor')
+        self.assertEqual(self.settings.get('GPU_TUNING'), 'Quiet')
+
+    def test_no_escalation_without_overclocking(self):
+        self.settings.update({'APPLY_OC': 'false'})
+        coordinator = self._coordinator(backoff_base=1, debounce=1)
+        for _ in range(6):
+            coordinator.request_restart("gpu_lost", 'log_monitor')
+            self.now += 100
+        self.assertEqual(self.settings.get('GPU_TUNING'), 'High')
+        self.assertEqual(self._restarts(), 6)
+
+    def test_restart_in_progress_elsewhere_drops_crash_request(self):
+        coordinator = self._coordinator()
+        # Another process (e.g. healthcheck.sh) holds the lock
+        fd = os.open(coordinator.lock_file, os.O_RDWR | os.O_CREAT)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            self.assertFalse(coordinator.request_restart("crash", 'log_monitor'))
+        finally:
+            os.close(fd)
+        self.assertEqual(self._restarts(), 0)
+
+    def test_cli_shares_state_with_python_callers(self):
+        coordinator = self._coordinator()
+        self.assertTrue(coordinator.request_restart("crash", 'log_monitor'))
+        self.time_patch.stop()
+        try:
+            env = dict(os.environ, RESTART_SCRIPT=self.script, RESTART_LOCK_FILE=coordinator.lock_file,
+                       RESTART_STATE_FILE=coordinator.state_file, DATA_DIR=self.test_data_dir)
+            # The Python caller restarted at a fake time far in the past, so age it to "just now"
+            state = coordinator.load_state()
+            state['restarts'][-1]['time'] = time.time()
+            coordinator._save_state(state)
+            result = subprocess.run(['python3', 'restart_coordinator.py', '--source', 'healthcheck', '--reason', 'test'],
+                                    env=env, capture_output=True, text=True,
+                                    cwd=os.path.dirname(os.path.abspath(restart_coordinator.__file__)))
+        finally:
+            self.time_patch.start()
+        self.assertEqual(result.returncode, 1, result.stderr)
+        self.assertEqual(self._restarts(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import patch
+import os
+import json
+import time
+import shutil
+import rig_snapshot
+
+class TestRigSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = 'test_rig_snapshot'
+        os.makedirs(self.test_data_dir, exist_ok=True)
+        patcher = patch.object(rig_snapshot, 'SNAPSHOT_FILE', os.path.join(self.test_data_dir, 'latest_snapshot.json'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+
+    def test_publish_and_read(self):
+        miner = {'total_hashrate': 120.5, 'gpus': [{'index': 0}]}
+        self.assertTrue(rig_snapshot.publish_snapshot(miner, {'is_synced': True}, {'cpu_usage': 5}))
+
+        snapshot = rig_snapshot.read_snapshot()
+        self.assertEqual(snapshot['miner'], miner)
+        self.assertEqual(snapshot['node'], {'is_synced': True})
+        self.assertEqual(snapshot['system'], {'cpu_usage': 5})
+        # Only the final file is left behind
+        self.assertEqual(os.listdir(self.test_data_dir), ['latest_snapshot.json'])
+
+    def test_missing_or_stale_snapshot(self):
+        self.assertIsNone(rig_snapshot.read_snapshot())
+
+        rig_snapshot.publish_snapshot(None, {}, {})
+        self.assertIsNotNone(rig_snapshot.read_snapshot())
+        with patch('rig_snapshot.time.time', return_value=time.time() + rig_snapshot.SNAPSHOT_MAX_AGE + 1):
+            self.assertIsNone(rig_snapshot.read_snapshot())
+
+    def test_file_parsed_only_when_changed(self):
+        rig_snapshot.publish_snapshot({'total_hashrate': 1}, {}, {})
+        with patch('rig_snapshot.json.load', wraps=json.load) as mock_load:
+            first = rig_snapshot.read_snapshot()
+            first['miner']['total_hashrate'] = 999
+            second = rig_snapshot.read_snapshot()
+            self.assertEqual(mock_load.call_count, 1)
+            # Callers get their own copy
+            self.assertEqual(second['miner']['total_hashrate'], 1)
+
+            # Force a distinct mtime for the replacement file
+            rig_snapshot.publish_snapshot({'total_hashrate': 2}, {}, {})
+            future = time.time() + 5
+            os.utime(rig_snapshot.SNAPSHOT_FILE, (future, future))
+            self.assertEqual(rig_snapshot.read_snapshot()['miner']['total_hashrate'], 2)
+            self.assertEqual(mock_load.call_count, 2)
+
+    def test_unserializable_data_keeps_previous_snapshot(self):
+        rig_snapshot.publish_snapshot({'total_hashrate': 1}, {}, {})
+        self.assertFalse(rig_snapshot.publish_snapshot({'bad': object()}, {}, {}))
+        self.assertEqual(rig_snapshot.read_snapshot()['miner']['total_hashrate'], 1)
+        self.assertEqual(os.listdir(self.test_data_dir), ['latest_snapshot.json'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+from unittest.mock import patch
+import os
+import io
+import time
+import shutil
+import struct
+import contextlib
+import numpy as np
+import sample_ring
+
+def _gpus(step, count=2):
+    return [{'index': i, 'hashrate': 100.0 + step, 'temperature': 60 + i, 'power_draw': 150.0,
+             'fan_speed': 40, 'accepted_shares': step, 'rejected_shares': 0} for i in range(count)]
+
+class TestSampleRing(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = 'test_sample_ring'
+        os.makedirs(self.test_data_dir, exist_ok=True)
+        self.path = os.path.join(self.test_data_dir, 'sample_ring.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+
+    def test_record_layout(self):
+        self.assertEqual(sample_ring.RECORD_SIZE, 40)
+        self.assertEqual(sample_ring.RECORD_DTYPE.itemsize, sample_ring.RECORD_SIZE)
+
+    def test_reader_sees_appended_records(self):
+        writer = sample_ring.RingWriter(self.path, capacity=8)
+        writer.append(_gpus(1), timestamp=1000.0)
+        reader = sample_ring.RingReader(self.path)
+        try:
+            records = reader.read()
+            self.assertEqual(len(records), 2)
+            self.assertEqual(records['gpu_index'].tolist(), [0, 1])
+            self.assertEqual(records['temperature'].tolist(), [60.0, 61.0])
+            self.assertEqual(records['timestamp'][0], 1000.0)
+
+            # Same mapping sees later writes without reopening
+            writer.append(_gpus(2), timestamp=1015.0)
+            self.assertEqual(len(reader.read()), 4)
+        finally:
+            reader.close()
+            writer.close()
+
+    def test_wraparound_keeps_newest_in_order(self):
+        writer = sample_ring.RingWriter(self.path, capacity=5)
+        for step in range(4):
+            writer.append(_gpus(step), timestamp=1000.0 + step)
+        reader = sample_ring.RingReader(self.path)
+        try:
+            records = reader.read()
+            self.assertEqual(len(records), 5)
+            self.assertTrue(np.all(np.diff(records['timestamp']) >= 0))
+            self.assertEqual(records['accepted_shares'].tolist(), [1, 2, 2, 3, 3])
+            self.assertEqual(reader.read(last=2)['accepted_shares'].tolist(), [3, 3])
+        finally:
+            reader.close()
+            writer.close()
+
+    def test_history_survives_writer_restart(self):
+        writer = sample_ring.RingWriter(self.path, capacity=8)
+        writer.append(_gpus(1))
+        writer.close()
+
+        writer = sample_ring.RingWriter(self.path, capacity=8)
+        writer.append(_gpus(2))
+        writer.close()
+        reader = sample_ring.RingReader(self.path)
+        self.assertEqual(len(reader.read()), 4)
+        reader.close()
+
+        # Different capacity means a different layout: start over
+        sample_ring.RingWriter(self.path, capacity=16).close()
+        reader = sample_ring.RingReader(self.path)
+        self.assertEqual(len(reader.read()), 0)
+        reader.close()
+
+    def test_read_since(self):
+        writer = sample_ring.RingWriter(self.path, capacity=16)
+        writer.append(_gpus(1), timestamp=time.time() - 7200)
+        writer.append(_gpus(2))
+        reader = sample_ring.RingReader(self.path)
+        try:
+            recent = reader.read_since(3600)
+            self.assertEqual(recent['accepted_shares'].tolist(), [2, 2])
+        finally:
+            reader.close()
+            writer.close()
+
+    def test_reader_waits_out_inflight_write(self):
+        writer = sample_ring.RingWriter(self.path, capacity=8)
+        writer.append(_gpus(1))
+        reader = sample_ring.RingReader(self.path)
+        # Writer stuck mid-update (odd sequence)
+        struct.pack_into('<Q', writer._mm, sample_ring.SEQ_OFFSET, 3)
+        try:
+            with self.assertRaises(TimeoutError):
+                reader.read(retries=5)
+        finally:
+            reader.close()
+            writer.close()
+
+    def test_rejects_foreign_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'\0' * 4096)
+        with self.assertRaises(ValueError):
+            sample_ring.RingReader(self.path)
+
+    def test_cli_dumps_csv(self):
+        writer = sample_ring.RingWriter(self.path, capacity=8)
+        writer.append(_gpus(1, count=1), timestamp=1000.0)
+        writer.close()
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            sample_ring.main(['--file', self.path])
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['timestamp', 'gpu_index', 'hashrate'])
+        self.assertEqual(lines[1].split(',')[:3], ['1000.0', '0', '101.0'])
+
+    def test_append_samples_uses_shared_writer(self):
+        with patch.object(sample_ring, 'SAMPLE_RING_FILE', self.path), patch.object(sample_ring, '_writer', None):
+            sample_ring.append_samples(_gpus(1))
+            sample_ring.append_samples(_gpus(2))
+            sample_ring._writer.close()
+        reader = sample_ring.RingReader(self.path)
+        self.assertEqual(len(reader.read()), 4)
+        reader.close()
+
+if __name__ == '__main__':
+    unittest.main()
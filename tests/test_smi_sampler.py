@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import time
+import gpu_hardware
+
+FAKE_SMI = os.path.join(os.path.dirname(__file__), 'fixtures', 'fake_nvidia_smi.py')
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+class TestSmiSampler(unittest.TestCase):
+    def setUp(self):
+        gpu_hardware.stop_sampler()
+        gpu_hardware.invalidate_snapshot()
+
+    def tearDown(self):
+        gpu_hardware.stop_sampler()
+
+    def test_streams_rows_into_ring_buffer(self):
+        sampler = gpu_hardware.SmiSampler([sys.executable, FAKE_SMI, '--loop-ms=20'], history=5, interval_ms=20)
+        sampler.start()
+        try:
+            self.assertTrue(_wait_for(lambda: len(sampler.get_history(1)) == 5))
+            latest = sampler.latest()
+            self.assertEqual([g['index'] for g in latest], [0, 1])
+            self.assertEqual(latest[1]['name'], 'Fake GPU 1')
+            self.assertEqual(latest[1]['power_draw'], 151.5)
+
+            # Ring buffer is bounded and keeps the newest readings in order
+            history = sampler.get_history(0)
+            self.assertEqual(len(history), 5)
+            temps = [r['temperature'] for r in history]
+            self.assertEqual(temps, sorted(temps))
+            self.assertTrue(sampler.is_running())
+        finally:
+            sampler.stop()
+        self.assertFalse(sampler.is_running())
+
+    def test_stale_stream_returns_nothing(self):
+        sampler = gpu_hardware.SmiSampler([sys.executable, FAKE_SMI, '--loop-ms=20'], interval_ms=20)
+        sampler._ingest("0, Fake GPU 0, 60, 150, 40, 1500, 7000")
+        self.assertEqual(len(sampler.latest()), 1)
+        with patch('gpu_hardware.time.time', return_value=time.time() + 60):
+            self.assertEqual(sampler.latest(), [])
+
+    def test_gpu_dropping_out_leaves_the_others(self):
+        sampler = gpu_hardware.SmiSampler([sys.executable, FAKE_SMI, '--loop-ms=20'], interval_ms=20)
+        now = time.time()
+        with patch('gpu_hardware.time.time', return_value=now - 60):
+            sampler._ingest("1, Fake GPU 1, 61, 151.5, 41, 1500, 7000")
+        sampler._ingest("0, Fake GPU 0, 60, 150, 40, 1500, 7000")
+        self.assertEqual([g['index'] for g in sampler.latest()], [0])
+
+    def test_row_without_index_is_skipped(self):
+        sampler = gpu_hardware.SmiSampler([sys.executable, FAKE_SMI, '--loop-ms=20'], interval_ms=20)
+        sampler._ingest("0, Fake GPU 0, 60, 150, 40, 1500, 7000")
+        sampler._ingest("[Unknown Error], Fake GPU 1, 99, 300, 100, 1500, 7000")
+        latest = sampler.latest()
+        self.assertEqual(len(latest), 1)
+        self.assertEqual((latest[0]['index'], latest[0]['temperature']), (0, 60.0))
+        self.assertEqual(len(sampler.get_history(0)), 1)
+
+    @patch('gpu_hardware.subprocess.check_output')
+    def test_snapshot_served_from_sampler(self, mock_output):
+        sampler = gpu_hardware.start_sampler([sys.executable, FAKE_SMI, '--loop-ms=20', '--gpus=3'])
+        self.assertIs(gpu_hardware.get_sampler(), sampler)
+        self.assertTrue(_wait_for(lambda: len(sampler.latest()) == 3))
+
+        snapshot = gpu_hardware.get_hardware_snapshot()
+        self.assertEqual(len(snapshot), 3)
+        self.assertEqual(snapshot[2]['fan_speed'], 42.0)
+        mock_output.assert_not_called()
+
+    @patch('gpu_hardware.detect_smi_tool', return_value='rocm')
+    def test_no_streaming_without_nvidia(self, mock_detect):
+        self.assertIsNone(gpu_hardware.start_sampler())
+
+if __name__ == '__main__':
+    unittest.main()
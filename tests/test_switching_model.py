@@ -0,0 +1,177 @@
+import unittest
+from unittest.mock import patch
+import os
+import time
+import shutil
+import random
+import tempfile
+import contextlib
+import io
+import database
+import profit_switcher
+import profit_backtest
+import switching_model
+
+HOUR = 3600
+
+def _hashrate_rows(switch_time, outage, warmup, baseline=100.0, step=15):
+    """Samples every `step` s: baseline before the switch, 0 for `outage` s, half rate for `warmup` s, then baseline."""
+    rows = []
+    for ts in range(int(switch_time - 600), int(switch_time + 1200), step):
+        elapsed = ts - switch_time
+        if elapsed < 0:
+            hashrate = baseline
+        elif elapsed < outage:
+            hashrate = 0.0
+        elif elapsed < outage + warmup:
+            hashrate = baseline / 2
+        else:
+            hashrate = baseline
+        rows.append({'timestamp': ts, 'hashrate': hashrate})
+    return rows
+
+class TestSwitchingModel(unittest.TestCase):
+    def test_gain_without_cost_matches_plain_ratio(self):
+        self.assertAlmostEqual(switching_model.expected_switch_gain(1.1, 1.0, HOUR, 0), 0.1)
+
+    def test_switch_cost_reduces_gain(self):
+        # 5% better for one hour does not pay for 5 minutes of downtime
+        self.assertLess(switching_model.expected_switch_gain(1.05, 1.0, HOUR, 300), 0)
+        # ...but it does over a day
+        self.assertGreater(switching_model.expected_switch_gain(1.05, 1.0, 24 * HOUR, 300), 0.04)
+
+    def test_measure_switch_downtime(self):
+        switch_time = 1_000_000
+        rows = _hashrate_rows(switch_time, outage=120, warmup=60)
+        # 120 s at zero plus 60 s at half rate
+        self.assertAlmostEqual(switching_model.measure_switch_downtime(switch_time, rows), 150, delta=15)
+
+    def test_missing_samples_count_as_downtime(self):
+        switch_time = 1_000_000
+        rows = [r for r in _hashrate_rows(switch_time, outage=0, warmup=0)
+                if not switch_time <= r['timestamp'] < switch_time + 300]
+        self.assertAlmostEqual(switching_model.measure_switch_downtime(switch_time, rows), 300, delta=switching_model.MAX_SAMPLE_GAP)
+
+    def test_unmeasurable_switches_fall_back_to_default(self):
+        switch_time = 1_000_000
+        never_recovered = [r for r in _hashrate_rows(switch_time, outage=5000, warmup=0)]
+        self.assertIsNone(switching_model.measure_switch_downtime(switch_time, never_recovered))
+        self.assertIsNone(switching_model.measure_switch_downtime(switch_time, []))
+        self.assertEqual(switching_model.estimate_restart_downtime([None]),
+                         (switching_model.DEFAULT_RESTART_DOWNTIME, 0))
+        self.assertEqual(switching_model.estimate_restart_downtime([100, None, 200, 600]), (200, 3))
+
+class TestRestartDowntimeFromHistory(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = 'test_switching_model'
+        os.makedirs(self.test_data_dir, exist_ok=True)
+        self.original_db_file = database.DB_FILE
+        database.DB_FILE = os.path.join(self.test_data_dir, 'miner_history.db')
+        database.init_db()
+
+    def tearDown(self):
+        database.close_connections()
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+        database.DB_FILE = self.original_db_file
+
+    def test_measures_switches_logged_by_the_switcher(self):
+        for hours_ago, outage in ((48, 90), (24, 150), (2, 210)):
+            switch_time = int(time.time()) - hours_ago * HOUR
+            for row in _hashrate_rows(switch_time, outage=outage, warmup=0):
+                with patch('database.time.time', return_value=row['timestamp']):
+                    database.log_history(row['hashrate'], 60, 50, 0, 0)
+            database.log_pool_switch('a', 'b', 0.1, timestamp=switch_time)
+
+        downtime, measured = profit_switcher.measure_restart_downtime()
+        self.assertEqual(measured, 3)
+        self.assertAlmostEqual(downtime, 150, delta=15)
+
+class TestBacktest(unittest.TestCase):
+    def _noisy_series(self, cycles=48):
+        # Pool "a" is steady; pool "b" is better on average but its luck alternates every cycle
+        return [(i * HOUR, {'a': 1.0, 'b': 1.6 if i % 2 else 0.7}) for i in range(cycles)]
+
+    def test_cost_aware_policy_avoids_chasing_noise(self):
+        series = self._noisy_series()
+        naive = profit_backtest.backtest(series, 'threshold', threshold=0.01, cooldown=0, start_pool='a')
+        cost_aware = profit_backtest.backtest(series, 'cost_aware', threshold=0.01, cooldown=0, start_pool='a')
+
+        self.assertGreater(naive['switches'], 20)
+        self.assertLessEqual(cost_aware['switches'], 1)
+        self.assertGreater(cost_aware['earnings'], naive['earnings'])
+        self.assertEqual(naive['downtime'], naive['switches'] * switching_model.DEFAULT_RESTART_DOWNTIME)
+
+    def test_cooldown_limits_switches(self):
+        series = self._noisy_series()
+        result = profit_backtest.backtest(series, 'threshold', threshold=0.01, cooldown=6 * HOUR, start_pool='a')
+        self.assertLessEqual(result['switches'], 8)
+
+    def test_no_lookahead(self):
+        # "b" only becomes better in the last cycle; a policy cannot earn from it before seeing it
+        series = [(i * HOUR, {'a': 1.0, 'b': 0.5}) for i in range(10)] + [(10 * HOUR, {'a': 1.0, 'b': 3.0})]
+        result = profit_backtest.backtest(series, 'threshold', threshold=0.01, cooldown=0, start_pool='a')
+        self.assertEqual(result['switches'], 0)
+        self.assertAlmostEqual(result['earnings'], result['baseline'])
+
+    def test_simulated_clock(self):
+        clock = profit_backtest.SimulatedClock(100)
+        clock.sleep(profit_switcher.RESTART_SETTLE_TIME)
+        self.assertEqual(clock.time(), 100 + profit_switcher.RESTART_SETTLE_TIME)
+
+class TestSimulationFixtures(unittest.TestCase):
+    def setUp(self):
+        self.test_data_dir = tempfile.mkdtemp()
+        self.original_db_file = database.DB_FILE
+        database.DB_FILE = os.path.join(self.test_data_dir, 'miner_history.db')
+        database.init_db()
+
+    def tearDown(self):
+        database.close_connections()
+        shutil.rmtree(self.test_data_dir, ignore_errors=True)
+        database.DB_FILE = self.original_db_file
+
+    def _write_year_fixture(self, path, interval=900):
+        rng = random.Random(42)
+        with open(path, 'w') as f:
+            f.write('timestamp,pool,effort,fee,erg_price,score\n')
+            for ts in range(0, 365 * 86400, interval):
+                price = 1.5
+                for pool, fee in (('a', 0.01), ('b', 0.009), ('c', 0.02)):
+                    effort = rng.lognormvariate(0, 0.4)
+                    f.write(f"{ts},{pool},{effort},{fee},{price},\n")
+
+    def test_export_and_load_round_trip(self):
+        now = int(time.time())
+        database.log_pool_stats([
+            {'pool': 'a', 'effort': 1.25, 'fee': 0.01, 'erg_price': 2.0, 'score': 1.584},
+            {'pool': 'b', 'effort': 0.8, 'fee': 0.01, 'erg_price': 2.0, 'score': 2.475},
+        ], timestamp=now - HOUR)
+        database.log_pool_stats([{'pool': 'a', 'effort': 1.0, 'fee': 0.01, 'erg_price': 2.0, 'score': 1.98}], timestamp=now)
+
+        path = os.path.join(self.test_data_dir, 'pool_stats.csv')
+        self.assertEqual(profit_backtest.export_fixture(path, days=1), 3)
+        self.assertEqual(profit_backtest.load_fixture(path), profit_backtest.load_series(days=1))
+
+    def test_score_rebuilt_from_effort_fee_and_price(self):
+        series = profit_backtest.build_series([{'timestamp': '0', 'pool': 'a', 'effort': '0.5', 'fee': '0.01', 'erg_price': '2', 'score': ''}])
+        self.assertAlmostEqual(series[0][1]['a'], 3.96)
+
+    def test_year_of_simulated_time_runs_in_seconds(self):
+        path = os.path.join(self.test_data_dir, 'year.csv')
+        self._write_year_fixture(path)
+
+        output = io.StringIO()
+        started = time.monotonic()
+        with contextlib.redirect_stdout(output):
+            status = profit_backtest.main(['--fixture', path, '--thresholds', '0.005,0.05', '--cooldowns', '900,21600'])
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(status, 0)
+        self.assertLess(elapsed, 30)
+        lines = output.getvalue().splitlines()
+        self.assertIn('Simulated 365.0 days', lines[0])
+        # 3 policies x 2 thresholds x 2 cooldowns
+        self.assertEqual(len(lines), 2 + 12)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import threading
+import time
+from swr_cache import SWRCache
+
+class TestSWRCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = patch('swr_cache.time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = SWRCache('test', ttl=100, max_stale=1000, refresh_ahead=0.8, negative_ttl=60)
+        self.addCleanup(self.cache.wait_idle, 5)
+        self.addCleanup(self.cache.clear)
+
+    def test_fresh_value_served_without_loading(self):
+        loader = MagicMock(return_value=1)
+        self.assertEqual(self.cache.get('k', loader), 1)
+        self.now += 50
+        self.assertEqual(self.cache.get('k', loader), 1)
+        loader.assert_called_once()
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_refresh_ahead_and_stale_values_refresh_in_background(self):
+        self.cache.get('k', lambda: 1)
+        release = threading.Event()
+
+        def slow_loader():
+            release.wait(5)
+            return 2
+
+        # Past refresh_ahead: old value returned immediately, refresh runs in the background
+        self.now += 85
+        self.assertEqual(self.cache.get('k', slow_loader), 1)
+        # Past the TTL and refresh still running: still served, no second refresh
+        self.now += 100
+        self.assertEqual(self.cache.get('k', slow_loader), 1)
+        self.assertEqual(self.cache.stats()['refreshing'], 1)
+        release.set()
+        self.assertTrue(self.cache.wait_idle(5))
+        self.assertEqual(self.cache.get('k', slow_loader), 2)
+        stats = self.cache.stats()
+        self.assertEqual((stats['stale_hits'], stats['refreshes']), (1, 2))
+
+    def test_failures_are_negatively_cached(self):
+        self.cache.get('k', lambda: 1)
+        failing = MagicMock(side_effect=RuntimeError("down"))
+        self.now += 90
+        self.assertEqual(self.cache.get('k', failing), 1)
+        self.cache.wait_idle(5)
+        self.assertEqual(failing.call_count, 1)
+
+        # Within negative_ttl the failing source is not retried
+        self.now += 30
+        self.assertEqual(self.cache.get('k', failing), 1)
+        self.assertEqual(failing.call_count, 1)
+
+        self.now += 60
+        self.cache.get('k', failing)
+        self.cache.wait_idle(5)
+        self.assertEqual(failing.call_count, 2)
+        self.assertEqual(self.cache.stats()['failures'], 2)
+
+    def test_value_not_served_past_max_stale(self):
+        self.cache.get('k', lambda: 1)
+        self.now += 1001
+        failing = MagicMock(side_effect=RuntimeError("down"))
+        self.assertIsNone(self.cache.get('k', failing))
+        # Negatively cached: no retry until negative_ttl passes
+        self.assertIsNone(self.cache.get('k', failing))
+        self.assertEqual(failing.call_count, 1)
+        self.assertEqual(self.cache.stats()['negative_hits'], 1)
+        self.assertEqual(self.cache.peek('k'), 1)
+
+    def test_miss_without_wait_loads_in_background(self):
+        self.assertIsNone(self.cache.get('k', lambda: 3, wait=False))
+        self.assertTrue(self.cache.wait_idle(5))
+        self.assertEqual(self.cache.get('k', lambda: 4, wait=False), 3)
+        self.assertEqual(self.cache.age('k'), 0)
+
+class TestScheduledRefresh(unittest.TestCase):
+    """Real timers, scaled down: ttl 0.4 s stands for the 300 s pool stats TTL."""
+
+    def setUp(self):
+        self.cache = SWRCache('test', ttl=0.4, max_stale=3, refresh_ahead=0.5, negative_ttl=0.1)
+        self.addCleanup(self.cache.clear)
+        self.loads = []
+
+    def _slow_loader(self):
+        self.loads.append(threading.current_thread().name)
+        time.sleep(0.05)
+        return len(self.loads)
+
+    def test_switch_interval_gap_does_not_block(self):
+        self.cache.get('k', self._slow_loader)
+        # A profit switching interval passes without any reads, several TTLs long
+        time.sleep(1.5)
+        start = time.monotonic()
+        value = self.cache.get('k', self._slow_loader)
+        self.assertLess(time.monotonic() - start, 0.03)
+        self.assertGreater(value, 1)
+        self.assertLess(self.cache.age('k'), 0.4)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+        # Only the first load ran in the caller's thread
+        self.assertTrue(all(name != threading.current_thread().name for name in self.loads[1:]))
+
+    def test_unread_keys_stop_refreshing(self):
+        cache = SWRCache('test', ttl=0.1, max_stale=0.3, refresh_ahead=0.5)
+        self.addCleanup(cache.clear)
+        cache.get('k', self._slow_loader)
+        time.sleep(0.8)
+        loads = len(self.loads)
+        time.sleep(0.3)
+        self.assertEqual(len(self.loads), loads)
+        self.assertLessEqual(loads, 7)
+
+    def test_failed_refresh_is_retried_after_negative_ttl(self):
+        results = iter([1, RuntimeError("down"), 3])
+
+        def flaky():
+            result = next(results, 3)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        self.cache.get('k', flaky)
+        time.sleep(0.6)
+        self.assertEqual(self.cache.peek('k'), 3)
+
+if __name__ == '__main__':
+    unittest.main()
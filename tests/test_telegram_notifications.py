@@ -8,107 +8,84 @@ import time
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import metrics
+import alert_engine
 from metrics import update_metrics
 
 class TestTelegramNotifications(unittest.TestCase):
     def setUp(self):
+        # Keep the collector from writing its snapshot and ring files during tests
+        publish_patcher = patch('rig_snapshot.publish_snapshot')
+        self.mock_publish = publish_patcher.start()
+        self.addCleanup(publish_patcher.stop)
+        ring_patcher = patch('sample_ring.append_samples')
+        self.mock_ring = ring_patcher.start()
+        self.addCleanup(ring_patcher.stop)
         # Reset state
-        metrics.unhealthy_since = None
-        metrics.is_currently_notified = False
         metrics.TELEGRAM_ENABLE = True
         metrics.TELEGRAM_BOT_TOKEN = "fake_token"
         metrics.TELEGRAM_CHAT_ID = "fake_chat_id"
-        metrics.TELEGRAM_NOTIFY_THRESHOLD = 10 # 10 seconds for testing
-
-    @patch('database.log_history')
-    @patch('database.prune_history')
-    @patch('metrics.send_telegram_notification')
-    @patch('metrics.get_full_miner_data')
-    def test_notification_sent_after_threshold(self, mock_full_data, mock_send, mock_prune, mock_log):
+        self.mock_send = MagicMock()
+        self.engine = alert_engine.AlertEngine({'telegram': self.mock_send}, rules_file='', profile='')
+        self.engine.reload_if_changed()
+        # 10 seconds for testing
+        for rule in self.engine.rules:
+            if rule['name'] == 'rig_down':
+                rule['duration'] = 10
+
+    def test_notification_sent_after_threshold(self):
         # Rig is down
-        mock_full_data.return_value = None
-
-        # Mock time to be stable
         start_time = 1000000.0
-        with patch('time.time', return_value=start_time):
-            # First check: mark unhealthy
-            update_metrics()
-            self.assertEqual(metrics.unhealthy_since, start_time)
-            mock_send.assert_not_called()
+        self.engine.dispatch(self.engine.evaluate({'miner': None, 'node': {}}, now=start_time))
+        self.mock_send.assert_not_called()
 
-        # Second check: Fast forward time past threshold
-        with patch('time.time', return_value=start_time + 15):
-            update_metrics()
-            mock_send.assert_called_once()
-            self.assertTrue(metrics.is_currently_notified)
+        # Second check: past threshold
+        self.engine.dispatch(self.engine.evaluate({'miner': None, 'node': {}}, now=start_time + 15))
+        self.mock_send.assert_called_once()
 
-            # Check reason in message
-            args, _ = mock_send.call_args
-            self.assertIn("API Unreachable", args[0])
-            self.assertIn("Duration: 15s", args[0])
+        # Check reason in message
+        args, _ = self.mock_send.call_args
+        self.assertIn("API Unreachable", args[0])
+        self.assertIn("Duration: 15s", args[0])
 
-    @patch('database.log_history')
-    @patch('database.prune_history')
-    @patch('metrics.send_telegram_notification')
-    @patch('metrics.get_full_miner_data')
-    def test_notification_recovery(self, mock_full_data, mock_send, mock_prune, mock_log):
-        # Set state to notified
-        metrics.unhealthy_since = 1000000.0 - 20
-        metrics.is_currently_notified = True
+        # Not repeated while still down
+        self.engine.dispatch(self.engine.evaluate({'miner': None, 'node': {}}, now=start_time + 30))
+        self.mock_send.assert_called_once()
+
+    def test_notification_recovery(self):
+        start_time = 1000000.0
+        self.engine.evaluate({'miner': None, 'node': {}}, now=start_time - 20)
+        self.engine.evaluate({'miner': None, 'node': {}}, now=start_time - 5)
 
         # Rig recovered
-        mock_full_data.return_value = {
-            'total_hashrate': 100.5,
-            'status': 'Mining',
-            'total_dual_hashrate': 0,
-            'avg_fan_speed': 50,
-            'total_power_draw': 200,
-            'total_accepted_shares': 10,
-            'total_rejected_shares': 0,
-            'avg_temperature': 60,
-            'gpus': []
-        }
-
-        update_metrics()
+        recovered = {'total_hashrate': 100.5, 'status': 'Mining', 'gpus': []}
+        self.engine.dispatch(self.engine.evaluate({'miner': recovered, 'node': {}}, now=start_time))
 
         # Recovery message should be sent
-        mock_send.assert_called_once()
-        self.assertIn("RECOVERED", mock_send.call_args[0][0])
-        self.assertIn("Hashrate: 100.5 MH/s", mock_send.call_args[0][0])
-        self.assertFalse(metrics.is_currently_notified)
-        self.assertIsNone(metrics.unhealthy_since)
+        self.mock_send.assert_called_once()
+        self.assertIn("RECOVERED", self.mock_send.call_args[0][0])
+        self.assertIn("Hashrate: 100.5 MH/s", self.mock_send.call_args[0][0])
 
-    @patch('database.log_history')
-    @patch('database.prune_history')
-    @patch('metrics.send_telegram_notification')
-    @patch('metrics.get_full_miner_data')
-    def test_zero_hashrate_notification(self, mock_full_data, mock_send, mock_prune, mock_log):
+    def test_zero_hashrate_notification(self):
         # Rig is up but 0 hashrate
-        mock_full_data.return_value = {
-            'total_hashrate': 0,
-            'status': 'Idle',
-            'total_dual_hashrate': 0,
-            'avg_fan_speed': 50,
-            'total_power_draw': 200,
-            'total_accepted_shares': 10,
-            'total_rejected_shares': 0,
-            'avg_temperature': 60,
-            'gpus': []
-        }
-
+        idle = {'total_hashrate': 0, 'status': 'Idle', 'gpus': []}
         start_time = 1000000.0
-        with patch('time.time', return_value=start_time):
-            # First check
-            update_metrics()
-            self.assertEqual(metrics.unhealthy_since, start_time)
+        self.engine.dispatch(self.engine.evaluate({'miner': idle, 'node': {}}, now=start_time))
+        self.engine.dispatch(self.engine.evaluate({'miner': idle, 'node': {}}, now=start_time + 15))
+        self.mock_send.assert_called_once()
+        self.assertIn("Zero Hashrate", self.mock_send.call_args[0][0])
 
-        # Fast forward
-        with patch('time.time', return_value=start_time + 15):
+    @patch('database.log_history')
+    @patch('database.apply_retention', return_value={})
+    @patch('metrics.get_full_miner_data', return_value=None)
+    def test_update_metrics_hands_snapshot_to_engine(self, mock_full_data, mock_retention, mock_log):
+        with patch.object(metrics.alerts, 'submit') as mock_submit, patch('metrics.send_telegram_notification') as mock_send:
             update_metrics()
-            mock_send.assert_called_once()
-            self.assertIn("Zero Hashrate", mock_send.call_args[0][0])
+        mock_submit.assert_called_once()
+        self.assertIsNone(mock_submit.call_args[0][0]['miner'])
+        # Notifications are sent from the engine thread, never inline
+        mock_send.assert_not_called()
 
-    @patch('requests.post')
+    @patch('http_client.post')
     def test_send_telegram_notification_actual_call(self, mock_post):
         metrics.TELEGRAM_ENABLE = True
         metrics.TELEGRAM_BOT_TOKEN = "test_token"
@@ -127,7 +104,7 @@ class TestTelegramNotifications(unittest.TestCase):
         self.assertEqual(json_data['chat_id'], "test_chat")
         self.assertEqual(json_data['text'], "Test message")
 
-    @patch('requests.post')
+    @patch('http_client.post')
     def test_send_telegram_notification_disabled(self, mock_post):
         metrics.TELEGRAM_ENABLE = False
         from metrics import send_telegram_notification